@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# Microsoft Graphの代わりに使うローカルサーバー（ベンチマーク・試験用）
+# アップローダーが使うAPIだけを実装する:
+#   単純アップロード（PUT :/content）、createUploadSession、フラグメントのPUTと状態確認・キャンセル、
+#   項目の取得・削除、フォルダーの作成、childrenの一覧（@odata.nextLinkによるページング）、Range付きのダウンロード、
+#   JSON $batch（最大20件、dependsOnの依存先が失敗した場合は424）、失効させたアクセストークンへの401
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any
+from urllib.parse import urlparse, parse_qs, unquote
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.hashing import QuickXorHash
+
+
+API_PREFIX = "/v1.0"
+MAX_BATCH_SIZE = 20
+DEFAULT_PAGE_SIZE = 200
+SESSION_LIFETIME_SECONDS = 3600
+
+
+def _iso(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+# サーバー上のドライブの内容。keep_content=Falseならサイズだけを保持し、大きなファイルでもメモリを使わない
+class DriveState:
+    def __init__(self, keep_content: bool = False):
+        self.keep_content = keep_content
+        self.lock = threading.Lock()
+        self.items: Dict[str, Dict[str, Any]] = {}
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self.requests = 0
+        self.bytes_received = 0
+
+    def item_json(self, path: str, item: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+        parent = path.rsplit("/", 1)[0] if "/" in path else ""
+        result = {
+            "id": item["id"],
+            "name": path.rsplit("/", 1)[-1],
+            "size": item["size"],
+            "eTag": item["etag"],
+            "lastModifiedDateTime": _iso(item["mtime"]),
+            "parentReference": {"id": self.items[parent]["id"] if parent in self.items else "root"},
+        }
+        if item["folder"]:
+            result["folder"] = {"childCount": 0}
+        else:
+            result["file"] = {}
+            if item.get("content") is not None:
+                result["file"]["hashes"] = {"quickXorHash": item["quick_xor_hash"]}
+                result["@microsoft.graph.downloadUrl"] = f"{base_url}/download/{item['id']}"
+        return result
+
+    def _ensure_parents(self, path: str):
+        parts = path.split("/")[:-1]
+        for i in range(1, len(parts) + 1):
+            folder = "/".join(parts[:i])
+            if folder not in self.items:
+                self.items[folder] = self._new_item(folder=True)
+
+    @staticmethod
+    def _new_item(folder: bool = False, size: int = 0, content: Optional[bytes] = None) -> Dict[str, Any]:
+        item_id = uuid.uuid4().hex
+        return {"id": item_id, "etag": item_id, "folder": folder, "size": size, "content": content,
+                "mtime": time.time()}
+
+    def put_file(self, path: str, data: bytes) -> Dict[str, Any]:
+        item = self._new_item(size=len(data), content=bytes(data) if self.keep_content else None)
+        if self.keep_content:
+            # ダウンロード時の検証に使うハッシュ（Graphと同じくfile.hashesで返す）
+            hasher = QuickXorHash()
+            hasher.update(data)
+            item["quick_xor_hash"] = hasher.b64digest()
+        with self.lock:
+            self._ensure_parents(path)
+            self.items[path] = item
+            return item
+
+    def create_folder(self, path: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            if path in self.items:
+                return None
+            self._ensure_parents(path)
+            item = self._new_item(folder=True)
+            self.items[path] = item
+            return item
+
+    def delete(self, path: str) -> bool:
+        with self.lock:
+            if path not in self.items:
+                return False
+            prefix = f"{path}/"
+            for key in [key for key in self.items if key == path or key.startswith(prefix)]:
+                del self.items[key]
+            return True
+
+    def children(self, folder: str):
+        prefix = f"{folder}/" if folder else ""
+        with self.lock:
+            return sorted(
+                (path, item) for path, item in self.items.items()
+                if path.startswith(prefix) and "/" not in path[len(prefix):]
+            )
+
+
+class FakeGraphHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeGraph/1.0"
+    # ヘッダーと本文を別々に書き込むため、Nagleと遅延ACKで応答が40ms待たされないようにする
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self) -> DriveState:
+        return self.server.state
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    # 障害注入などで差し替えられるよう、本文の読み込み・応答・ルーティングを分けておく
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send_json(self, status: int, body: Optional[Dict[str, Any]] = None,
+                  headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_bytes(status, data, {"Content-Type": "application/json", **(headers or {})} if body is not None
+                        else headers)
+
+    def send_bytes(self, status: int, data: bytes, headers: Optional[Dict[str, str]] = None):
+        if getattr(self, "_captured", None) is not None:
+            # $batch内のリクエストは応答を送らずに記録する
+            self._captured.append((status, data, headers or {}))
+            return
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def send_error_json(self, status: int, code: str, headers: Optional[Dict[str, str]] = None):
+        self.send_json(status, {"error": {"code": code, "message": code}}, headers)
+
+    def dispatch(self, method: str):
+        with self.state.lock:
+            self.state.requests += 1
+        url = urlparse(self.path)
+        path = unquote(url.path)
+        query = parse_qs(url.query)
+        body = self.read_body()
+        with self.state.lock:
+            self.state.bytes_received += len(body)
+        self.route(method, path, query, body)
+
+    def route(self, method: str, path: str, query: Dict[str, Any], body: bytes):
+        if path.startswith("/upload/"):
+            return self.handle_session(method, path[len("/upload/"):], body)
+        if path.startswith("/download/"):
+            return self.handle_download(path[len("/download/"):])
+        if not path.startswith(API_PREFIX):
+            return self.send_error_json(404, "itemNotFound")
+        authorization = self.headers.get("Authorization") or ""
+        if authorization[len("Bearer "):] in self.server.revoked_tokens:
+            # アップロードURLとダウンロードURLは事前認証済みのため、Graph APIへの要求だけを拒否する
+            return self.send_error_json(401, "InvalidAuthenticationToken")
+        path = path[len(API_PREFIX):]
+
+        if path == "/$batch" and method == "POST":
+            return self.handle_batch(body)
+        if path == "/me/drive":
+            return self.send_json(200, {"id": "fake-drive", "driveType": "personal"})
+        if path == "/me/drive/root/children":
+            return self.handle_children(method, "", query, body)
+        match = re.match(r"^/me/drive/root:/(.+?):/(content|createUploadSession|children)$", path)
+        if match:
+            item_path, operation = match.group(1).strip("/"), match.group(2)
+            if operation == "content":
+                return self.handle_content(method, item_path, body)
+            if operation == "createUploadSession":
+                return self.handle_create_session(item_path)
+            return self.handle_children(method, item_path, query, body)
+        match = re.match(r"^/me/drive/root:/(.+)$", path)
+        if match:
+            return self.handle_item(method, match.group(1).strip("/"))
+        return self.send_error_json(400, "invalidRequest")
+
+    def handle_batch(self, body: bytes):
+        requests = json.loads(body or b"{}").get("requests", [])
+        ids = [request.get("id") for request in requests]
+        if not requests or len(requests) > MAX_BATCH_SIZE or len(set(ids)) != len(ids):
+            return self.send_error_json(400, "invalidRequest")
+        # 依存先は同じバッチ内の、先に並んでいるリクエストでなければならない
+        for index, request in enumerate(requests):
+            if any(dependency not in ids[:index] for dependency in request.get("dependsOn", [])):
+                return self.send_error_json(400, "invalidDependsOn")
+
+        statuses: Dict[str, int] = {}
+        responses = []
+        for request in requests:
+            if any(not 200 <= statuses[dependency] < 300 for dependency in request.get("dependsOn", [])):
+                status, result, headers = 424, {"error": {"code": "failedDependency", "message": "failedDependency"}}, {}
+            else:
+                status, result, headers = self.execute_batch_request(request)
+            statuses[request["id"]] = status
+            response = {"id": request["id"], "status": status, "headers": headers}
+            if result is not None:
+                response["body"] = result
+            responses.append(response)
+        return self.send_json(200, {"responses": responses})
+
+    def execute_batch_request(self, request: Dict[str, Any]):
+        # (ステータス, 本文, ヘッダー) を返す
+        url = urlparse(request["url"])
+        body = json.dumps(request["body"]).encode("utf-8") if "body" in request else b""
+        self._captured = []
+        try:
+            self.route(request["method"], API_PREFIX + unquote(url.path), parse_qs(url.query), body)
+            status, data, headers = self._captured[0]
+        finally:
+            self._captured = None
+        headers = {name: value for name, value in headers.items() if name != "Content-Type"}
+        return status, json.loads(data) if data else None, headers
+
+    def handle_item(self, method: str, item_path: str):
+        item = self.state.items.get(item_path)
+        if method == "DELETE":
+            return self.send_bytes(204, b"") if self.state.delete(item_path) else self.send_error_json(404, "itemNotFound")
+        if item is None:
+            return self.send_error_json(404, "itemNotFound")
+        return self.send_json(200, self.state.item_json(item_path, item, self.server.base_url))
+
+    def handle_content(self, method: str, item_path: str, body: bytes):
+        if method == "PUT":
+            item = self.state.put_file(item_path, body)
+            return self.send_json(201, self.state.item_json(item_path, item, self.server.base_url))
+        item = self.state.items.get(item_path)
+        if item is None or item["folder"]:
+            return self.send_error_json(404, "itemNotFound")
+        return self.send_content(item)
+
+    def handle_download(self, item_id: str):
+        with self.state.lock:
+            item = next((item for item in self.state.items.values() if item["id"] == item_id), None)
+        if item is None:
+            return self.send_error_json(404, "itemNotFound")
+        return self.send_content(item)
+
+    def send_content(self, item: Dict[str, Any]):
+        content = item.get("content")
+        if content is None:
+            return self.send_error_json(501, "contentNotKept")
+        match = re.match(r"^bytes=(\d+)-(\d*)$", self.headers.get("Range") or "")
+        if not match:
+            return self.send_bytes(200, content, {"Content-Type": "application/octet-stream"})
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else len(content) - 1, len(content) - 1)
+        return self.send_bytes(206, content[start:end + 1], {
+            "Content-Type": "application/octet-stream",
+            "Content-Range": f"bytes {start}-{end}/{len(content)}",
+        })
+
+    def handle_children(self, method: str, folder: str, query: Dict[str, Any], body: bytes):
+        if method == "POST":
+            if folder and folder not in self.state.items:
+                return self.send_error_json(404, "itemNotFound")
+            request = json.loads(body or b"{}")
+            folder_path = f"{folder}/{request['name']}" if folder else request["name"]
+            item = self.state.create_folder(folder_path)
+            if item is None:
+                if request.get("@microsoft.graph.conflictBehavior") == "fail":
+                    return self.send_error_json(409, "nameAlreadyExists")
+                item = self.state.items[folder_path]
+            return self.send_json(201, self.state.item_json(folder_path, item, self.server.base_url))
+
+        if folder and folder not in self.state.items:
+            return self.send_error_json(404, "itemNotFound")
+        top = int(query.get("$top", [DEFAULT_PAGE_SIZE])[0])
+        skip = int(query.get("$skiptoken", [0])[0])
+        children = self.state.children(folder)
+        page = {"value": [self.state.item_json(path, item, self.server.base_url)
+                          for path, item in children[skip:skip + top]]}
+        if skip + top < len(children):
+            base = f"{self.server.base_url}{API_PREFIX}" + (
+                f"/me/drive/root:/{folder}:/children" if folder else "/me/drive/root/children")
+            page["@odata.nextLink"] = f"{base}?$top={top}&$skiptoken={skip + top}"
+        return self.send_json(200, page)
+
+    def handle_create_session(self, item_path: str):
+        session_id = uuid.uuid4().hex
+        expiration = time.time() + SESSION_LIFETIME_SECONDS
+        with self.state.lock:
+            self.state.sessions[session_id] = {
+                "path": item_path,
+                "received": 0,
+                "data": bytearray() if self.state.keep_content else None,
+                "expiration": expiration,
+            }
+        return self.send_json(200, {
+            "uploadUrl": f"{self.server.base_url}/upload/{session_id}",
+            "expirationDateTime": _iso(expiration),
+            "nextExpectedRanges": ["0-"],
+        })
+
+    def session_status(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "expirationDateTime": _iso(session["expiration"]),
+            "nextExpectedRanges": [f"{session['received']}-"],
+        }
+
+    def handle_session(self, method: str, session_id: str, body: bytes):
+        session = self.state.sessions.get(session_id)
+        if session is None:
+            return self.send_error_json(404, "itemNotFound")
+        if method == "DELETE":
+            with self.state.lock:
+                self.state.sessions.pop(session_id, None)
+            return self.send_bytes(204, b"")
+        if method == "GET":
+            return self.send_json(200, self.session_status(session))
+
+        match = re.match(r"^bytes (\d+)-(\d+)/(\d+|\*)$", self.headers.get("Content-Range") or "")
+        if not match or int(match.group(2)) - int(match.group(1)) + 1 != len(body):
+            return self.send_error_json(400, "invalidRange")
+        start, end, total = int(match.group(1)), int(match.group(2)), match.group(3)
+        if total == "*" and self.server.reject_unknown_total:
+            return self.send_error_json(400, "invalidRange")
+        with self.state.lock:
+            if start != session["received"]:
+                return self.send_error_json(416, "invalidRange")
+            session["received"] = end + 1
+            if session["data"] is not None:
+                session["data"] += body
+        if total != "*" and end + 1 == int(total):
+            with self.state.lock:
+                self.state.sessions.pop(session_id, None)
+            data = bytes(session["data"]) if session["data"] is not None else b""
+            item = self.state.put_file(session["path"], data)
+            item["size"] = end + 1
+            return self.send_json(201, self.state.item_json(session["path"], item, self.server.base_url))
+        return self.send_json(202, self.session_status(session))
+
+
+class FakeGraphServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 多数のワーカーから同時に接続されても取りこぼさないようにする
+    request_queue_size = 128
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, keep_content: bool = False,
+                 handler_class=FakeGraphHandler, state: Optional[DriveState] = None):
+        super().__init__((host, port), handler_class)
+        self.state = state or DriveState(keep_content)
+        # Trueなら総サイズが "*" のContent-Rangeを拒否する（Graphのドキュメントどおり総サイズを必須にする）
+        self.reject_unknown_total = False
+        # 期限切れとして401を返すアクセストークン
+        self.revoked_tokens = set()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def endpoint(self) -> str:
+        # GRAPH_API_ENDPOINTに指定する値
+        return f"{self.base_url}{API_PREFIX}"
+
+    def start(self) -> "FakeGraphServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="FakeGraphServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="ローカルのGraph代替サーバーを起動する")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0なら空いているポートを使う")
+    parser.add_argument("--keep-content", action="store_true", help="アップロードされた内容を保持する（ダウンロード用）")
+    parser.add_argument("--reject-unknown-total", action="store_true",
+                        help="総サイズが * のContent-Rangeを400で拒否する")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = FakeGraphServer(args.host, args.port, args.keep_content)
+    server.reject_unknown_total = args.reject_unknown_total
+    # 起動した側がエンドポイントを読み取れるよう、最初の1行に出力する
+    print(json.dumps({"endpoint": server.endpoint}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
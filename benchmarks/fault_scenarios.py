@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# 障害注入サーバー（fault_server.py）に対してアップロードを実行し、障害の種類ごとの影響を計測する
+# シナリオごとにサーバーとアップローダーを別プロセスで起動し、レート制限などのプロセス内の状態を持ち越さない
+# 報告する指標: 所要時間（障害なしとの差）、再送したバイト数、リクエスト数、失敗したファイル数、レイテンシのパーセンタイル
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional, Dict, Any, List
+
+import requests
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BENCHMARK_DIR)
+sys.path.append(os.path.dirname(BENCHMARK_DIR))
+
+from upload_benchmark import (
+    MB, LatencyRecorder, child_env, create_dataset, environment_info, percentile, peak_rss_mb, start_server
+)
+
+
+# 障害の設定はfault_server.pyのDEFAULT_PROFILEを参照
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "baseline": {},
+    "latency": {"latency": {"distribution": "lognormal", "ms": 20, "sigma": 0.8, "max_ms": 2000}},
+    "throttle_429": {"throttle_rate": 0.02, "retry_after": 1},
+    "error_503": {"error_503_rate": 0.03},
+    "dropped_fragments": {"drop_rate": 0.1},
+    "expired_sessions": {"session_expire_rate": 0.1},
+    "truncated_ranges": {"truncate_rate": 0.2},
+    "combined": {
+        "latency": {"distribution": "exponential", "ms": 5, "max_ms": 500},
+        "throttle_rate": 0.005,
+        "error_503_rate": 0.01,
+        "drop_rate": 0.03,
+        "session_expire_rate": 0.03,
+        "truncate_rate": 0.05,
+    },
+}
+
+
+def scenario_files(scale: float) -> List[Dict[str, Any]]:
+    # 単純アップロードになる小さなファイルと、複数のフラグメントに分かれる大きなファイル
+    files = [{"path": f"small/file{i:04d}.dat", "size": 1024 + (i * 7919) % (64 * 1024)}
+             for i in range(max(1, int(300 * scale)))]
+    files += [{"path": f"large/file{i}.bin", "size": 36 * MB + i * 777777} for i in range(max(4, int(16 * scale)))]
+    return files
+
+
+# ---- シナリオを実行する子プロセス ----
+
+def run_scenario(data_dir: str, remote_root: str, workers: int) -> Dict[str, Any]:
+    from src.api.onedrive_client import OneDriveClient
+    from src.main import OneDriveUploader
+
+    client = OneDriveClient("fault-scenario-token")
+    recorder = LatencyRecorder()
+    client.transport.session.hooks["response"].append(recorder.hook)
+    uploader = OneDriveUploader(client=client)
+
+    started = time.perf_counter()
+    results = uploader.upload_directory(data_dir, remote_root, workers=workers)
+    elapsed = time.perf_counter() - started
+    samples = recorder.take()
+    if uploader.manifest is not None:
+        uploader.manifest.flush()
+
+    succeeded = [result for result in results if result["success"]]
+    rate_stats = client.get_rate_stats()
+    return {
+        "seconds": round(elapsed, 3),
+        "files": len(results),
+        "failed": len(results) - len(succeeded),
+        "bytes": sum(result["size"] for result in succeeded),
+        "requests": len(samples),
+        "latency_p50_ms": round(percentile(samples, 0.50) * 1000, 3) if samples else None,
+        "latency_p99_ms": round(percentile(samples, 0.99) * 1000, 3) if samples else None,
+        "latency_max_ms": round(max(samples) * 1000, 3) if samples else None,
+        "throttled": rate_stats["throttled"],
+        "throttle_waited_seconds": round(rate_stats["waited_seconds"], 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+# ---- 親プロセス ----
+
+def run_scenario_child(name: str, data_dir: str, endpoint: str, workers: int, work_dir: str,
+                       extra_env: Optional[Dict[str, str]] = None, verbose: bool = False) -> Dict[str, Any]:
+    command = [sys.executable, os.path.abspath(__file__), "--run-scenario", name,
+               "--data-dir", data_dir, "--workers", str(workers)]
+    completed = subprocess.run(
+        command, cwd=work_dir, env=child_env(endpoint, work_dir, extra_env), stdout=subprocess.PIPE,
+        stderr=None if verbose else subprocess.DEVNULL, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"シナリオ {name} の実行に失敗しました（終了コード {completed.returncode}）")
+    # リトライのメッセージが標準出力に出るため、最後の行だけを読む
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure(name: str, profile: Dict[str, Any], data_dir: str, workers: int, work_root: str,
+            extra_env: Dict[str, str], verbose: bool) -> Dict[str, Any]:
+    server, endpoint = start_server(script="fault_server.py", extra_args=["--profile", json.dumps(profile)])
+    work_dir = tempfile.mkdtemp(prefix=f"{name}_", dir=work_root)
+    try:
+        result = run_scenario_child(name, data_dir, endpoint, workers, work_dir, extra_env, verbose)
+        stats = requests.get(f"{endpoint.rsplit('/', 1)[0]}/_faults/stats", timeout=10).json()
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        **result,
+        "profile": profile,
+        "faults": stats["faults"],
+        "fragments": stats["fragments"],
+        "upload_bytes": stats["upload_bytes"],
+        "resent_bytes": stats["resent_bytes"],
+        "latency_injected_seconds": stats["latency_injected_seconds"],
+    }
+
+
+def print_summary(report: Dict[str, Any]):
+    baseline = report["scenarios"].get("baseline")
+    print(f"{'シナリオ':<18} {'秒':>8} {'差':>8} {'失敗':>5} {'要求':>6} {'再送MB':>8} {'p50 ms':>8} {'p99 ms':>9}  注入した障害")
+    for name, result in report["scenarios"].items():
+        delta = ""
+        if baseline and baseline["seconds"] and name != "baseline":
+            delta = f"{(result['seconds'] - baseline['seconds']) / baseline['seconds'] * 100:+.0f}%"
+        faults = [f"{kind}={count}" for kind, count in result["faults"].items() if count]
+        if result["latency_injected_seconds"]:
+            faults.insert(0, f"latency={result['latency_injected_seconds']:.1f}s")
+        faults = ", ".join(faults) or "-"
+        print(
+            f"{name:<18} {result['seconds']:>8.2f} {delta:>8} {result['failed']:>5} {result['requests']:>6} "
+            f"{result['resent_bytes'] / MB:>8.1f} {result['latency_p50_ms'] or 0:>8.2f} {result['latency_p99_ms'] or 0:>9.2f}  {faults}"
+        )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="障害注入サーバーに対するアップロードの耐障害性とテールレイテンシの計測")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="実行するシナリオ（カンマ区切り）")
+    parser.add_argument("--profile", help="追加のシナリオ custom として使う障害の設定（JSON文字列またはファイル）")
+    parser.add_argument("--scale", type=float, default=1.0, help="ファイル数の倍率（0.25なら素早く確認できる）")
+    parser.add_argument("--workers", type=int, default=8, help="並列アップロード数")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="アップローダーに渡す環境変数（例: CHUNK_RETRY_DELAY=0.5）。複数指定できる")
+    parser.add_argument("--output", help="JSONレポートの出力先")
+    parser.add_argument("--verbose", action="store_true", help="子プロセスのログを表示する")
+    # 内部用: 子プロセスとして1つのシナリオを実行する
+    parser.add_argument("--run-scenario", help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def load_profile(value: str) -> Dict[str, Any]:
+    if os.path.exists(value):
+        with open(value, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return json.loads(value)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.run_scenario:
+        print(json.dumps(run_scenario(args.data_dir, f"faults/{args.run_scenario}", args.workers)))
+        return
+
+    scenarios = {}
+    for name in (name.strip() for name in args.scenarios.split(",") if name.strip()):
+        if name not in SCENARIOS:
+            raise SystemExit(f"未知のシナリオ: {name}（{', '.join(SCENARIOS)}）")
+        scenarios[name] = SCENARIOS[name]
+    if args.profile:
+        scenarios["custom"] = load_profile(args.profile)
+    extra_env = dict(item.split("=", 1) for item in args.env)
+
+    work_root = tempfile.mkdtemp(prefix="fault_scenarios_")
+    try:
+        data_dir = os.path.join(work_root, "data")
+        files = scenario_files(args.scale)
+        print(f"テストデータを作成しています: {len(files)}ファイル", file=sys.stderr)
+        create_dataset(data_dir, files)
+        report = {**environment_info(args.workers, args.scale), "env": extra_env, "scenarios": {}}
+        for name, profile in scenarios.items():
+            print(f"計測中: {name}", file=sys.stderr)
+            report["scenarios"][name] = measure(name, profile, data_dir, args.workers, work_root,
+                                                extra_env, args.verbose)
+    finally:
+        shutil.rmtree(work_root, ignore_errors=True)
+
+    print_summary(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"レポートを保存しました: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# 障害を注入するGraph代替サーバー（耐障害性とテールレイテンシの試験用）
+# fake_graph_server.pyの動作に、次の障害を設定した確率で加える:
+#   レイテンシ（固定・一様・対数正規・指数分布）、Retry-After付きの429、503、
+#   フラグメント送信中の切断、アップロードセッションの失効、受信済み範囲の巻き戻し（nextExpectedRangesの切り詰め・停滞・後退）、
+#   $batch内の個別リクエストへの429
+# 設定と統計は POST /_faults（JSON）と GET /_faults/stats で実行中に変更・取得できる
+import argparse
+import json
+import math
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from typing import Optional, Dict, Any
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_graph_server import FakeGraphHandler, FakeGraphServer
+
+
+DEFAULT_PROFILE = {
+    # {"distribution": "fixed" | "uniform" | "lognormal" | "exponential", "ms": 中央値・平均, "min_ms", "max_ms", "sigma"}
+    "latency": None,
+    # 429を返す確率と、付けるRetry-After（秒）
+    "throttle_rate": 0.0,
+    "retry_after": 1,
+    # 503を返す確率（Retry-Afterなし）
+    "error_503_rate": 0.0,
+    # フラグメントの本文を半分まで受信したところで接続を切る確率
+    "drop_rate": 0.0,
+    # 途中まで進んだアップロードセッションが、次のフラグメントの受信時に失効している確率
+    "session_expire_rate": 0.0,
+    # フラグメントの一部だけを受信済みとして応答する確率
+    "truncate_rate": 0.0,
+    # フラグメントを受け取らずに、受信済みの位置を変えない202を返す確率
+    "stall_rate": 0.0,
+    # フラグメントを受け取らずに、受信済みの位置を半分まで戻した202を返す確率
+    "rewind_rate": 0.0,
+    # $batch内の個別のリクエストに429（Retry-Afterはretry_after）を返す確率
+    "batch_throttle_rate": 0.0,
+    "seed": 1,
+}
+FAULT_KINDS = ("throttle", "error_503", "drop", "session_expired", "truncate", "stall", "rewind",
+               "batch_throttle")
+
+
+class FaultInjector:
+    def __init__(self, profile: Optional[Dict[str, Any]] = None):
+        self.lock = threading.Lock()
+        self.configure(profile or {})
+
+    def configure(self, profile: Dict[str, Any]):
+        with self.lock:
+            self.profile = {**DEFAULT_PROFILE, **profile}
+            self._random = random.Random(self.profile["seed"])
+            self.faults = {kind: 0 for kind in FAULT_KINDS}
+            self.latency_injected = 0.0
+            self.fragments = 0
+            # アップロードで受信した本文（単純アップロードとフラグメント、切断・拒否したものを含む）
+            self.upload_bytes = 0
+            self.completed_bytes = 0
+            self.requests = 0
+
+    def chance(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self.lock:
+            return self._random.random() < rate
+
+    def count(self, kind: str):
+        with self.lock:
+            self.faults[kind] += 1
+
+    def delay(self) -> float:
+        latency = self.profile.get("latency")
+        if not latency:
+            return 0.0
+        distribution = latency.get("distribution", "fixed")
+        base = latency.get("ms", 0) / 1000
+        with self.lock:
+            if distribution == "uniform":
+                seconds = self._random.uniform(latency.get("min_ms", 0) / 1000, latency.get("max_ms", 0) / 1000)
+            elif distribution == "lognormal":
+                # msは中央値。sigmaが大きいほど裾が重くなる
+                seconds = base * math.exp(self._random.gauss(0, latency.get("sigma", 1.0)))
+            elif distribution == "exponential":
+                seconds = self._random.expovariate(1 / base) if base > 0 else 0.0
+            else:
+                seconds = base
+            if latency.get("max_ms"):
+                seconds = min(seconds, latency["max_ms"] / 1000)
+            self.latency_injected += seconds
+        return seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "profile": self.profile,
+                "requests": self.requests,
+                "faults": dict(self.faults),
+                "latency_injected_seconds": round(self.latency_injected, 3),
+                "fragments": self.fragments,
+                "upload_bytes": self.upload_bytes,
+                "completed_bytes": self.completed_bytes,
+                "resent_bytes": max(0, self.upload_bytes - self.completed_bytes),
+            }
+
+
+class FaultInjectingHandler(FakeGraphHandler):
+    @property
+    def injector(self) -> FaultInjector:
+        return self.server.injector
+
+    def read_body(self) -> bytes:
+        body = super().read_body()
+        if self.command == "PUT":
+            with self.injector.lock:
+                self.injector.upload_bytes += len(body)
+        return body
+
+    def dispatch(self, method: str):
+        if self.path.startswith("/_faults"):
+            return self.handle_control(method)
+
+        injector = self.injector
+        with injector.lock:
+            injector.requests += 1
+        delay = injector.delay()
+        if delay:
+            time.sleep(delay)
+
+        is_fragment = method == "PUT" and self.path.startswith("/upload/")
+        is_api = self.path.startswith("/v1.0/") or self.path.startswith("/upload/")
+        if is_api and injector.chance(injector.profile["throttle_rate"]):
+            injector.count("throttle")
+            self.read_body()
+            return self.send_error_json(429, "activityLimitReached",
+                                        {"Retry-After": str(injector.profile["retry_after"])})
+        if is_api and injector.chance(injector.profile["error_503_rate"]):
+            injector.count("error_503")
+            self.read_body()
+            return self.send_error_json(503, "serviceNotAvailable")
+        if is_fragment and injector.chance(injector.profile["drop_rate"]):
+            injector.count("drop")
+            return self.drop_connection()
+        super().dispatch(method)
+
+    def drop_connection(self):
+        # 本文の途中まで受信してから応答せずに切断する（クライアントには接続エラーとして見える）
+        length = int(self.headers.get("Content-Length") or 0)
+        received = self.rfile.read(length // 2) if length else b""
+        with self.injector.lock:
+            self.injector.upload_bytes += len(received)
+        self.close_connection = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def handle_session(self, method: str, session_id: str, body: bytes):
+        injector = self.injector
+        session = self.state.sessions.get(session_id)
+        if method == "PUT":
+            with injector.lock:
+                injector.fragments += 1
+            if session is not None and session["received"] and injector.chance(injector.profile["session_expire_rate"]):
+                # 期限切れのセッションと同じく404を返す。クライアントは新しいセッションで最初から送り直す
+                injector.count("session_expired")
+                with self.state.lock:
+                    self.state.sessions.pop(session_id, None)
+                return self.send_error_json(404, "itemNotFound")
+            if session is not None and self.truncate_fragment(session, body):
+                return
+        return super().handle_session(method, session_id, body)
+
+    def truncate_fragment(self, session: Dict[str, Any], body: bytes) -> bool:
+        # 最後ではないフラグメントの一部だけを受け取ったことにし、nextExpectedRangesを手前に戻す
+        content_range = self.headers.get("Content-Range") or ""
+        try:
+            span, total = content_range[len("bytes "):].split("/")
+            start, end = (int(value) for value in span.split("-"))
+        except ValueError:
+            return False
+        final = total != "*" and end + 1 == int(total)
+        if final or len(body) < 2 or start != session["received"]:
+            return False
+        injector = self.injector
+        if injector.chance(injector.profile["truncate_rate"]):
+            kind, received = "truncate", start + len(body) // 2
+        elif injector.chance(injector.profile["stall_rate"]):
+            kind, received = "stall", start
+        elif start > 0 and injector.chance(injector.profile["rewind_rate"]):
+            kind, received = "rewind", start // 2
+        else:
+            return False
+        injector.count(kind)
+        with self.state.lock:
+            session["received"] = received
+            if session["data"] is not None:
+                session["data"] = (session["data"] + body)[:received]
+        self.send_json(202, self.session_status(session))
+        return True
+
+    def execute_batch_request(self, request: Dict[str, Any]):
+        injector = self.injector
+        if injector.chance(injector.profile["batch_throttle_rate"]):
+            injector.count("batch_throttle")
+            headers = {"Retry-After": str(injector.profile["retry_after"])}
+            return 429, {"error": {"code": "activityLimitReached", "message": "activityLimitReached"}}, headers
+        return super().execute_batch_request(request)
+
+    def handle_control(self, method: str):
+        body = self.read_body()
+        if method == "POST" and self.path.rstrip("/") == "/_faults":
+            self.injector.configure(json.loads(body or b"{}"))
+            with self.state.lock:
+                self.state.items.clear()
+                self.state.sessions.clear()
+            return self.send_json(200, self.injector.stats())
+        if method == "GET" and self.path.rstrip("/") == "/_faults/stats":
+            return self.send_json(200, self.injector.stats())
+        return self.send_error_json(404, "itemNotFound")
+
+    def send_json(self, status: int, body: Optional[Dict[str, Any]] = None,
+                  headers: Optional[Dict[str, str]] = None):
+        # 完了したファイルのサイズを数え、受信量との差から再送量を求める
+        if status in (200, 201) and body and "file" in body and self.command == "PUT":
+            with self.injector.lock:
+                self.injector.completed_bytes += body.get("size", 0)
+        super().send_json(status, body, headers)
+
+
+class FaultInjectingServer(FakeGraphServer):
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, keep_content: bool = False,
+                 profile: Optional[Dict[str, Any]] = None):
+        super().__init__(host, port, keep_content, handler_class=FaultInjectingHandler)
+        self.injector = FaultInjector(profile)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="障害を注入するGraph代替サーバーを起動する")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--keep-content", action="store_true")
+    parser.add_argument("--profile", help="障害の設定（JSON文字列またはファイル）")
+    args = parser.parse_args(argv)
+
+    profile = {}
+    if args.profile:
+        if os.path.exists(args.profile):
+            with open(args.profile, 'r', encoding='utf-8') as f:
+                profile = json.load(f)
+        else:
+            profile = json.loads(args.profile)
+    server = FaultInjectingServer(args.host, args.port, args.keep_content, profile)
+    print(json.dumps({"endpoint": server.endpoint, "control": f"{server.base_url}/_faults"}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
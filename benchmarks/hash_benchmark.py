@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils import hashing
+from src.utils.hashing import QuickXorHash, ReferenceQuickXorHash, HASH_BLOCK_SIZE
+
+
+def _measure(name, func, size):
+    started = time.perf_counter()
+    digest = func()
+    elapsed = time.perf_counter() - started
+    throughput = size / elapsed / (1024 * 1024) if elapsed else float("inf")
+    print(f"  {name:<28} {elapsed:8.3f}秒 {throughput:10.1f} MB/s  {digest}")
+    return digest
+
+
+def _read_only(file_path):
+    # ファイルを読むだけのコスト（ハッシュ計算の下限の目安）
+    with open(file_path, 'rb', buffering=0) as f:
+        buffer = bytearray(HASH_BLOCK_SIZE)
+        while f.readinto(buffer):
+            pass
+    return "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="quickXorHash / SHA-1 の計算速度を比較する")
+    parser.add_argument("--size-mb", type=int, default=256, help="テストファイルのサイズ（MB）")
+    parser.add_argument("--reference-mb", type=int, default=2, help="1バイトずつ処理する参照実装に与えるサイズ（MB）")
+    parser.add_argument("--file", help="既存のファイルを使う場合のパス")
+    args = parser.parse_args()
+
+    temp_path = None
+    file_path = args.file
+    if not file_path:
+        handle, temp_path = tempfile.mkstemp(prefix="hash_benchmark_")
+        with os.fdopen(handle, 'wb') as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+        file_path = temp_path
+
+    try:
+        size = os.path.getsize(file_path)
+        print(f"ファイル: {file_path} ({size:,} bytes)")
+        _measure("読み込みのみ", lambda: _read_only(file_path), size)
+        if hashing.np is not None:
+            _measure("quickXorHash (NumPy)",
+                     lambda: hashing._hash_file(QuickXorHash(use_numpy=True), file_path).b64digest(), size)
+        else:
+            print("  NumPyが見つからないため、NumPy版はスキップします")
+        _measure("quickXorHash (多倍長整数)",
+                 lambda: hashing._hash_file(QuickXorHash(use_numpy=False), file_path).b64digest(), size)
+        _measure("SHA-1 (hashlib)", lambda: hashing.sha1_file(file_path), size)
+
+        # 参照実装は遅いため先頭の一部だけで計測し、同じデータで結果が一致することも確認する
+        with open(file_path, 'rb') as f:
+            sample = f.read(args.reference_mb * 1024 * 1024)
+        reference = ReferenceQuickXorHash()
+        fast = QuickXorHash()
+        print(f"参照実装との比較（先頭 {len(sample):,} bytes）:")
+        expected = _measure("quickXorHash (参照実装)", lambda: (reference.update(sample), reference.b64digest())[1], len(sample))
+        actual = _measure("quickXorHash (高速版)", lambda: (fast.update(sample), fast.b64digest())[1], len(sample))
+        print(f"  結果の一致: {'OK' if expected == actual else 'NG'}")
+        _measure("SHA-1 (hashlib)", lambda: hashlib.sha1(sample).hexdigest().upper(), len(sample))
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# ローカルのGraph代替サーバー（fake_graph_server.py）に対してアップローダー全体の性能を計測する
+# Microsoftアカウントもネットワークも不要。ワークロードごとに別プロセスで実行し、ピークRSSを個別に計測する
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional, Dict, Any, List
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.append(PROJECT_ROOT)
+
+MB = 1024 * 1024
+REPORT_VERSION = 1
+# 比較時に表示する指標（値が大きいほど良いものはTrue）
+COMPARED_METRICS = {
+    "files_per_second": True,
+    "mb_per_second": True,
+    "latency_p50_ms": False,
+    "latency_p99_ms": False,
+    "peak_rss_mb": False,
+}
+# この割合を超えて悪化した指標に印を付ける（計測のばらつきは無視する）
+REGRESSION_THRESHOLD_PERCENT = 5.0
+
+
+# 標準ワークロードのファイル構成（scaleで件数とサイズを調整する）
+def workload_files(name: str, scale: float, seed: int = 1) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    files = []
+    if name == "tiny":
+        # 小さなファイルが大量にある場合（リクエスト数が支配的）
+        for i in range(max(1, int(2000 * scale))):
+            files.append({"path": f"dir{i % 20:02d}/file{i:05d}.txt", "size": rng.randint(100, 4096)})
+    elif name == "huge":
+        # 少数の大きなファイル（フラグメントの送信効率が支配的）
+        for i in range(max(1, int(3 * scale))):
+            files.append({"path": f"huge{i}.bin", "size": int(256 * MB * min(scale, 1.0)) + i})
+    elif name == "mixed":
+        # 実際のバックアップに近い構成（小・中・大が混在した深い階層）
+        for i in range(max(1, int(600 * scale))):
+            roll = rng.random()
+            if roll < 0.70:
+                size = rng.randint(1024, 64 * 1024)
+            elif roll < 0.95:
+                size = rng.randint(256 * 1024, 8 * MB)
+            else:
+                size = rng.randint(16 * MB, 48 * MB)
+            depth = "/".join(f"d{rng.randint(0, 4)}" for _ in range(rng.randint(0, 3)))
+            files.append({"path": f"{depth}/f{i:04d}.dat" if depth else f"f{i:04d}.dat", "size": size})
+    else:
+        raise ValueError(f"未知のワークロード: {name}")
+    return files
+
+
+def create_dataset(root: str, files: List[Dict[str, Any]]) -> int:
+    # 圧縮や重複排除の影響を受けないよう乱数で埋める（大きなファイルは同じブロックを繰り返す）
+    block = os.urandom(4 * MB)
+    total = 0
+    for entry in files:
+        path = os.path.join(root, *entry["path"].split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            remaining = entry["size"]
+            while remaining > 0:
+                length = min(remaining, len(block))
+                f.write(block[:length] if entry["size"] > len(block) else os.urandom(length))
+                remaining -= length
+        total += entry["size"]
+    return total
+
+
+def percentile(values: List[float], ratio: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(ratio * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    # LinuxはKB、macOSはバイト単位
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+# ---- ワークロードを実行する子プロセス ----
+
+class LatencyRecorder:
+    # requestsのレスポンスフックで、送信開始からレスポンスヘッダー受信までの時間を記録する
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: List[float] = []
+
+    def hook(self, response, *args, **kwargs):
+        with self._lock:
+            self.samples.append(response.elapsed.total_seconds())
+
+    def take(self) -> List[float]:
+        with self._lock:
+            samples, self.samples = self.samples, []
+        return samples
+
+
+def _phase_result(elapsed: float, samples: List[float], files: int = 0, size: int = 0) -> Dict[str, Any]:
+    result = {
+        "seconds": round(elapsed, 4),
+        "requests": len(samples),
+        "latency_p50_ms": None,
+        "latency_p99_ms": None,
+    }
+    if samples:
+        result["latency_p50_ms"] = round(percentile(samples, 0.50) * 1000, 3)
+        result["latency_p99_ms"] = round(percentile(samples, 0.99) * 1000, 3)
+    if files:
+        result["files_per_second"] = round(files / elapsed, 2) if elapsed else None
+        result["mb_per_second"] = round(size / MB / elapsed, 2) if elapsed else None
+    return result
+
+
+def run_workload(data_dir: str, remote_root: str, workers: int) -> Dict[str, Any]:
+    from src.api.onedrive_client import OneDriveClient
+    from src.main import OneDriveUploader
+
+    client = OneDriveClient("benchmark-token")
+    recorder = LatencyRecorder()
+    client.transport.session.hooks["response"].append(recorder.hook)
+    uploader = OneDriveUploader(client=client)
+
+    started = time.perf_counter()
+    results = uploader.upload_directory(data_dir, remote_root, workers=workers)
+    upload_elapsed = time.perf_counter() - started
+    upload_samples = recorder.take()
+    succeeded = [result for result in results if result["success"]]
+    uploaded_bytes = sum(result["size"] for result in succeeded)
+
+    started = time.perf_counter()
+    listed = 0
+    pending = [remote_root]
+    while pending:
+        folder = pending.pop()
+        for item in client.iter_files(folder, select=["name", "size", "folder"]):
+            listed += 1
+            if "folder" in item:
+                pending.append(f"{folder}/{item['name']}")
+    list_elapsed = time.perf_counter() - started
+    list_samples = recorder.take()
+
+    started = time.perf_counter()
+    client.delete_file(remote_root)
+    delete_elapsed = time.perf_counter() - started
+    delete_samples = recorder.take()
+
+    if uploader.manifest is not None:
+        uploader.manifest.flush()
+    all_samples = upload_samples + list_samples + delete_samples
+    upload = _phase_result(upload_elapsed, upload_samples, len(succeeded), uploaded_bytes)
+    return {
+        "files": len(results),
+        "failed": len(results) - len(succeeded),
+        "bytes": uploaded_bytes,
+        "seconds": upload["seconds"],
+        "files_per_second": upload["files_per_second"],
+        "mb_per_second": upload["mb_per_second"],
+        "requests": len(all_samples),
+        "latency_p50_ms": upload["latency_p50_ms"],
+        "latency_p99_ms": upload["latency_p99_ms"],
+        "latency_max_ms": round(max(all_samples) * 1000, 3) if all_samples else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "phases": {
+            "upload": upload,
+            "list": {**_phase_result(list_elapsed, list_samples), "items": listed},
+            "delete": _phase_result(delete_elapsed, delete_samples),
+        },
+    }
+
+
+# ---- 親プロセス ----
+
+def start_server(keep_content: bool = False, script: str = "fake_graph_server.py",
+                 extra_args: Optional[List[str]] = None):
+    command = [sys.executable, os.path.join(BENCHMARK_DIR, script), *(extra_args or [])]
+    if keep_content:
+        command.append("--keep-content")
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        process.kill()
+        raise RuntimeError("Graph代替サーバーを起動できませんでした")
+    return process, json.loads(line)["endpoint"]
+
+
+def child_env(endpoint: str, work_dir: str, extra_env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    # 状態ファイルやログは作業ディレクトリに置き、実行ごとに独立させる
+    return {
+        **os.environ,
+        "GRAPH_API_ENDPOINT": endpoint,
+        "UPLOAD_MANIFEST_DB": os.path.join(work_dir, "upload_manifest.db"),
+        "UPLOAD_SESSION_JOURNAL": os.path.join(work_dir, "upload_sessions.json"),
+        "KNOWN_FOLDERS_CACHE": "",
+        "TOKEN_BACKGROUND_REFRESH": "false",
+        **(extra_env or {}),
+    }
+
+
+def run_child(name: str, data_dir: str, endpoint: str, workers: int, work_dir: str,
+              extra_env: Optional[Dict[str, str]] = None, verbose: bool = False) -> Dict[str, Any]:
+    command = [sys.executable, os.path.abspath(__file__), "--run-workload", name,
+               "--data-dir", data_dir, "--workers", str(workers)]
+    completed = subprocess.run(
+        command, cwd=work_dir, env=child_env(endpoint, work_dir, extra_env), stdout=subprocess.PIPE,
+        stderr=None if verbose else subprocess.DEVNULL, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"ワークロード {name} の実行に失敗しました（終了コード {completed.returncode}）")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment_info(workers: int, scale: float) -> Dict[str, Any]:
+    from src.utils.config import Config
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                                  capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        "report_version": REPORT_VERSION,
+        "revision": revision,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": workers,
+        "scale": scale,
+        "upload_chunk_size": Config.UPLOAD_CHUNK_SIZE,
+        "simple_upload_threshold": Config.SIMPLE_UPLOAD_THRESHOLD,
+        "http_pool_maxsize": Config.HTTP_POOL_MAXSIZE,
+    }
+
+
+def print_summary(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    print(f"{'ワークロード':<10} {'ファイル':>8} {'files/s':>10} {'MB/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'RSS MB':>8}")
+    for name, result in report["workloads"].items():
+        print(
+            f"{name:<10} {result['files']:>8} {result['files_per_second'] or 0:>10.1f} {result['mb_per_second'] or 0:>9.1f} "
+            f"{result['latency_p50_ms'] or 0:>9.2f} {result['latency_p99_ms'] or 0:>9.2f} {result['peak_rss_mb']:>8.1f}"
+        )
+        previous = (baseline or {}).get("workloads", {}).get(name)
+        if previous:
+            changes = []
+            for metric, higher_is_better in COMPARED_METRICS.items():
+                old, new = previous.get(metric), result.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old * 100
+                worse = -change if higher_is_better else change
+                changes.append(f"{metric} {change:+.1f}%{' ⚠' if worse > REGRESSION_THRESHOLD_PERCENT else ''}")
+            print(f"{'':<10} 比較: {', '.join(changes)}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="ローカルのGraph代替サーバーに対するアップロード性能のベンチマーク")
+    parser.add_argument("--workloads", default="tiny,huge,mixed", help="実行するワークロード（カンマ区切り）")
+    parser.add_argument("--scale", type=float, default=1.0, help="ファイル数・サイズの倍率（0.1なら素早く確認できる）")
+    parser.add_argument("--workers", type=int, default=8, help="並列アップロード数")
+    parser.add_argument("--output", help="JSONレポートの出力先")
+    parser.add_argument("--compare", help="比較対象のJSONレポート（以前のリリースの結果など）")
+    parser.add_argument("--data-root", help="テストデータの作成先（既定は一時ディレクトリ、終了時に削除）")
+    parser.add_argument("--endpoint", help="起動済みのGraph代替サーバーのエンドポイント（省略時は自動で起動）")
+    parser.add_argument("--verbose", action="store_true", help="子プロセスのログを表示する")
+    # 内部用: 子プロセスとして1つのワークロードを実行する
+    parser.add_argument("--run-workload", help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.run_workload:
+        result = run_workload(args.data_dir, f"benchmark/{args.run_workload}", args.workers)
+        print(json.dumps(result))
+        return
+
+    names = [name.strip() for name in args.workloads.split(",") if name.strip()]
+    data_root = args.data_root or tempfile.mkdtemp(prefix="upload_benchmark_")
+    server = None
+    endpoint = args.endpoint
+    try:
+        if endpoint is None:
+            server, endpoint = start_server()
+        report = {**environment_info(args.workers, args.scale), "endpoint": endpoint, "workloads": {}}
+        for name in names:
+            data_dir = os.path.join(data_root, name)
+            files = workload_files(name, args.scale)
+            if not os.path.isdir(data_dir):
+                print(f"テストデータを作成しています: {name} ({len(files)}ファイル)", file=sys.stderr)
+                create_dataset(data_dir, files)
+            work_dir = tempfile.mkdtemp(prefix=f"{name}_", dir=data_root)
+            print(f"計測中: {name}", file=sys.stderr)
+            report["workloads"][name] = run_child(name, data_dir, endpoint, args.workers, work_dir,
+                                                  verbose=args.verbose)
+            shutil.rmtree(work_dir, ignore_errors=True)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if not args.data_root:
+            shutil.rmtree(data_root, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_summary(report, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"レポートを保存しました: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
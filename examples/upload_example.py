@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import os
+import shutil
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -27,23 +28,26 @@ def upload_single_file_example():
 
 
 def upload_multiple_files_example():
-    """複数ファイルのアップロード例"""
+    """複数ファイルのアップロード例（ワーカープールによる並列アップロード）"""
     uploader = OneDriveUploader()
     uploader.initialize()
     
-    # フォルダーの作成
-    uploader.create_folder("batch_upload")
-    
-    # 複数のファイルをアップロード
+    # テスト用ディレクトリの作成
+    local_dir = "batch_upload"
+    os.makedirs(local_dir, exist_ok=True)
     for i in range(3):
-        filename = f"file_{i+1}.txt"
+        filename = os.path.join(local_dir, f"file_{i+1}.txt")
         with open(filename, "w", encoding="utf-8") as f:
             f.write(f"ファイル番号: {i+1}\n")
-        
-        remote_path = f"batch_upload/{filename}"
-        uploader.upload_file(filename, remote_path)
-        
-        os.remove(filename)
+    
+    # ディレクトリ全体を並列でアップロード
+    results = uploader.upload_directory(local_dir, "batch_upload", workers=4)
+    for result in results:
+        status = "成功" if result["success"] else f"失敗 ({result['error']})"
+        print(f"  {result['remote_path']}: {status}")
+    
+    # クリーンアップ
+    shutil.rmtree(local_dir)
     
     # アップロードしたファイルの一覧表示
     uploader.list_files("batch_upload")
@@ -59,9 +63,8 @@ def upload_large_file_example():
     with open(large_file, "wb") as f:
         f.write(b"0" * (5 * 1024 * 1024))
     
-    # アップロード（進捗表示付き）
+    # アップロード（進捗表示付き、親フォルダーは自動的に作成される）
     remote_path = "large_files/large_file.bin"
-    uploader.create_folder("large_files")
     uploader.upload_file(large_file, remote_path)
     
     # クリーンアップ
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import sys
+from typing import Optional, Dict, Any, Union
+
+import aiohttp
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.auth.token_provider import TokenProvider, StaticTokenProvider
+from src.utils.config import Config
+
+
+# OneDriveClientのasyncio版
+# 1つのClientSessionを共有し、同時実行数はセマフォで制限する
+# アップロードはセマフォを取得してから読み込むため、メモリに保持する本文は同時実行数までに収まる
+# トークンは同期版と同じプロバイダーから取得し、期限前の更新と401を受けた後の1回の送り直しを行う
+class AsyncOneDriveClient:
+    def __init__(self, auth_token: Union[str, TokenProvider, StaticTokenProvider], max_concurrency: Optional[int] = None,
+                 session: Optional[aiohttp.ClientSession] = None):
+        # 文字列なら固定のトークン、プロバイダーなら期限前に更新されたトークンを使う
+        if isinstance(auth_token, str):
+            auth_token = StaticTokenProvider(auth_token)
+        self.token_provider = auth_token
+        # Authorizationヘッダーは送信のたびにプロバイダーのトークンで付ける
+        self.headers = {
+            'Accept': 'application/json'
+        }
+        self.base_url = Config.GRAPH_API_ENDPOINT
+        self.max_concurrency = max_concurrency or Config.ASYNC_MAX_CONCURRENCY
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._session = session
+        self._owns_session = session is None
+
+    async def __aenter__(self):
+        self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.max_concurrency)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._owns_session = True
+        return self._session
+
+    async def close(self):
+        self.token_provider.close()
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _request(self, method: str, url: str, expected_statuses=(), **kwargs) -> Dict[str, Any]:
+        async with self._semaphore:
+            return await self._send(method, url, expected_statuses, **kwargs)
+
+    async def _send(self, method: str, url: str, expected_statuses=(), authenticated: bool = True,
+                    **kwargs) -> Dict[str, Any]:
+        # セマフォを取得した状態で呼ぶ。レスポンス本文は読み切り、接続をすぐプールに戻す
+        # アップロードURLへのフラグメント送信は事前認証済みのため、authenticated=Falseで認証ヘッダーを付けない
+        reauthenticated = False
+        while True:
+            if authenticated:
+                # トークンの更新はMSALの同期APIを呼ぶため、イベントループを止めないようスレッドで行う
+                token = await asyncio.to_thread(self.token_provider.get_token)
+                kwargs['headers'] = {**(kwargs.get('headers') or {}), 'Authorization': f'Bearer {token}'}
+            async with self._get_session().request(method, url, **kwargs) as response:
+                if response.status == 401 and authenticated and not reauthenticated:
+                    # 期限切れのトークンを更新して1回だけ送り直す（同時に401を受けた他のタスクは更新後のトークンを使う）
+                    if await asyncio.to_thread(self.token_provider.refresh, token):
+                        reauthenticated = True
+                        continue
+                if response.status in expected_statuses:
+                    return {"status_code": response.status}
+                response.raise_for_status()
+                if response.status == 204:
+                    return {}
+                return await response.json(content_type=None)
+
+    async def upload_file(self, file_path: str, remote_path: str, progress_callback=None) -> Dict[str, Any]:
+        file_size = os.path.getsize(file_path)
+
+        if file_size < 4 * 1024 * 1024:  # 4MB未満
+            return await self._simple_upload(file_path, remote_path)
+        else:
+            return await self._resumable_upload(file_path, remote_path, progress_callback)
+
+    async def _simple_upload(self, file_path: str, remote_path: str) -> Dict[str, Any]:
+        upload_url = f"{self.base_url}/me/drive/root:/{remote_path}:/content"
+
+        async with self._semaphore:
+            data = await asyncio.to_thread(_read_file, file_path)
+            return await self._send(
+                'PUT',
+                upload_url,
+                headers={**self.headers, 'Content-Type': 'application/octet-stream'},
+                data=data
+            )
+
+    async def _resumable_upload(self, file_path: str, remote_path: str, progress_callback=None) -> Dict[str, Any]:
+        file_size = os.path.getsize(file_path)
+
+        # アップロードセッションの作成
+        create_session_url = f"{self.base_url}/me/drive/root:/{remote_path}:/createUploadSession"
+        session_result = await self._request(
+            'POST',
+            create_session_url,
+            headers=self.headers,
+            json={
+                "item": {
+                    "@microsoft.graph.conflictBehavior": "replace"
+                }
+            }
+        )
+        upload_url = session_result['uploadUrl']
+
+        # チャンクサイズ（10MB）
+        chunk_size = 10 * 1024 * 1024
+
+        with open(file_path, 'rb') as f:
+            uploaded = 0
+
+            while uploaded < file_size:
+                async with self._semaphore:
+                    chunk = await asyncio.to_thread(f.read, chunk_size)
+                    chunk_len = len(chunk)
+
+                    headers = {
+                        'Content-Length': str(chunk_len),
+                        'Content-Range': f'bytes {uploaded}-{uploaded + chunk_len - 1}/{file_size}'
+                    }
+
+                    result = await self._send('PUT', upload_url, authenticated=False, headers=headers, data=chunk)
+                # 次のセマフォ待ちの間に送信済みのフラグメントを保持しない
+                del chunk
+
+                uploaded += chunk_len
+
+                if progress_callback:
+                    progress_callback(uploaded, file_size)
+
+                if uploaded >= file_size:
+                    return result
+
+        return {}
+
+    async def create_folder(self, folder_path: str) -> Dict[str, Any]:
+        parent_path = "/".join(folder_path.split("/")[:-1])
+        folder_name = folder_path.split("/")[-1]
+
+        if parent_path:
+            create_url = f"{self.base_url}/me/drive/root:/{parent_path}:/children"
+        else:
+            create_url = f"{self.base_url}/me/drive/root/children"
+
+        result = await self._request(
+            'POST',
+            create_url,
+            expected_statuses=(409,),
+            headers=self.headers,
+            json={
+                "name": folder_name,
+                "folder": {},
+                "@microsoft.graph.conflictBehavior": "fail"
+            }
+        )
+
+        if result.get("status_code") == 409:  # すでに存在
+            return {"status": "already_exists"}
+        return result
+
+    async def list_files(self, folder_path: str = "") -> Dict[str, Any]:
+        if folder_path:
+            list_url = f"{self.base_url}/me/drive/root:/{folder_path}:/children"
+        else:
+            list_url = f"{self.base_url}/me/drive/root/children"
+
+        return await self._request('GET', list_url, headers=self.headers)
+
+    async def get_file_info(self, file_path: str) -> Optional[Dict[str, Any]]:
+        info_url = f"{self.base_url}/me/drive/root:/{file_path}"
+
+        result = await self._request('GET', info_url, expected_statuses=(404,), headers=self.headers)
+
+        if result.get("status_code") == 404:
+            return None
+        return result
+
+    async def delete_file(self, file_path: str) -> bool:
+        delete_url = f"{self.base_url}/me/drive/root:/{file_path}"
+
+        await self._request('DELETE', delete_url, expected_statuses=(404,), headers=self.headers)
+        return True
+
+
+def _read_file(file_path: str) -> bytes:
+    with open(file_path, 'rb') as f:
+        return f.read()
@@ -0,0 +1,232 @@
+import time
+from typing import Optional, Dict, Any, List
+from urllib.parse import quote
+
+
+# JSON $batchの1リクエストあたりの上限
+MAX_BATCH_SIZE = 20
+# 個別にリトライするステータスコード（424は依存先の失敗）
+RETRY_STATUS_CODES = (424, 429, 503, 504)
+# $batchの応答に含まれなかったリクエストに付けるステータス（失敗として扱う）
+MISSING_RESPONSE_STATUS = 0
+
+
+def item_path_url(path: str, suffix: str = "") -> str:
+    # $batch内のURLはバージョン以下の相対パスで、パスはエンコードが必要
+    return f"/me/drive/root:/{quote(path.strip('/'), safe='/')}{suffix}"
+
+
+class BatchResponse:
+    def __init__(self, request_id: str, status: int, body: Optional[Dict[str, Any]] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        self.id = request_id
+        self.status = status
+        self.body = body or {}
+        self.headers = headers or {}
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+class BatchError(Exception):
+    def __init__(self, message: str, failures: Dict[str, BatchResponse], results: Dict[str, Any]):
+        super().__init__(message)
+        self.failures = failures
+        self.results = results
+
+
+# 複数のメタデータ操作を /$batch にまとめて送る
+# dependsOnで結ばれたリクエストは同じバッチに入るようにグループ化する
+# 20件を超えてつながっている場合は追加順（依存先が先）に分けて順に送り、前のバッチの依存先が
+# 失敗していれば送らずに424とする
+class GraphBatch:
+    def __init__(self, client, max_retries: int = 3):
+        self.client = client
+        self.max_retries = max_retries
+        self._requests: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, method: str, url: str, body: Optional[Dict[str, Any]] = None,
+            headers: Optional[Dict[str, str]] = None, depends_on: Optional[List[str]] = None,
+            request_id: Optional[str] = None) -> str:
+        request_id = request_id or str(len(self._requests) + 1)
+        if request_id in self._requests:
+            raise ValueError(f"リクエストIDが重複しています: {request_id}")
+        for dependency in depends_on or []:
+            if dependency not in self._requests:
+                raise ValueError(f"依存先のリクエストが見つかりません: {dependency}")
+
+        request = {"id": request_id, "method": method, "url": url}
+        if body is not None:
+            request["body"] = body
+            request["headers"] = {"Content-Type": "application/json", **(headers or {})}
+        elif headers:
+            request["headers"] = headers
+        if depends_on:
+            request["dependsOn"] = list(depends_on)
+        self._requests[request_id] = request
+        return request_id
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+    def _group(self, request_ids: List[str]) -> List[List[str]]:
+        # 依存関係でつながったリクエストを1つのグループにまとめる（Union-Find）
+        parent = {request_id: request_id for request_id in request_ids}
+
+        def find(request_id):
+            while parent[request_id] != request_id:
+                parent[request_id] = parent[parent[request_id]]
+                request_id = parent[request_id]
+            return request_id
+
+        for request_id in request_ids:
+            for dependency in self._requests[request_id].get("dependsOn", []):
+                if dependency in parent:
+                    parent[find(request_id)] = find(dependency)
+
+        components: Dict[str, List[str]] = {}
+        for request_id in request_ids:
+            components.setdefault(find(request_id), []).append(request_id)
+
+        # 追加順を保ったままバッチに詰める
+        batches: List[List[str]] = []
+        for component in components.values():
+            if len(component) > MAX_BATCH_SIZE:
+                # 分けた部分は順に送る必要があるため、それぞれ末尾に新しいバッチとして追加する
+                for start in range(0, len(component), MAX_BATCH_SIZE):
+                    batches.append(component[start:start + MAX_BATCH_SIZE])
+                continue
+            for batch in batches:
+                if len(batch) + len(component) <= MAX_BATCH_SIZE:
+                    batch.extend(component)
+                    break
+            else:
+                batches.append(list(component))
+        return batches
+
+    def _send(self, request_ids: List[str]) -> Dict[str, BatchResponse]:
+        pending = set(request_ids)
+        requests_payload = []
+        for request_id in request_ids:
+            request = dict(self._requests[request_id])
+            if "dependsOn" in request:
+                # 既に成功済みの依存先は除外する
+                request["dependsOn"] = [d for d in request["dependsOn"] if d in pending]
+                if not request["dependsOn"]:
+                    del request["dependsOn"]
+            requests_payload.append(request)
+
+        response = self.client._request(
+            'POST',
+            f"{self.client.base_url}/$batch",
+            headers={**self.client.headers, 'Content-Type': 'application/json'},
+            json={"requests": requests_payload}
+        )
+        response.raise_for_status()
+
+        responses = {}
+        for item in response.json().get("responses", []):
+            if item.get("id") not in pending:
+                continue
+            responses[item["id"]] = BatchResponse(
+                item["id"],
+                int(item.get("status", 0)),
+                item.get("body"),
+                item.get("headers")
+            )
+        # 応答が返らなかったリクエストは成功したかわからないため、失敗として残す
+        for request_id in request_ids:
+            if request_id not in responses:
+                responses[request_id] = BatchResponse(
+                    request_id, MISSING_RESPONSE_STATUS,
+                    {"error": {"code": "missingResponse", "message": "$batchの応答に含まれていません"}}
+                )
+        return responses
+
+    def _retryable(self, request_ids: List[str], results: Dict[str, BatchResponse], accepted_statuses) -> set:
+        retry_ids = {
+            request_id for request_id in request_ids
+            if request_id in results and results[request_id].status in RETRY_STATUS_CODES
+            and results[request_id].status != 424
+        }
+
+        def satisfied(dependency):
+            item = results.get(dependency)
+            return dependency in retry_ids or (item is not None and (item.ok or item.status in accepted_statuses))
+
+        # 424（依存先の失敗）は、依存先が再送対象か、想定内のステータス（例: 409）で終わった場合のみ再送する
+        changed = True
+        while changed:
+            changed = False
+            for request_id in request_ids:
+                item = results.get(request_id)
+                if item is None or item.status != 424 or request_id in retry_ids:
+                    continue
+                if all(satisfied(d) for d in self._requests[request_id].get("dependsOn", [])):
+                    retry_ids.add(request_id)
+                    changed = True
+        return retry_ids
+
+    def _skip_failed_dependencies(self, request_ids: List[str], results: Dict[str, BatchResponse],
+                                  accepted_statuses) -> List[str]:
+        # 前のバッチで送った依存先が失敗していれば、Graphと同じく424として送らない
+        in_batch = set(request_ids)
+        send = []
+        for request_id in request_ids:
+            failed = [
+                dependency for dependency in self._requests[request_id].get("dependsOn", [])
+                if dependency not in in_batch and dependency in results
+                and not (results[dependency].ok or results[dependency].status in accepted_statuses)
+            ]
+            if failed:
+                results[request_id] = BatchResponse(
+                    request_id, 424, {"error": {"code": "failedDependency", "message": ", ".join(failed)}}
+                )
+                in_batch.discard(request_id)
+            else:
+                send.append(request_id)
+        return send
+
+    def execute(self, accepted_statuses=()) -> Dict[str, BatchResponse]:
+        # accepted_statuses: 依存先がこのステータスで終わっても後続を実行してよいもの
+        results: Dict[str, BatchResponse] = {}
+        remaining = list(self._requests)
+        attempt = 0
+
+        while remaining:
+            for batch in self._group(remaining):
+                batch = self._skip_failed_dependencies(batch, results, accepted_statuses)
+                if batch:
+                    results.update(self._send(batch))
+
+            retry_ids = self._retryable(remaining, results, accepted_statuses)
+            if not retry_ids:
+                break
+            # スロットリングされた項目（とその失敗で実行されなかった項目）だけを再送する
+            # 424のみの再送は毎回少なくとも1段階進むため、リトライ回数には数えない
+            throttled = [request_id for request_id in retry_ids if results[request_id].status != 424]
+            if throttled:
+                if attempt >= self.max_retries:
+                    break
+                retry_after = max(_retry_after_seconds(results[request_id].headers) for request_id in throttled)
+                rate_limiter = getattr(self.client, "rate_limiter", None)
+                if rate_limiter is not None:
+                    # 共有のレート制限を止め、他のワーカーのリクエストも同じ間待たせる
+                    rate_limiter.pause(retry_after or 2 ** attempt)
+                else:
+                    time.sleep(retry_after or 2 ** attempt)
+                attempt += 1
+            remaining = [request_id for request_id in remaining if request_id in retry_ids]
+
+        return results
+
+
+def _retry_after_seconds(headers: Dict[str, str]) -> float:
+    for key, value in headers.items():
+        if key.lower() == "retry-after":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 0.0
@@ -0,0 +1,124 @@
+import os
+import sys
+import threading
+from collections import deque
+from typing import Optional
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.config import Config
+
+
+# Graph APIのフラグメントは320KiBの倍数、最大60MiB
+FRAGMENT_UNIT = 320 * 1024
+MAX_FRAGMENT_SIZE = 192 * FRAGMENT_UNIT
+
+
+def align_fragment_size(size: int) -> int:
+    size = min(size, MAX_FRAGMENT_SIZE)
+    return max(FRAGMENT_UNIT, size - size % FRAGMENT_UNIT)
+
+
+# 固定のチャンクサイズと単純アップロードの閾値を使う（従来の動作）
+class FixedChunkSizer:
+    def __init__(self, chunk_size: Optional[int] = None, simple_upload_threshold: Optional[int] = None):
+        self.chunk_size = align_fragment_size(chunk_size or Config.UPLOAD_CHUNK_SIZE)
+        self.simple_threshold = simple_upload_threshold or Config.SIMPLE_UPLOAD_THRESHOLD
+
+    def next_size(self) -> int:
+        return self.chunk_size
+
+    def max_fragment_size(self) -> int:
+        return self.chunk_size
+
+    def simple_upload_threshold(self) -> int:
+        return self.simple_threshold
+
+    def record_fragment(self, size: int, elapsed: float):
+        pass
+
+    def record_failure(self):
+        pass
+
+    def record_rtt(self, elapsed: float):
+        pass
+
+
+# フラグメントごとのスループットとRTTを計測してチャンクサイズを調整する
+# 1つのインスタンスをクライアント内の全アップロードで共有し、計測結果をファイル間で引き継ぐ
+class AdaptiveChunkSizer:
+    # RTTがフラグメント送信時間の1割以下になるサイズを下限とする
+    RTT_FACTOR = 9
+    # 1回の調整で変化させる最大倍率
+    MAX_STEP = 2.0
+    SMOOTHING = 0.3
+
+    def __init__(self, initial_size: Optional[int] = None, min_size: Optional[int] = None,
+                 max_size: Optional[int] = None, target_seconds: Optional[float] = None):
+        self.min_size = align_fragment_size(min_size or FRAGMENT_UNIT)
+        self.max_size = align_fragment_size(max_size or Config.ADAPTIVE_CHUNK_MAX_SIZE)
+        self.target_seconds = target_seconds or Config.ADAPTIVE_CHUNK_TARGET_SECONDS
+        self._size = self._clamp(initial_size or Config.UPLOAD_CHUNK_SIZE)
+        self._throughput = None  # bytes/s
+        self._rtt_samples = deque(maxlen=20)
+        self._lock = threading.Lock()
+
+    def _clamp(self, size: float) -> int:
+        return align_fragment_size(int(min(max(size, self.min_size), self.max_size)))
+
+    @property
+    def throughput(self) -> Optional[float]:
+        return self._throughput
+
+    @property
+    def rtt(self) -> Optional[float]:
+        # サーバー処理時間の影響を除くため最近の最小値を使う
+        with self._lock:
+            return min(self._rtt_samples) if self._rtt_samples else None
+
+    def next_size(self) -> int:
+        with self._lock:
+            return self._size
+
+    def max_fragment_size(self) -> int:
+        return self.max_size
+
+    def simple_upload_threshold(self) -> int:
+        # 1フラグメントに収まるファイルはセッション作成の往復分だけ単純アップロードが安い
+        # 計測前は従来の固定値を使う
+        with self._lock:
+            if self._throughput is None:
+                return Config.SIMPLE_UPLOAD_THRESHOLD
+            return min(self._size, Config.ADAPTIVE_SIMPLE_UPLOAD_MAX)
+
+    def record_rtt(self, elapsed: float):
+        if elapsed > 0:
+            with self._lock:
+                self._rtt_samples.append(elapsed)
+
+    def record_fragment(self, size: int, elapsed: float):
+        rtt = self.rtt or 0.0
+        transfer_time = max(elapsed - rtt, 1e-3)
+        sample = size / transfer_time
+
+        with self._lock:
+            if self._throughput is None:
+                self._throughput = sample
+            else:
+                self._throughput += self.SMOOTHING * (sample - self._throughput)
+
+            desired = self._throughput * max(self.target_seconds, rtt * self.RTT_FACTOR)
+            desired = min(max(desired, self._size / self.MAX_STEP), self._size * self.MAX_STEP)
+            self._size = self._clamp(desired)
+
+    def record_failure(self):
+        # 失敗時は再送コストを抑えるためサイズを半分にする
+        with self._lock:
+            self._size = self._clamp(self._size / self.MAX_STEP)
+
+
+def create_chunk_sizer():
+    if Config.ADAPTIVE_CHUNK_SIZE:
+        return AdaptiveChunkSizer()
+    return FixedChunkSizer()
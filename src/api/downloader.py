@@ -0,0 +1,342 @@
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Any, List, Iterator, Tuple
+
+import requests
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.config import Config
+from src.utils.hashing import matches_remote_hash
+from src.utils.logger import get_logger
+from src.utils.sync_compare import MTIME_TOLERANCE_SECONDS, remote_file_state
+
+
+# ダウンロードURLの期限切れを表すステータスコード（項目を取得し直して新しいURLを使う）
+_EXPIRED_URL_STATUS_CODES = (401, 403, 404, 410)
+# 再試行するステータスコード
+_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+_WRITE_CHUNK_SIZE = 1024 * 1024
+
+
+# 完了した範囲を記録するジャーナル（<保存先>.part.json）
+# 途中で中断しても、同じ版（eTag）の項目であれば未完了の範囲だけを取得し直す
+class RangeJournal:
+    def __init__(self, journal_file: str, item: Dict[str, Any], range_size: int):
+        self.journal_file = journal_file
+        self._lock = threading.Lock()
+        self._state = {
+            "item_id": item.get("id"),
+            "etag": item.get("eTag"),
+            "size": item.get("size", 0),
+            "range_size": range_size,
+            "done": [],
+        }
+        self.done = set(self._load())
+
+    def _load(self) -> List[int]:
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return []
+        # 項目が更新された、または範囲の区切り方が異なる場合は最初から取得する
+        if any(saved.get(key) != self._state[key] for key in ("item_id", "etag", "size", "range_size")):
+            return []
+        return saved.get("done", [])
+
+    def complete(self, index: int):
+        with self._lock:
+            self.done.add(index)
+            self._state["done"] = sorted(self.done)
+            tmp_file = f"{self.journal_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f)
+            os.replace(tmp_file, self.journal_file)
+
+    def remove(self):
+        try:
+            os.remove(self.journal_file)
+        except FileNotFoundError:
+            pass
+
+
+# 大きなファイルを複数のRange要求で並列に取得し、事前に確保した（スパースな）ファイルへ書き込む
+# 完了した範囲はジャーナルに記録して再開でき、最後にquickXorHash（なければsha1Hash）で検証する
+class ParallelDownloader:
+    def __init__(self, client, workers: Optional[int] = None, range_size: Optional[int] = None,
+                 verify: Optional[bool] = None):
+        self.client = client
+        self.workers = max(1, workers or Config.DOWNLOAD_WORKERS)
+        self.range_size = range_size or Config.DOWNLOAD_RANGE_SIZE
+        self.verify = Config.DOWNLOAD_VERIFY_HASH if verify is None else verify
+        self.logger = get_logger()
+
+    def download_file(self, remote_path: str, local_path: str, progress_callback=None,
+                      item: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        started = time.monotonic()
+        item = item or self.client.get_file_info(remote_path)
+        if item is None:
+            raise FileNotFoundError(f"リモートのファイルが見つかりません: {remote_path}")
+        if "folder" in item:
+            raise IsADirectoryError(f"フォルダーはdownload_folderで取得してください: {remote_path}")
+
+        size = item.get("size", 0)
+        part_file = f"{local_path}.part"
+        journal = RangeJournal(f"{part_file}.json", item, self.range_size)
+        ranges = [(index, start, min(start + self.range_size, size) - 1)
+                  for index, start in enumerate(range(0, size, self.range_size))]
+        pending = [r for r in ranges if r[0] not in journal.done]
+        if not os.path.exists(part_file):
+            pending = ranges
+            journal.done.clear()
+
+        os.makedirs(os.path.dirname(os.path.abspath(local_path)), exist_ok=True)
+        fd = os.open(part_file, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            # 全体のサイズを先に確保する（書き込んでいない範囲は多くのファイルシステムでスパースになる）
+            os.ftruncate(fd, size)
+            resumed = sum(end - start + 1 for index, start, end in ranges if index in journal.done)
+            transfer = _RangeTransfer(self.client, remote_path, item, fd, journal, size, resumed, progress_callback)
+            with self.client.metrics.in_flight.track("download"):
+                transfer.run(pending, self.workers)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        verified = None
+        if self.verify:
+            verified = matches_remote_hash(part_file, (item.get("file") or {}).get("hashes"))
+            if verified is False:
+                # どの範囲が壊れているか分からないため、最初から取得し直す必要がある
+                os.remove(part_file)
+                journal.remove()
+                raise IOError(f"ダウンロードしたファイルのハッシュが一致しません: {remote_path}")
+
+        os.replace(part_file, local_path)
+        journal.remove()
+        modified = remote_file_state(item)["modified"]
+        if modified is not None:
+            os.utime(local_path, (modified, modified))
+
+        return {
+            "remote_path": remote_path,
+            "local_path": local_path,
+            "size": size,
+            "ranges": len(ranges),
+            "resumed_ranges": len(ranges) - len(pending),
+            "verified": verified,
+            "elapsed": time.monotonic() - started,
+        }
+
+    def iter_remote_files(self, remote_root: str) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        # (相対パス, 項目) を列挙する。ファイルを含まないフォルダーは項目をNoneとして返す
+        root = remote_root.strip("/")
+        pending = [""]
+        while pending:
+            relative_folder = pending.pop()
+            folder_path = "/".join(part for part in (root, relative_folder) if part)
+            empty = True
+            for item in self.client.iter_files(folder_path):
+                empty = False
+                relative_path = f"{relative_folder}/{item['name']}" if relative_folder else item["name"]
+                if "folder" in item:
+                    pending.append(relative_path)
+                else:
+                    yield relative_path, item
+            if empty and relative_folder:
+                yield relative_folder, None
+
+    def download_folder(self, remote_root: str, local_root: str,
+                        file_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        # フォルダー全体を取得する。ファイル単位でも並列化し、取得済み（サイズと更新日時が一致）のファイルは省略する
+        file_workers = max(1, file_workers or Config.DOWNLOAD_FILE_WORKERS)
+        tasks = []
+        for relative_path, item in self.iter_remote_files(remote_root):
+            local_path = os.path.join(local_root, *relative_path.split("/"))
+            if item is None:
+                os.makedirs(local_path, exist_ok=True)
+                continue
+            remote_path = "/".join(part for part in (remote_root.strip("/"), relative_path) if part)
+            tasks.append((remote_path, local_path, item))
+
+        # 大きいファイルから先に投入して全体の完了時間を短くする
+        tasks.sort(key=lambda task: task[2].get("size", 0), reverse=True)
+        results = []
+        # 各ファイルは開始時に待ち数から外れる
+        self.client.metrics.queue_depth.add(len(tasks), "download")
+        with ThreadPoolExecutor(max_workers=file_workers) as executor:
+            futures = [executor.submit(self._download_folder_entry, *task) for task in tasks]
+            for future in as_completed(futures):
+                results.append(future.result())
+        return results
+
+    def _download_folder_entry(self, remote_path: str, local_path: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        # 1ファイルの失敗で全体を止めないよう、例外は結果として返す
+        self.client.metrics.queue_depth.dec("download")
+        result = {
+            "remote_path": remote_path,
+            "local_path": local_path,
+            "size": item.get("size", 0),
+            "success": False,
+            "skipped": False,
+            "error": None,
+        }
+        try:
+            if self.is_current(local_path, item):
+                result["skipped"] = True
+            else:
+                result.update(self.download_file(remote_path, local_path, item=item))
+            result["success"] = True
+        except Exception as e:
+            result["error"] = str(e)
+        self.client.metrics.files.inc("download", "skipped" if result["skipped"] else
+                                      "success" if result["success"] else "failed")
+        return result
+
+    @staticmethod
+    def is_current(local_path: str, item: Dict[str, Any]) -> bool:
+        # ダウンロード時にリモートの更新日時を設定しているため、サイズと更新日時が一致すれば取得済み
+        try:
+            stat = os.stat(local_path)
+        except FileNotFoundError:
+            return False
+        remote = remote_file_state(item)
+        if remote["size"] != stat.st_size or remote["modified"] is None:
+            return False
+        return abs(stat.st_mtime - remote["modified"]) <= MTIME_TOLERANCE_SECONDS
+
+
+# 1ファイル分の範囲取得。ワーカー間でダウンロードURLと進捗を共有する
+class _RangeTransfer:
+    def __init__(self, client, remote_path: str, item: Dict[str, Any], fd: int, journal: RangeJournal,
+                 size: int, downloaded: int = 0, progress_callback=None):
+        self.client = client
+        self.remote_path = remote_path
+        self.fd = fd
+        self.journal = journal
+        self.size = size
+        self.progress_callback = progress_callback
+        self._lock = threading.Lock()
+        self._download_url = item.get("@microsoft.graph.downloadUrl")
+        self._etag = item.get("eTag")
+        self._downloaded = downloaded
+        self._write_lock = None if hasattr(os, 'pwrite') else threading.Lock()
+
+    def run(self, ranges: List[Tuple[int, int, int]], workers: int):
+        if not ranges:
+            return
+        with ThreadPoolExecutor(max_workers=min(workers, len(ranges)), thread_name_prefix="range-download") as executor:
+            futures = [executor.submit(self._fetch_range, *r) for r in ranges]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def _url(self) -> Tuple[str, Dict[str, str]]:
+        # 事前認証済みのダウンロードURLがあれば使い、なければ/contentへ認証付きで要求する
+        with self._lock:
+            download_url = self._download_url
+        if download_url:
+            return download_url, {}
+        return f"{self.client.base_url}/me/drive/root:/{self.remote_path}:/content", dict(self.client.headers)
+
+    def _renew_url(self, stale_url: str):
+        # 期限切れのURLは1回だけ取得し直し、他のワーカーは更新後のURLを使う
+        with self._lock:
+            if self._download_url != stale_url:
+                return
+            item = self.client.get_file_info(self.remote_path)
+            if item is None:
+                raise FileNotFoundError(f"リモートのファイルが見つかりません: {self.remote_path}")
+            if self._etag is not None and item.get("eTag") != self._etag:
+                # 同じパスに別の内容が置かれた場合は、異なる版の範囲を混ぜずに失敗させる
+                raise IOError(f"ダウンロード中にリモートのファイルが変更されました: {self.remote_path}")
+            self._download_url = item.get("@microsoft.graph.downloadUrl")
+
+    def _fetch_range(self, index: int, start: int, end: int):
+        retries = 0
+        renewals = 0
+        while True:
+            url, headers = self._url()
+            response = None
+            error = None
+            try:
+                response = self.client._request('GET', url, headers={**headers, 'Range': f'bytes={start}-{end}'},
+                                                 stream=True)
+                if response.status_code in _EXPIRED_URL_STATUS_CODES and url == self._download_url:
+                    # 削除やアクセス権の変更で取得し直しても拒否され続ける場合は、回数を制限して失敗させる
+                    renewals += 1
+                    if renewals > Config.CHUNK_MAX_RETRIES:
+                        response.raise_for_status()
+                    self._renew_url(url)
+                    continue
+                if response.status_code not in _RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    self._write_response(response, start, end)
+                    break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                    _TruncatedRangeError) as e:
+                error = e
+            finally:
+                if response is not None:
+                    response.close()
+
+            self.client.metrics.retries.inc("range", self.client._failure_reason(response, error))
+            retries += 1
+            if retries > Config.CHUNK_MAX_RETRIES:
+                if error is not None:
+                    raise error
+                response.raise_for_status()
+            time.sleep(self.client._fragment_retry_delay(response if error is None else None, retries))
+
+        self.journal.complete(index)
+
+    def _write_response(self, response: requests.Response, start: int, end: int):
+        expected = end - start + 1
+        if response.status_code != 206 and not (start == 0 and end == self.size - 1):
+            raise IOError("サーバーが範囲指定に対応していません")
+        offset = start
+        for chunk in response.iter_content(_WRITE_CHUNK_SIZE):
+            if offset + len(chunk) > end + 1:
+                raise IOError("要求した範囲を超えるデータを受信しました")
+            self._write_at(offset, chunk)
+            offset += len(chunk)
+            self._report(len(chunk))
+        if offset != end + 1:
+            # 途中までの分は次の試行で上書きされる
+            self._report(start - offset)
+            raise _TruncatedRangeError(f"範囲の受信が途中で終了しました: {offset - start}/{expected} bytes")
+        self.client.metrics.downloaded_bytes.add(expected)
+
+    def _write_at(self, offset: int, data: bytes):
+        if self._write_lock is None:
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(self.fd, view, offset)
+                view = view[written:]
+                offset += written
+            return
+        with self._write_lock:
+            os.lseek(self.fd, offset, os.SEEK_SET)
+            os.write(self.fd, data)
+
+    def _report(self, length: int):
+        if not self.progress_callback:
+            return
+        with self._lock:
+            self._downloaded += length
+            downloaded = self._downloaded
+        self.progress_callback(downloaded, self.size)
+
+
+class _TruncatedRangeError(IOError):
+    pass
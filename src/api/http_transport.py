@@ -0,0 +1,68 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.config import Config
+
+
+# ホストごとのKeep-Alive接続プールを持つHTTPトランスポート
+# urllib3のPoolManagerはスレッドセーフなため、複数のワーカーから共有できる
+class HttpTransport:
+    def __init__(self, pool_connections: Optional[int] = None, pool_maxsize: Optional[int] = None,
+                 pool_block: Optional[bool] = None):
+        self.pool_connections = pool_connections or Config.HTTP_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or Config.HTTP_POOL_MAXSIZE
+        self.pool_block = Config.HTTP_POOL_BLOCK if pool_block is None else pool_block
+
+        self.adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session.request(method, url, **kwargs)
+
+    def warm_up(self, url: str, headers: Optional[Dict[str, str]] = None, connections: int = 1) -> int:
+        # 軽量なGETでTCP+TLSハンドシェイクを事前に済ませ、接続をプールに戻しておく
+        connections = max(1, min(connections, self.pool_maxsize))
+
+        def _touch(_):
+            response = self.session.get(url, headers=headers)
+            response.close()
+            return response.status_code
+
+        if connections == 1:
+            _touch(0)
+        else:
+            with ThreadPoolExecutor(max_workers=connections) as executor:
+                list(executor.map(_touch, range(connections)))
+        return connections
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        # ホストごとの新規接続数・リクエスト数・再利用回数
+        stats = {}
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{key.key_scheme}://{key.key_host}:{key.key_port or ''}".rstrip(":")
+            entry = stats.setdefault(host, {"connections": 0, "requests": 0, "reused": 0})
+            entry["connections"] += pool.num_connections
+            entry["requests"] += pool.num_requests
+            entry["reused"] += max(0, pool.num_requests - pool.num_connections)
+        return stats
+
+    def close(self):
+        self.session.close()
@@ -1,50 +1,467 @@
 import os
+import time
 import requests
-from typing import Optional, Dict, Any
+from requests.utils import super_len
+from typing import Optional, Dict, Any, List, Iterator, Union
 import sys
 
 # プロジェクトルートをPythonパスに追加
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from src.utils.config import Config
+from src.auth.token_provider import TokenProvider, StaticTokenProvider
+from src.api.http_transport import HttpTransport
+from src.api.chunk_sizer import create_chunk_sizer
+from src.api.batch import GraphBatch, BatchError, BatchResponse, item_path_url
+from src.api.upload_writer import UploadWriter
+from src.api.downloader import ParallelDownloader
+from src.utils.graph_datetime import parse_graph_datetime
+from src.utils.session_journal import UploadSessionJournal, get_session_journal
+from src.utils.buffer_pool import BufferPool, read_into
+from src.utils.chunk_reader import buffers_per_reader, open_chunk_reader
+from src.utils.folder_cache import KnownFoldersCache, folder_ancestors
+from src.utils.rate_limiter import RateLimiter, get_rate_limiter, parse_retry_after
+from src.utils.metrics import get_metrics, endpoint_label
+
+
+class UploadSessionLostError(requests.HTTPError):
+    pass
 
 
 class OneDriveClient:
-    def __init__(self, auth_token: str):
-        self.auth_token = auth_token
-        self.headers = {
-            'Authorization': f'Bearer {auth_token}',
+    # チャンク単位でリトライするステータスコード（416は送信位置のずれ）
+    FRAGMENT_RETRY_STATUS_CODES = (408, 416, 429, 500, 502, 503, 504)
+    
+    def __init__(self, auth_token: Union[str, TokenProvider, StaticTokenProvider], transport: Optional[HttpTransport] = None,
+                 journal: Optional[UploadSessionJournal] = None, chunk_sizer=None,
+                 buffer_pool: Optional[BufferPool] = None, folder_cache: Optional[KnownFoldersCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        # 文字列なら固定のトークン、プロバイダーなら期限前に更新されたトークンを使う
+        if isinstance(auth_token, str):
+            auth_token = StaticTokenProvider(auth_token)
+        self.token_provider = auth_token
+        self.base_url = Config.GRAPH_API_ENDPOINT
+        # 全リクエストで共有するKeep-Alive接続プール
+        self.transport = transport or HttpTransport()
+        # 中断したアップロードセッションを再開するためのジャーナル（空文字で無効化）
+        if journal is None and Config.UPLOAD_SESSION_JOURNAL:
+            journal = get_session_journal(Config.UPLOAD_SESSION_JOURNAL)
+        self.journal = journal
+        # フラグメントサイズと単純/セッションアップロードの切り替えを決める
+        self.chunk_sizer = chunk_sizer or create_chunk_sizer()
+        # チャンク読み込み用バッファ（全アップロードで共有し、メモリ使用量の上限を決める）
+        self.buffer_pool = buffer_pool or BufferPool(
+            self.chunk_sizer.max_fragment_size(),
+            Config.UPLOAD_BUFFER_POOL_SIZE or self._buffers_for(Config.UPLOAD_WORKERS)
+        )
+        # 存在が分かっているフォルダー（作成リクエストを省略する）
+        if folder_cache is None:
+            folder_cache = KnownFoldersCache(Config.KNOWN_FOLDERS_CACHE or None)
+        self.folder_cache = folder_cache
+        # プロセス内の全クライアントで共有するレート制限（スロットリング時は全ワーカーが停止する）
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.metrics = get_metrics()
+    
+    @staticmethod
+    def _buffers_for(workers: int) -> int:
+        return max(1, workers) * buffers_per_reader(Config.UPLOAD_PREFETCH_DEPTH)
+    
+    def reserve_upload_buffers(self, workers: int) -> bool:
+        # 並列アップロードの全ワーカーがバッファを待たずに読み込めるよう、プールの上限を引き上げる
+        # UPLOAD_BUFFER_POOL_SIZEでメモリの上限を指定している場合は変更せず、足りるかどうかだけを返す
+        needed = self._buffers_for(workers)
+        if Config.UPLOAD_BUFFER_POOL_SIZE:
+            return self.buffer_pool.max_buffers >= needed
+        self.buffer_pool.reserve(needed)
+        return True
+    
+    @property
+    def auth_token(self) -> str:
+        return self.token_provider.get_token()
+    
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            'Authorization': f'Bearer {self.auth_token}',
             'Accept': 'application/json'
         }
-        self.base_url = Config.GRAPH_API_ENDPOINT
+    
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        replays = 0
+        reauthenticated = False
+        body = kwargs.get('data')
+        body_position = body.tell() if hasattr(body, 'seek') and hasattr(body, 'tell') else None
+        body_size = super_len(body) if body is not None else 0
+        endpoint = endpoint_label(method, url, self.base_url, kwargs.get('headers'))
+        while True:
+            self.rate_limiter.acquire()
+            started = time.monotonic()
+            try:
+                response = self.transport.request(method, url, **kwargs)
+            except requests.RequestException:
+                self.metrics.record_request(method, endpoint, "error", time.monotonic() - started, body_size)
+                raise
+            elapsed = time.monotonic() - started
+            self.metrics.record_request(method, endpoint, str(response.status_code), elapsed, body_size)
+            if kwargs.get('data') is None:
+                # 本文を伴わないリクエストの所要時間をRTTの目安にする
+                self.chunk_sizer.record_rtt(elapsed)
+            
+            if response.status_code == 401 and not reauthenticated and self._reauthenticate(kwargs):
+                # 期限切れのトークンを更新して1回だけ送り直す
+                # アップロードURLへのフラグメント送信は認証ヘッダーを使わないため、セッションの進捗は失われない
+                reauthenticated = True
+                if body_position is not None:
+                    body.seek(body_position)
+                continue
+            
+            throttled = self.rate_limiter.observe(response) is not None
+            # フラグメントなど本文をストリーミングするリクエストは呼び出し側で送り直す
+            if not throttled or kwargs.get('data') is not None or replays >= Config.RATE_LIMIT_MAX_REPLAYS:
+                return response
+            replays += 1
+            self.metrics.retries.inc("request", str(response.status_code))
+    
+    def _reauthenticate(self, kwargs: Dict[str, Any]) -> bool:
+        headers = kwargs.get('headers') or {}
+        authorization = headers.get('Authorization')
+        if not authorization:
+            return False
+        token = self.token_provider.refresh(authorization[len('Bearer '):])
+        if not token:
+            return False
+        kwargs['headers'] = {**headers, 'Authorization': f'Bearer {token}'}
+        return True
+    
+    def get_rate_stats(self) -> Dict[str, Any]:
+        return self.rate_limiter.get_stats()
+    
+    def warm_up(self, connections: Optional[int] = None) -> int:
+        # Graph APIへの接続を事前に確立しておく
+        return self.transport.warm_up(
+            f"{self.base_url}/me/drive?$select=id",
+            headers=self.headers,
+            connections=connections or Config.HTTP_WARMUP_CONNECTIONS
+        )
+    
+    def get_connection_stats(self) -> Dict[str, Dict[str, Any]]:
+        return self.transport.get_stats()
+    
+    def close(self):
+        self.token_provider.close()
+        self.transport.close()
     
     def upload_file(self, file_path: str, remote_path: str, progress_callback=None) -> Dict[str, Any]:
         file_size = os.path.getsize(file_path)
         
-        if file_size < 4 * 1024 * 1024:  # 4MB未満
-            return self._simple_upload(file_path, remote_path)
-        else:
-            return self._resumable_upload(file_path, remote_path, progress_callback)
+        with self.metrics.in_flight.track("upload"):
+            if file_size < self.chunk_sizer.simple_upload_threshold():  # 既定は4MB未満
+                result = self._simple_upload(file_path, remote_path)
+            else:
+                result = self._resumable_upload(file_path, remote_path, progress_callback)
+        
+        # パス指定のアップロードは親フォルダーも作成するため、既知のフォルダーとして記録する
+        self.folder_cache.add_parents_of(remote_path)
+        return result
     
     def _simple_upload(self, file_path: str, remote_path: str) -> Dict[str, Any]:
         upload_url = f"{self.base_url}/me/drive/root:/{remote_path}:/content"
         
+        started = time.monotonic()
         with open(file_path, 'rb') as f:
-            response = requests.put(
+            response = self._request(
+                'PUT',
                 upload_url,
                 headers={**self.headers, 'Content-Type': 'application/octet-stream'},
                 data=f
             )
         
         response.raise_for_status()
+        file_size = os.path.getsize(file_path)
+        self.chunk_sizer.record_fragment(file_size, time.monotonic() - started)
+        self.metrics.uploaded_bytes.add(file_size, "simple")
         return response.json()
     
+    def _simple_upload_data(self, remote_path: str, data) -> Dict[str, Any]:
+        # メモリ上のデータを1回のPUTでアップロードする
+        upload_url = f"{self.base_url}/me/drive/root:/{remote_path}:/content"
+        started = time.monotonic()
+        response = self._request(
+            'PUT',
+            upload_url,
+            headers={**self.headers, 'Content-Type': 'application/octet-stream'},
+            data=data
+        )
+        response.raise_for_status()
+        self.chunk_sizer.record_fragment(len(data), time.monotonic() - started)
+        self.metrics.uploaded_bytes.add(len(data), "simple")
+        self.folder_cache.add_parents_of(remote_path)
+        return response.json()
+    
+    def open_write(self, remote_path: str, progress_callback=None, total_size: Optional[int] = None) -> UploadWriter:
+        # 書き込んだデータをそのままアップロードするファイル風オブジェクト（withで使い、閉じると完了する）
+        # 総サイズが事前に分かる場合はtotal_sizeを指定する（全フラグメントのContent-Rangeに総サイズを付ける）
+        return UploadWriter(self, remote_path, progress_callback, total_size)
+    
+    def upload_stream(self, stream, remote_path: str, progress_callback=None,
+                      total_size: Optional[int] = None) -> Dict[str, Any]:
+        # 巻き戻せないストリーム（readintoを持つもの）をアップロードする。長さが分からなければtotal_sizeは省略する
+        # ストリームは巻き戻せないため、中断した場合はセッションをキャンセルして最初からやり直す必要がある
+        with self.metrics.in_flight.track("upload"):
+            writer = self.open_write(remote_path, progress_callback, total_size)
+            try:
+                writer.write_from(stream)
+            except BaseException:
+                writer.abort()
+                raise
+            return writer.close()
+    
+    def _send_last_stream_fragment(self, upload_url: str, remote_path: str, data: memoryview,
+                                   offset: int) -> Dict[str, Any]:
+        total_size = offset + len(data)
+        try:
+            response = self._send_stream_fragment(upload_url, data, offset, total_size)
+            if response is not None:
+                return response.json()
+        except UploadSessionLostError:
+            pass
+        # 最後のフラグメントは届いたが完了レスポンスを受け取れなかった場合
+        item = self.get_file_info(remote_path)
+        if not item or item.get("size") != total_size:
+            raise UploadSessionLostError("アップロードの完了を確認できませんでした")
+        return item
+    
+    def _send_stream_fragment(self, upload_url: str, data: memoryview, offset: int,
+                              total_size: Optional[int]) -> Optional[requests.Response]:
+        # 1フラグメントを送信する。失敗時はサーバーの受信済み位置に合わせ、フラグメントの残りだけを送り直す
+        sent = 0
+        retries = 0
+        total = str(total_size) if total_size is not None else "*"
+        
+        while True:
+            chunk = data[sent:]
+            start = offset + sent
+            headers = {
+                'Content-Length': str(len(chunk)),
+                'Content-Range': f'bytes {start}-{start + len(chunk) - 1}/{total}'
+            }
+            started = time.monotonic()
+            response, error = self._put_fragment(upload_url, headers, chunk)
+            
+            if error is None and response.status_code not in self.FRAGMENT_RETRY_STATUS_CODES:
+                response.raise_for_status()
+                elapsed = time.monotonic() - started
+                self.chunk_sizer.record_fragment(len(chunk), elapsed)
+                end = offset + len(data)
+                accepted = end
+                if response.status_code == 202:
+                    # 一部しか受け取られなかった場合は、バッファを手放す前に残りを送り直す
+                    accepted = min(end, self._accepted_offset(response, end))
+                if accepted < offset:
+                    raise UploadSessionLostError("ストリームの再送に必要なデータが残っていません")
+                self.metrics.record_fragment(max(0, accepted - start), elapsed)
+                if accepted == end:
+                    return response
+                self.metrics.retries.inc("fragment", "partial")
+                if accepted <= start:
+                    # 受信済みの位置が進まない場合は失敗と同じく回数を制限する
+                    retries += 1
+                    if retries > Config.CHUNK_MAX_RETRIES:
+                        raise UploadSessionLostError("フラグメントの受信位置が進みません")
+                sent = accepted - offset
+                continue
+
+            self.chunk_sizer.record_failure()
+            self.metrics.retries.inc("fragment", self._failure_reason(response, error))
+            retries += 1
+            if retries > Config.CHUNK_MAX_RETRIES:
+                if error is not None:
+                    raise error
+                response.raise_for_status()
+            
+            time.sleep(self._fragment_retry_delay(response, retries))
+            expected = self._realign_upload(upload_url, start, offset + len(data))
+            if expected < offset:
+                raise UploadSessionLostError("ストリームの再送に必要なデータが残っていません")
+            sent = min(expected - offset, len(data))
+            if sent == len(data):
+                # このフラグメントは受信済みだったが、応答を受け取れなかった
+                return None
+    
     def _resumable_upload(self, file_path: str, remote_path: str, progress_callback=None) -> Dict[str, Any]:
         file_size = os.path.getsize(file_path)
         
-        # アップロードセッションの作成
+        # アップロードセッションの作成（ジャーナルに記録があれば続きから再開）
+        upload_url, uploaded = self._open_upload_session(file_path, remote_path, file_size)
+        
+        with open(file_path, 'rb', buffering=0) as f:
+            return self._upload_session_from(f, file_path, remote_path, upload_url, uploaded, file_size,
+                                             progress_callback)
+    
+    def _upload_session_from(self, fileobj, file_path: Optional[str], remote_path: str, upload_url: str,
+                             uploaded: int, file_size: int, progress_callback=None) -> Dict[str, Any]:
+        # チャンクサイズ（既定は10MB、適応モードでは計測に応じて変化）のフラグメントを
+        # 共有バッファに直接読み込み、コピーせずにmemoryviewのまま送信する
+        reader = open_chunk_reader(
+            fileobj,
+            uploaded,
+            file_size,
+            self.buffer_pool,
+            self.chunk_sizer.next_size,
+            Config.UPLOAD_PREFETCH_DEPTH
+        )
+        try:
+            return self._send_fragments(file_path, remote_path, upload_url, uploaded, file_size,
+                                        reader, progress_callback)
+        finally:
+            reader.close()
+    
+    def upload_fileobj(self, fileobj, file_size: int, remote_path: str, progress_callback=None) -> Dict[str, Any]:
+        # サイズの分かっているシーク可能なファイル風オブジェクト（seek/readinto）をアップロードする
+        # S3などローカルディスク以外の読み込み元に使う。ジャーナルに記録しないため、中断した場合は最初から送り直す
+        with self.metrics.in_flight.track("upload"):
+            return self._upload_fileobj(fileobj, file_size, remote_path, progress_callback)
+    
+    def _upload_fileobj(self, fileobj, file_size: int, remote_path: str, progress_callback=None) -> Dict[str, Any]:
+        if file_size < self.chunk_sizer.simple_upload_threshold():
+            fileobj.seek(0)
+            data = bytearray(file_size)
+            if read_into(fileobj, memoryview(data)) < file_size:
+                raise IOError("読み込み中にデータのサイズが変更されました")
+            result = self._simple_upload_data(remote_path, data)
+            if progress_callback:
+                progress_callback(file_size, file_size)
+            return result
+        
+        upload_url = self._create_upload_session(None, remote_path)
+        try:
+            result = self._upload_session_from(fileobj, None, remote_path, upload_url, 0, file_size,
+                                               progress_callback)
+        except BaseException:
+            self.cancel_upload_session(upload_url)
+            raise
+        self.folder_cache.add_parents_of(remote_path)
+        return result
+    
+    def _send_fragments(self, file_path: Optional[str], remote_path: str, upload_url: str, uploaded: int, file_size: int,
+                        reader, progress_callback=None) -> Dict[str, Any]:
+        if uploaded and progress_callback:
+            progress_callback(uploaded, file_size)
+        
+        # リトライ回数はチャンク単位とファイル全体の両方で制限する
+        chunk_retries = 0
+        file_retries = 0
+        
+        while uploaded < file_size:
+            fragment = reader.next()
+            chunk = fragment.data
+            chunk_len = len(chunk)
+            
+            headers = {
+                'Content-Length': str(chunk_len),
+                'Content-Range': f'bytes {uploaded}-{uploaded + chunk_len - 1}/{file_size}'
+            }
+            
+            started = time.monotonic()
+            try:
+                response, error = self._put_fragment(upload_url, headers, chunk)
+            finally:
+                reader.release(fragment)
+            
+            if error is not None or response.status_code in self.FRAGMENT_RETRY_STATUS_CODES:
+                self.chunk_sizer.record_failure()
+                self.metrics.retries.inc("fragment", self._failure_reason(response, error))
+                chunk_retries += 1
+                file_retries += 1
+                if chunk_retries > Config.CHUNK_MAX_RETRIES or file_retries > Config.FILE_MAX_RETRIES:
+                    if error is not None:
+                        raise error
+                    response.raise_for_status()
+                
+                time.sleep(self._fragment_retry_delay(response, chunk_retries))
+                # 失敗したチャンクだけを送り直すため、サーバーが受け取り済みの位置に合わせる
+                uploaded = self._realign_upload(upload_url, uploaded, file_size)
+                reader.restart(uploaded)
+                continue
+            
+            response.raise_for_status()
+            elapsed = time.monotonic() - started
+
+            accepted = uploaded + chunk_len
+            if response.status_code == 202:
+                # サーバーがフラグメントの一部しか受け取っていない場合は、次のフラグメントで416を受けて
+                # 待機するのではなく、nextExpectedRangesの位置からすぐに続ける
+                accepted = min(accepted, self._accepted_offset(response, accepted))
+            accepted_len = max(0, accepted - uploaded)
+            self.metrics.record_fragment(accepted_len, elapsed)
+            if accepted_len:
+                self.chunk_sizer.record_fragment(accepted_len, elapsed)
+                chunk_retries = 0
+            else:
+                # 受信済みの位置が進まない（または戻った）場合は失敗と同じく回数を制限して待機する
+                self.chunk_sizer.record_failure()
+                chunk_retries += 1
+                file_retries += 1
+                if chunk_retries > Config.CHUNK_MAX_RETRIES or file_retries > Config.FILE_MAX_RETRIES:
+                    raise UploadSessionLostError("フラグメントの受信位置が進みません")
+                time.sleep(self._fragment_retry_delay(response, chunk_retries))
+            if accepted < uploaded + chunk_len:
+                self.metrics.retries.inc("fragment", "partial")
+                uploaded = accepted
+                reader.restart(uploaded)
+            else:
+                uploaded = accepted
+            
+            if progress_callback:
+                progress_callback(uploaded, file_size)
+            
+            if uploaded >= file_size:
+                self._forget_upload_session(file_path, remote_path)
+                return response.json()
+            
+            self._record_upload_progress(file_path, remote_path, uploaded, response)
+        
+        # 全バイト送信済みだが完了レスポンスを受け取る前に中断していた場合
+        self._forget_upload_session(file_path, remote_path)
+        return self.get_file_info(remote_path) or {}
+    
+    def _put_fragment(self, upload_url: str, headers: Dict[str, str], chunk):
+        # (レスポンス, 通信エラー) を返す
+        try:
+            return self._request('PUT', upload_url, headers=headers, data=chunk), None
+        except (requests.ConnectionError, requests.Timeout) as e:
+            return None, e
+    
+    @staticmethod
+    def _failure_reason(response: Optional[requests.Response], error: Optional[Exception]) -> str:
+        return str(response.status_code) if error is None else "connection"
+    
+    @staticmethod
+    def _fragment_retry_delay(response: Optional[requests.Response], attempt: int) -> float:
+        # Retry-Afterがあれば従い、なければ指数バックオフ
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return retry_after
+        return min(Config.CHUNK_RETRY_DELAY * (2 ** (attempt - 1)), Config.CHUNK_RETRY_MAX_DELAY)
+    
+    def _realign_upload(self, upload_url: str, uploaded: int, file_size: int) -> int:
+        try:
+            status = self.get_upload_session_status(upload_url)
+        except (requests.ConnectionError, requests.Timeout):
+            # 状態を確認できない場合は同じ位置から送り直す
+            return uploaded
+        except requests.HTTPError:
+            return uploaded
+        
+        if status is None:
+            raise UploadSessionLostError("アップロードセッションが失効しました")
+        return self._next_expected_offset(status, file_size)
+    
+    def _create_upload_session(self, file_path: Optional[str], remote_path: str) -> str:
         create_session_url = f"{self.base_url}/me/drive/root:/{remote_path}:/createUploadSession"
-        session_response = requests.post(
+        session_response = self._request(
+            'POST',
             create_session_url,
             headers=self.headers,
             json={
@@ -54,37 +471,118 @@ class OneDriveClient:
             }
         )
         session_response.raise_for_status()
-        upload_url = session_response.json()['uploadUrl']
+        session = session_response.json()
         
-        # チャンクサイズ（10MB）
-        chunk_size = 10 * 1024 * 1024
+        # ストリームからのアップロード（file_pathなし）はプロセスをまたいで再開できないため記録しない
+        if self.journal is not None and file_path is not None:
+            self.journal.record(
+                file_path,
+                remote_path,
+                session['uploadUrl'],
+                parse_graph_datetime(session.get('expirationDateTime'))
+            )
+        return session['uploadUrl']
+    
+    def _open_upload_session(self, file_path: str, remote_path: str, file_size: int):
+        # (uploadUrl, 送信済みバイト数) を返す
+        if self.journal is not None:
+            entry = self.journal.get(file_path, remote_path)
+            if entry:
+                offset = self._resume_upload_session(entry, file_size)
+                if offset is not None:
+                    return entry["upload_url"], offset
         
-        with open(file_path, 'rb') as f:
-            uploaded = 0
-            
-            while uploaded < file_size:
-                chunk = f.read(chunk_size)
-                chunk_len = len(chunk)
-                
-                headers = {
-                    'Content-Length': str(chunk_len),
-                    'Content-Range': f'bytes {uploaded}-{uploaded + chunk_len - 1}/{file_size}'
-                }
-                
-                response = requests.put(upload_url, headers=headers, data=chunk)
-                response.raise_for_status()
-                
-                uploaded += chunk_len
-                
-                if progress_callback:
-                    progress_callback(uploaded, file_size)
-                
-                if uploaded >= file_size:
-                    return response.json()
+        return self._create_upload_session(file_path, remote_path), 0
+    
+    def _resume_upload_session(self, entry: Dict[str, Any], file_size: int) -> Optional[int]:
+        # ファイルが変更された、またはセッションが期限切れの場合は破棄して新しいセッションを作る
+        if not self.journal.matches_file(entry) or UploadSessionJournal.is_expired(entry):
+            self.cancel_upload_session(entry["upload_url"])
+            self.journal.remove(entry["local_path"], entry["remote_path"])
+            return None
+        
+        status = self.get_upload_session_status(entry["upload_url"])
+        if status is None:
+            self.journal.remove(entry["local_path"], entry["remote_path"])
+            return None
         
-        return {}
+        offset = self._next_expected_offset(status, file_size)
+        self.journal.update_progress(
+            entry["local_path"],
+            entry["remote_path"],
+            offset,
+            parse_graph_datetime(status.get("expirationDateTime"))
+        )
+        return offset
+    
+    @staticmethod
+    def _next_expected_offset(status: Dict[str, Any], file_size: int) -> int:
+        # nextExpectedRangesの先頭（例: "26214400-"）がサーバー側の確定済みオフセット
+        ranges = status.get("nextExpectedRanges") or []
+        if not ranges:
+            return file_size
+        return int(ranges[0].split("-")[0])
+    
+    @classmethod
+    def _accepted_offset(cls, response: requests.Response, uploaded: int) -> int:
+        try:
+            status = response.json()
+        except ValueError:
+            return uploaded
+        return cls._next_expected_offset(status, uploaded)
+
+    def _record_upload_progress(self, file_path: Optional[str], remote_path: str, uploaded: int,
+                                response: requests.Response):
+        if self.journal is None or file_path is None:
+            return
+        expiration = None
+        try:
+            expiration = parse_graph_datetime(response.json().get("expirationDateTime"))
+        except ValueError:
+            pass
+        self.journal.update_progress(file_path, remote_path, uploaded, expiration)
+    
+    def _forget_upload_session(self, file_path: Optional[str], remote_path: str):
+        if self.journal is not None and file_path is not None:
+            self.journal.remove(file_path, remote_path)
+    
+    def get_upload_session_status(self, upload_url: str) -> Optional[Dict[str, Any]]:
+        # uploadUrlは事前認証済みのためAuthorizationヘッダーは付けない
+        response = self._request('GET', upload_url)
+        
+        if response.status_code in [404, 410]:
+            return None
+        
+        response.raise_for_status()
+        return response.json()
+    
+    def cancel_upload_session(self, upload_url: str) -> bool:
+        try:
+            response = self._request('DELETE', upload_url)
+        except requests.RequestException:
+            return False
+        return response.status_code in [204, 404, 410]
+    
+    def cleanup_upload_sessions(self, max_idle_seconds: Optional[float] = None) -> int:
+        # ファイルが変更・削除された、期限切れ、または長期間更新のないセッションをキャンセルする
+        if self.journal is None:
+            return 0
+        
+        max_idle_seconds = max_idle_seconds or Config.UPLOAD_SESSION_ABANDON_SECONDS
+        now = time.time()
+        cancelled = 0
+        for entry in self.journal.entries():
+            abandoned = now - entry.get("updated_at", 0) > max_idle_seconds
+            if abandoned or UploadSessionJournal.is_expired(entry) or not self.journal.matches_file(entry):
+                self.cancel_upload_session(entry["upload_url"])
+                self.journal.remove(entry["local_path"], entry["remote_path"])
+                cancelled += 1
+        return cancelled
     
     def create_folder(self, folder_path: str) -> Dict[str, Any]:
+        if folder_path in self.folder_cache:
+            return {"status": "already_exists"}
+        
         parent_path = "/".join(folder_path.split("/")[:-1])
         folder_name = folder_path.split("/")[-1]
         
@@ -93,7 +591,8 @@ class OneDriveClient:
         else:
             create_url = f"{self.base_url}/me/drive/root/children"
         
-        response = requests.post(
+        response = self._request(
+            'POST',
             create_url,
             headers=self.headers,
             json={
@@ -104,26 +603,76 @@ class OneDriveClient:
         )
         
         if response.status_code == 409:  # すでに存在
+            self.folder_cache.add(folder_path)
             return {"status": "already_exists"}
         
         response.raise_for_status()
+        self.folder_cache.add(folder_path)
         return response.json()
     
-    def list_files(self, folder_path: str = "") -> Dict[str, Any]:
+    def create_folders(self, folder_path: str) -> Dict[str, Any]:
+        # mkdir -p 相当。既知のフォルダーは飛ばし、存在しない階層だけを上から作成する
+        result = {"status": "already_exists"}
+        for ancestor in folder_ancestors(folder_path):
+            if ancestor in self.folder_cache:
+                continue
+            result = self.create_folder(ancestor)
+        self.folder_cache.save()
+        return result
+    
+    def list_files(self, folder_path: str = "", top: Optional[int] = None,
+                   select: Optional[List[str]] = None) -> Dict[str, Any]:
+        # 全ページを取得する（大きなフォルダーではiter_filesを使うこと）
+        return {"value": list(self.iter_files(folder_path, top, select))}
+    
+    def iter_files(self, folder_path: str = "", top: Optional[int] = None,
+                   select: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        # @odata.nextLinkを必要になった時点で辿り、1ページ分だけをメモリに保持する
         if folder_path:
             list_url = f"{self.base_url}/me/drive/root:/{folder_path}:/children"
         else:
             list_url = f"{self.base_url}/me/drive/root/children"
         
-        response = requests.get(list_url, headers=self.headers)
-        response.raise_for_status()
+        params = {}
+        if top:
+            params['$top'] = str(top)
+        if select:
+            params['$select'] = ",".join(select)
         
-        return response.json()
+        while list_url:
+            response = self._request('GET', list_url, headers=self.headers, params=params or None)
+            response.raise_for_status()
+            page = response.json()
+            
+            for item in page.get("value", []):
+                yield item
+            
+            # nextLinkには$top/$selectを含むクエリが既に付いている
+            list_url = page.get("@odata.nextLink")
+            params = None
+    
+    def download_range(self, remote_path: str, start: int, end: int) -> bytes:
+        # ファイルの一部（start〜endバイト目、両端を含む）をダウンロードする
+        # /contentは事前認証済みのダウンロードURLへリダイレクトされ、その際Authorizationヘッダーは外される
+        download_url = f"{self.base_url}/me/drive/root:/{remote_path}:/content"
+        response = self._request('GET', download_url, headers={**self.headers, 'Range': f'bytes={start}-{end}'})
+        response.raise_for_status()
+        if response.status_code == 206:
+            return response.content
+        # 範囲指定に対応していない場合は全体から切り出す
+        return response.content[start:end + 1]
+    
+    def download_file(self, remote_path: str, local_path: str, progress_callback=None) -> Dict[str, Any]:
+        # 複数のRange要求で並列にダウンロードし、中断しても完了した範囲から再開する
+        return ParallelDownloader(self).download_file(remote_path, local_path, progress_callback)
+    
+    def download_folder(self, remote_root: str, local_root: str) -> List[Dict[str, Any]]:
+        return ParallelDownloader(self).download_folder(remote_root, local_root)
     
     def get_file_info(self, file_path: str) -> Optional[Dict[str, Any]]:
         info_url = f"{self.base_url}/me/drive/root:/{file_path}"
         
-        response = requests.get(info_url, headers=self.headers)
+        response = self._request('GET', info_url, headers=self.headers)
         
         if response.status_code == 404:
             return None
@@ -134,10 +683,94 @@ class OneDriveClient:
     def delete_file(self, file_path: str) -> bool:
         delete_url = f"{self.base_url}/me/drive/root:/{file_path}"
         
-        response = requests.delete(delete_url, headers=self.headers)
+        response = self._request('DELETE', delete_url, headers=self.headers)
+        self.folder_cache.discard(file_path)
         
         if response.status_code in [204, 404]:
             return True
         
         response.raise_for_status()
-        return True
\ No newline at end of file
+        return True
+    
+    def batch(self) -> GraphBatch:
+        return GraphBatch(self)
+    
+    def batch_get_file_info(self, file_paths: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        # 最大20件ずつ /$batch でまとめて取得する（存在しないパスはNone）
+        batch = self.batch()
+        ids = {batch.add('GET', item_path_url(path)): path for path in file_paths}
+        return self._collect_batch_results(batch, ids, lambda item: item.body if item.ok else None, (404,))
+    
+    def batch_delete_files(self, file_paths: List[str]) -> Dict[str, bool]:
+        batch = self.batch()
+        ids = {batch.add('DELETE', item_path_url(path)): path for path in file_paths}
+        for path in file_paths:
+            self.folder_cache.discard(path)
+        return self._collect_batch_results(batch, ids, lambda item: True, (404,))
+    
+    def batch_create_folders(self, folder_paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        # 浅い階層から1階層ずつ、同じ深さのフォルダーをまとめて作成する（親は前の階層で作成済みになる）
+        # 同じ深さのリクエストは互いに依存しないため、件数が多くても20件ずつの$batchに分けられる
+        results = {}
+        failures = {}
+        by_depth: Dict[int, List[str]] = {}
+        for folder_path in sorted({path.strip("/") for path in folder_paths if path.strip("/")}):
+            if folder_path in self.folder_cache:
+                results[folder_path] = {"status": "already_exists"}
+            else:
+                by_depth.setdefault(folder_path.count("/"), []).append(folder_path)
+        
+        def convert(item):
+            if item.status == 409:  # すでに存在
+                return {"status": "already_exists"}
+            return item.body
+        
+        for depth in sorted(by_depth):
+            batch = self.batch()
+            ids = {}
+            for folder_path in by_depth[depth]:
+                parent_path = "/".join(folder_path.split("/")[:-1])
+                if parent_path in failures:
+                    # 親を作成できなかったフォルダーは送らない
+                    failures[folder_path] = BatchResponse(folder_path, 424, {"error": {"code": "failedDependency"}})
+                    continue
+                url = item_path_url(parent_path, ":/children") if parent_path else "/me/drive/root/children"
+                request_id = batch.add(
+                    'POST',
+                    url,
+                    body={
+                        "name": folder_path.split("/")[-1],
+                        "folder": {},
+                        "@microsoft.graph.conflictBehavior": "fail"
+                    }
+                )
+                ids[request_id] = folder_path
+            if not ids:
+                continue
+            try:
+                results.update(self._collect_batch_results(batch, ids, convert, (409,)))
+            except BatchError as e:
+                results.update(e.results)
+                failures.update(e.failures)
+        
+        for folder_path in results:
+            self.folder_cache.add(folder_path)
+        self.folder_cache.save()
+        if failures:
+            raise BatchError(f"一括リクエストの一部が失敗しました: {len(failures)}件", failures, results)
+        return results
+    
+    @staticmethod
+    def _collect_batch_results(batch: GraphBatch, ids: Dict[str, str], convert, accepted_statuses) -> Dict[str, Any]:
+        results = {}
+        failures = {}
+        for request_id, item in batch.execute(accepted_statuses).items():
+            path = ids[request_id]
+            if item.ok or item.status in accepted_statuses:
+                results[path] = convert(item)
+            else:
+                failures[path] = item
+        
+        if failures:
+            raise BatchError(f"一括リクエストの一部が失敗しました: {len(failures)}件", failures, results)
+        return results
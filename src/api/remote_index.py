@@ -0,0 +1,218 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+from typing import Optional, Dict, Any, Iterator
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.config import Config
+from src.utils.file_lock import FileLock
+from src.utils.folder_cache import normalize_folder_path
+
+
+# /delta から取得する項目（deltaではparentReference.pathが返らないため親IDからパスを組み立てる）
+DELTA_SELECT = "id,name,parentReference,size,folder,file,root,deleted,lastModifiedDateTime,eTag,fileSystemInfo"
+
+
+# Graphの /delta エンドポイントを使ったリモート状態のローカルインデックス
+# 初回は全件を列挙し、以降はデルタトークンから変更分のみを取得する
+class RemoteIndex:
+    def __init__(self, client, index_file: Optional[str] = None):
+        self.client = client
+        self.index_file = Config.REMOTE_INDEX_FILE if index_file is None else index_file
+        self.delta_link: Optional[str] = None
+        self.root_id: Optional[str] = None
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._paths: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(f"{self.index_file}.lock") if self.index_file else None
+        self._load()
+
+    def _load(self):
+        if not self.index_file or not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.delta_link = data.get("delta_link")
+        self.root_id = data.get("root_id")
+        self._items = data.get("items", {})
+        self._rebuild_paths()
+
+    def save(self):
+        if not self.index_file:
+            return
+        # デルタトークンと項目は同じロックの中で1つのファイルとして書き込み、食い違わないようにする
+        with self._lock, self._file_lock:
+            data = {"delta_link": self.delta_link, "root_id": self.root_id, "items": self._items}
+            directory = os.path.dirname(os.path.abspath(self.index_file))
+            fd, tmp_file = tempfile.mkstemp(prefix=f"{os.path.basename(self.index_file)}.", suffix=".tmp",
+                                            dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.index_file)
+            except BaseException:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                raise
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._paths)
+
+    def refresh(self) -> int:
+        # デルタトークンがあれば前回以降の変更のみを取得する（戻り値は適用した変更数）
+        url = self.delta_link or f"{self.client.base_url}/me/drive/root/delta?$select={DELTA_SELECT}"
+        changes = 0
+
+        while url:
+            response = self.client._request('GET', url, headers=self.client.headers)
+            if response.status_code == 410 and self.delta_link:
+                # トークンが失効した場合は全件を取得し直す
+                with self._lock:
+                    self._items = {}
+                    self.delta_link = None
+                url = f"{self.client.base_url}/me/drive/root/delta?$select={DELTA_SELECT}"
+                continue
+            response.raise_for_status()
+            page = response.json()
+
+            url = page.get("@odata.nextLink")
+            with self._lock:
+                for item in page.get("value", []):
+                    self._apply(item)
+                    changes += 1
+                if not url:
+                    # トークンは最後のページの項目と同時に反映する
+                    self.delta_link = page.get("@odata.deltaLink")
+
+        with self._lock:
+            self._rebuild_paths()
+        self._update_folder_cache()
+        self.save()
+        return changes
+
+    def _apply(self, item: Dict[str, Any]):
+        item_id = item["id"]
+        if "deleted" in item:
+            self._items.pop(item_id, None)
+            return
+        if "root" in item:
+            self.root_id = item_id
+
+        entry = {
+            "name": item.get("name", ""),
+            "parent_id": (item.get("parentReference") or {}).get("id"),
+            "size": item.get("size", 0),
+            "folder": "folder" in item,
+            "last_modified": item.get("lastModifiedDateTime"),
+            "etag": item.get("eTag"),
+        }
+        file_facet = item.get("file")
+        if file_facet and file_facet.get("hashes"):
+            entry["hashes"] = file_facet["hashes"]
+        file_system_info = item.get("fileSystemInfo") or {}
+        if file_system_info.get("lastModifiedDateTime"):
+            entry["fs_last_modified"] = file_system_info["lastModifiedDateTime"]
+        self._items[item_id] = entry
+
+    def _rebuild_paths(self):
+        # 親IDを辿ってパスを組み立てる。ルートまで辿れない（削除済みフォルダー配下の）項目は除外する
+        resolved: Dict[str, Optional[str]] = {}
+        if self.root_id:
+            resolved[self.root_id] = ""
+
+        def resolve(item_id: str) -> Optional[str]:
+            chain = []
+            current = item_id
+            while current not in resolved:
+                entry = self._items.get(current)
+                if entry is None or current in chain:
+                    for pending in chain:
+                        resolved[pending] = None
+                    return None
+                chain.append(current)
+                current = entry["parent_id"]
+            base = resolved[current]
+            for pending in reversed(chain):
+                if base is None:
+                    resolved[pending] = None
+                    continue
+                name = self._items[pending]["name"]
+                base = f"{base}/{name}" if base else name
+                resolved[pending] = base
+            return resolved[item_id]
+
+        paths = {}
+        orphans = []
+        for item_id in self._items:
+            if item_id == self.root_id:
+                continue
+            path = resolve(item_id)
+            if path is None:
+                orphans.append(item_id)
+            else:
+                self._items[item_id]["path"] = path
+                paths[normalize_folder_path(path)] = item_id
+        for item_id in orphans:
+            self._items.pop(item_id, None)
+        self._paths = paths
+
+    def _update_folder_cache(self):
+        folder_cache = getattr(self.client, "folder_cache", None)
+        if folder_cache is None:
+            return
+        with self._lock:
+            folders = [key for key, item_id in self._paths.items() if self._items[item_id]["folder"]]
+        for folder in folders:
+            folder_cache.add(folder)
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        # パスから項目をO(1)で引く（見つからなければNone）
+        key = normalize_folder_path(path)
+        with self._lock:
+            item_id = self._paths.get(key)
+            if item_id is None:
+                return None
+            return {"id": item_id, **self._items[item_id]}
+
+    def exists(self, path: str) -> bool:
+        with self._lock:
+            return normalize_folder_path(path) in self._paths
+
+    def record_item(self, path: str, item: Dict[str, Any]):
+        # アップロード結果を次回のデルタ取得を待たずにインデックスへ反映する
+        if "id" not in item:
+            return
+        with self._lock:
+            self._apply(item)
+            self._items[item["id"]]["path"] = path.strip("/")
+            self._paths[normalize_folder_path(path)] = item["id"]
+
+    def forget(self, path: str):
+        key = normalize_folder_path(path)
+        prefix = f"{key}/"
+        with self._lock:
+            for other in [other for other in self._paths if other == key or other.startswith(prefix)]:
+                self._items.pop(self._paths.pop(other), None)
+
+    def iter_items(self, prefix: str = "") -> Iterator[Dict[str, Any]]:
+        # prefix配下の項目を列挙する
+        key = normalize_folder_path(prefix)
+        with self._lock:
+            matches = [
+                (path, item_id) for path, item_id in self._paths.items()
+                if not key or path == key or path.startswith(f"{key}/")
+            ]
+        for _, item_id in matches:
+            entry = self._items.get(item_id)
+            if entry is not None:
+                yield {"id": item_id, **entry}
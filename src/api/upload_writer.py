@@ -0,0 +1,147 @@
+import os
+import sys
+from typing import Optional, Dict, Any
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.buffer_pool import read_into
+
+
+# 書き込まれたデータをフラグメント単位にまとめてアップロードするファイル風オブジェクト
+# バッファが一杯になっても、次のデータが来るまでは最後のフラグメントかどうか分からないため1つ保留し、
+# close()で総サイズを確定する。total_sizeを指定すれば全フラグメントのContent-Rangeに総サイズを付け、
+# 指定しない場合はそれまでのContent-Rangeが "bytes a-b/*" になる（Graphのドキュメントにない形式）
+# withブロックが例外で終わった場合は完了させずにセッションをキャンセルする
+class UploadWriter:
+    def __init__(self, client, remote_path: str, progress_callback=None, total_size: Optional[int] = None):
+        self.client = client
+        self.remote_path = remote_path
+        self.progress_callback = progress_callback
+        self.total_size = total_size
+        self.fragment_size = client.chunk_sizer.max_fragment_size()
+        self.result: Optional[Dict[str, Any]] = None
+        self.closed = False
+        self._buffer = bytearray(self.fragment_size)
+        self._view = memoryview(self._buffer)
+        self._length = 0
+        self._offset = 0
+        self._upload_url: Optional[str] = None
+
+    def writable(self) -> bool:
+        return True
+
+    def readable(self) -> bool:
+        return False
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self._offset + self._length
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("閉じたライターには書き込めません")
+        data = memoryview(data).cast('B')
+        written = len(data)
+        self._check_size(written)
+        while data:
+            if self._length == self.fragment_size:
+                # 続きのデータが来たので、保留していたフラグメントを送る
+                self._send_pending(final=False)
+            size = min(len(data), self.fragment_size - self._length)
+            self._view[self._length:self._length + size] = data[:size]
+            self._length += size
+            data = data[size:]
+        return written
+
+    def write_from(self, stream) -> int:
+        # readintoを持つストリームから、バッファへ直接読み込む（EOFまで）
+        if self.closed:
+            raise ValueError("閉じたライターには書き込めません")
+        copied = 0
+        while True:
+            if self._length == self.fragment_size:
+                # 1バイト先読みして続きがあるか確認する
+                head = stream.read(1)
+                if not head:
+                    return copied
+                self._check_size(len(head))
+                self._send_pending(final=False)
+                self._view[0:1] = head
+                self._length = 1
+                copied += 1
+            read = read_into(stream, self._view[self._length:])
+            self._check_size(read)
+            self._length += read
+            copied += read
+            if self._length < self.fragment_size:
+                return copied
+
+    def _check_size(self, length: int):
+        if self.total_size is not None and self.tell() + length > self.total_size:
+            raise ValueError(f"指定したサイズ（{self.total_size:,} bytes）を超えて書き込まれました")
+
+    def flush(self):
+        # 最後のフラグメントかどうかが分かるまで送信できないため何もしない
+        pass
+
+    def _send_pending(self, final: bool):
+        if self._upload_url is None:
+            self._upload_url = self.client._create_upload_session(None, self.remote_path)
+        data = self._view[:self._length]
+        if final:
+            self.result = self.client._send_last_stream_fragment(self._upload_url, self.remote_path, data, self._offset)
+        else:
+            self.client._send_stream_fragment(self._upload_url, data, self._offset, self.total_size)
+        self._offset += self._length
+        self._length = 0
+        if self.progress_callback:
+            self.progress_callback(self._offset, self._offset if final else self.total_size)
+
+    def close(self) -> Optional[Dict[str, Any]]:
+        # 残りを最後のフラグメントとして送り、アップロードした項目を返す
+        if self.closed:
+            return self.result
+        self.closed = True
+        try:
+            if self.total_size is not None and self.tell() != self.total_size:
+                raise ValueError(f"書き込んだサイズ（{self.tell():,} bytes）が指定したサイズと一致しません")
+            if self._upload_url is None and self._length < self.client.chunk_sizer.simple_upload_threshold():
+                # 全体が小さければセッションを作らずに1回のPUTで送る
+                self.result = self.client._simple_upload_data(self.remote_path, bytes(self._view[:self._length]))
+            else:
+                self._send_pending(final=True)
+            self.client.folder_cache.add_parents_of(self.remote_path)
+            return self.result
+        except BaseException:
+            self._cancel()
+            raise
+        finally:
+            self._release()
+
+    def abort(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._cancel()
+        self._release()
+
+    def _cancel(self):
+        if self._upload_url is not None:
+            self.client.cancel_upload_session(self._upload_url)
+            self._upload_url = None
+
+    def _release(self):
+        self._view.release()
+        self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
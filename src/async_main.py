@@ -0,0 +1,148 @@
+import asyncio
+import os
+import sys
+import time
+from typing import Optional, Dict, Any, List
+
+import aiohttp
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.auth.authenticator import OneDriveAuthenticator
+from src.auth.token_provider import TokenProvider
+from src.api.async_onedrive_client import AsyncOneDriveClient
+from src.utils.config import Config
+from src.utils.logger import get_logger
+from src.utils.retry import async_retry_on_exception
+from src.utils.file_walker import walk_files
+
+
+# OneDriveUploaderのasyncio版
+class AsyncOneDriveUploader:
+    def __init__(self, max_concurrency: Optional[int] = None, client: Optional[AsyncOneDriveClient] = None):
+        # clientを渡した場合は認証済みとみなし、initialize()は不要
+        self.logger = get_logger()
+        self.authenticator = OneDriveAuthenticator() if client is None else None
+        self.max_concurrency = max_concurrency
+        self.client = client
+
+    async def __aenter__(self):
+        if self.client is None:
+            await self.initialize()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def initialize(self):
+        try:
+            Config.validate()
+            self.logger.info("設定の検証が完了しました")
+
+            # 認証（MSALは同期APIのためスレッドで実行）
+            self.logger.info("認証を開始します...")
+            # 長時間の転送中もトークンが失効しないよう、プロバイダー経由で期限前に更新する
+            token_provider = TokenProvider(self.authenticator)
+            await asyncio.to_thread(token_provider.get_token)
+
+            self.client = AsyncOneDriveClient(token_provider, self.max_concurrency)
+            self.logger.log_auth("トークン取得", True)
+            self.logger.info("OneDriveへの接続に成功しました")
+
+        except Exception as e:
+            self.logger.error(f"初期化エラー: {str(e)}")
+            self.logger.log_auth("初期化", False)
+            raise
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+
+    @async_retry_on_exception(max_retries=3, delay=1.0, backoff=2.0, exceptions=(aiohttp.ClientResponseError,))
+    async def upload_file(self, local_path: str, remote_path: str, progress_callback=None):
+        if not os.path.exists(local_path):
+            raise FileNotFoundError(f"ファイルが見つかりません: {local_path}")
+
+        file_size = os.path.getsize(local_path)
+        self.logger.info(f"アップロード開始: {local_path} ({file_size:,} bytes)")
+
+        try:
+            result = await self.client.upload_file(local_path, remote_path, progress_callback)
+            self.logger.log_upload(local_path, remote_path, file_size, True)
+            self.logger.info(f"アップロード完了: {result.get('name', remote_path)}")
+            return result
+        except Exception as e:
+            self.logger.error(f"アップロードエラー: {str(e)}")
+            self.logger.log_upload(local_path, remote_path, file_size, False)
+            raise
+
+    async def upload_directory(self, local_root: str, remote_root: str,
+                               workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        if not os.path.isdir(local_root):
+            raise NotADirectoryError(f"ディレクトリが見つかりません: {local_root}")
+
+        tasks = sorted(walk_files(local_root, remote_root), key=lambda task: task[2], reverse=True)
+        self.logger.info(f"一括アップロード開始: {local_root} -> {remote_root} ({len(tasks)}ファイル)")
+
+        # ファイルごとにタスクを作らず、同時実行数と同じ数のワーカーが順に取り出す
+        workers = max(1, workers or self.client.max_concurrency)
+        entries = iter(enumerate(tasks))
+        results: List[Optional[Dict[str, Any]]] = [None] * len(tasks)
+
+        async def worker():
+            for index, (local_path, remote_path, size) in entries:
+                results[index] = await self._upload_directory_entry(local_path, remote_path, size)
+
+        await asyncio.gather(*[worker() for _ in range(min(workers, len(tasks)))])
+
+        succeeded = sum(1 for result in results if result["success"])
+        self.logger.info(f"一括アップロード完了: 成功 {succeeded}件 / 失敗 {len(results) - succeeded}件")
+        return results
+
+    async def _upload_directory_entry(self, local_path: str, remote_path: str, size: int) -> Dict[str, Any]:
+        # 1ファイルの失敗でバッチ全体を止めないよう、例外は結果として返す
+        started = time.monotonic()
+        result = {
+            "local_path": local_path,
+            "remote_path": remote_path,
+            "size": size,
+            "success": False,
+            "error": None,
+        }
+        try:
+            item = await self.upload_file(local_path, remote_path)
+            result["success"] = True
+            result["item_id"] = item.get("id")
+        except Exception as e:
+            result["error"] = str(e)
+        result["elapsed"] = time.monotonic() - started
+        return result
+
+    async def create_folder(self, folder_path: str):
+        try:
+            result = await self.client.create_folder(folder_path)
+            if result.get("status") == "already_exists":
+                self.logger.info(f"フォルダーは既に存在します: {folder_path}")
+            else:
+                self.logger.info(f"フォルダーを作成しました: {folder_path}")
+            return result
+        except Exception as e:
+            self.logger.error(f"フォルダー作成エラー: {str(e)}")
+            raise
+
+    async def list_files(self, folder_path: str = ""):
+        try:
+            result = await self.client.list_files(folder_path)
+            files = result.get("value", [])
+
+            self.logger.info(f"フォルダー内のファイル一覧: {folder_path or 'ルート'}")
+            for file in files:
+                file_type = "フォルダー" if "folder" in file else "ファイル"
+                size = file.get("size", 0) if "folder" not in file else "-"
+                print(f"  {file_type}: {file['name']} (サイズ: {size})")
+
+            return files
+        except Exception as e:
+            self.logger.error(f"ファイル一覧取得エラー: {str(e)}")
+            raise
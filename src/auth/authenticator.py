@@ -1,6 +1,7 @@
 import os
 import json
 import webbrowser
+from typing import Optional
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 import msal
@@ -10,6 +11,7 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from src.utils.config import Config
+from src.auth.token_cache import SharedTokenCache
 
 
 class AuthCodeHandler(BaseHTTPRequestHandler):
@@ -68,53 +70,61 @@ class AuthCodeHandler(BaseHTTPRequestHandler):
 class OneDriveAuthenticator:
     def __init__(self):
         self.config = Config
-        self.token_cache_file = "token_cache.json"
+        self.token_cache_file = Config.TOKEN_CACHE_FILE
+        # 複数プロセスで共有するキャッシュ（ファイルロックと原子的な保存、メモリ上の有効なトークン）
+        self.token_cache = SharedTokenCache(self.token_cache_file)
         self.app = self._create_msal_app()
     
     def _create_msal_app(self):
-        cache = msal.SerializableTokenCache()
-        if os.path.exists(self.token_cache_file):
-            with open(self.token_cache_file, 'r') as f:
-                cache.deserialize(f.read())
-        
         # EC2環境用にPublicClientApplicationを使用（デバイスコードフロー）
         app = msal.PublicClientApplication(
             self.config.CLIENT_ID,
             authority=self.config.AUTHORITY,
-            token_cache=cache
+            token_cache=self.token_cache
         )
         return app
     
+    def _memory_key(self) -> str:
+        return " ".join(sorted(self.config.SCOPE))
+    
     def _save_cache(self):
         try:
-            # MSALのバージョンに応じてキャッシュを保存
-            if hasattr(self.app.token_cache, 'has_state_changed') and self.app.token_cache.has_state_changed:
-                with open(self.token_cache_file, 'w') as f:
-                    if hasattr(self.app.token_cache, 'serialize'):
-                        f.write(self.app.token_cache.serialize())
-                    else:
-                        import json
-                        json.dump(self.app.token_cache._cache, f)
-            elif not hasattr(self.app.token_cache, 'has_state_changed'):
-                # 古いバージョンの場合は常に保存
-                with open(self.token_cache_file, 'w') as f:
-                    import json
-                    json.dump(self.app.token_cache._cache, f)
+            # ロックを取って変更があれば保存する（一時ファイルに書いてからrename）
+            with self.token_cache.locked():
+                pass
         except Exception as e:
             print(f"⚠️ トークンキャッシュの保存に失敗: {e}")
             print("認証は成功していますが、次回は再認証が必要になる可能性があります")
     
+    def _acquire_silent(self, force_refresh: bool = False, stale_token: Optional[str] = None):
+        # キャッシュファイルのロック中に取得するため、同時に起動した他のプロセスは
+        # このプロセスの更新結果を読み込むだけで済み、リフレッシュは1回にまとまる
+        with self.token_cache.locked():
+            accounts = self.app.get_accounts()
+            if not accounts:
+                return None
+            result = self.app.acquire_token_silent(scopes=self.config.SCOPE, account=accounts[0])
+            if force_refresh and (not result or result.get("access_token") in (None, stale_token)):
+                # 他のプロセスが既に更新していれば、そのトークンをそのまま使う
+                result = self.app.acquire_token_silent(
+                    scopes=self.config.SCOPE,
+                    account=accounts[0],
+                    force_refresh=True
+                )
+        if result and "access_token" in result:
+            self.token_cache.remember(self._memory_key(), result)
+            return result
+        return None
+    
     def get_token(self):
-        accounts = self.app.get_accounts()
+        # 有効期限まで余裕のあるトークンはメモリから返す（ファイルもMSALも参照しない）
+        result = self.token_cache.recall(self._memory_key(), Config.TOKEN_REFRESH_MARGIN_SECONDS)
+        if result:
+            return result
         
-        if accounts:
-            result = self.app.acquire_token_silent(
-                scopes=self.config.SCOPE,
-                account=accounts[0]
-            )
-            if result and "access_token" in result:
-                self._save_cache()
-                return result
+        result = self._acquire_silent()
+        if result:
+            return result
         
         return self._get_token_interactive()
     
@@ -149,20 +159,21 @@ class OneDriveAuthenticator:
         
         print("✅ 認証が正常に完了しました!")
         self._save_cache()
+        self.token_cache.remember(self._memory_key(), result)
         return result
     
-    def refresh_token(self):
-        accounts = self.app.get_accounts()
-        if not accounts:
-            return self._get_token_interactive()
+    def refresh_token(self, force_refresh: bool = False, allow_interactive: bool = True):
+        # force_refresh: 有効期限内でもリフレッシュトークンで新しいアクセストークンを取得する
+        # allow_interactive: 更新できなかった場合にデバイスコードフローへ切り替えるか（バックグラウンドではFalse）
+        memory_key = self._memory_key()
+        stale = self.token_cache.recall(memory_key, 0)
+        if force_refresh:
+            self.token_cache.forget(memory_key)
         
-        result = self.app.acquire_token_silent(
-            scopes=self.config.SCOPE,
-            account=accounts[0]
-        )
-        
-        if result and "access_token" in result:
-            self._save_cache()
+        result = self._acquire_silent(force_refresh, stale["access_token"] if stale else None)
+        if result:
             return result
         
+        if not allow_interactive:
+            raise Exception("リフレッシュトークンでアクセストークンを更新できませんでした")
         return self._get_token_interactive()
\ No newline at end of file
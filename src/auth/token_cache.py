@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Tuple
+
+import msal
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.file_lock import FileLock
+
+
+# 複数プロセスで共有するMSALトークンキャッシュ
+# ファイルロック（キャッシュ本体はrenameで置き換えるため別の.lockファイル）の中で読み込み・更新・保存を行い、
+# 別プロセスが更新済みなら読み込み直すだけでリフレッシュを省略できるようにする
+class SharedTokenCache(msal.SerializableTokenCache):
+    def __init__(self, cache_file: str):
+        super().__init__()
+        self.cache_file = cache_file
+        self._file_lock = FileLock(f"{cache_file}.lock")
+        self._loaded_stat: Optional[Tuple[int, int]] = None
+        self._memory_lock = threading.Lock()
+        self._memory: Dict[str, Dict[str, Any]] = {}
+        with self.locked():
+            pass
+
+    def _file_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.cache_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _reload_if_changed(self):
+        # 保存していない変更がある場合は上書きしない（このあと保存される）
+        if self.has_state_changed:
+            return
+        stat = self._file_stat()
+        if stat is None or stat == self._loaded_stat:
+            return
+        with open(self.cache_file, 'r', encoding='utf-8') as f:
+            self.deserialize(f.read())
+        self._loaded_stat = stat
+
+    def _save_if_changed(self):
+        if not self.has_state_changed:
+            return
+        # 一時ファイルに書き込んでからrenameし、他のプロセスが書き込み途中の内容を読まないようにする
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(self.serialize())
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp_file, 0o600)
+        except OSError:
+            pass
+        os.replace(tmp_file, self.cache_file)
+        self.has_state_changed = False
+        self._loaded_stat = self._file_stat()
+
+    @contextmanager
+    def locked(self):
+        # ロック中は他のプロセスのリフレッシュを待ち、終了時に変更があれば保存する
+        with self._file_lock:
+            self._reload_if_changed()
+            try:
+                yield self
+            finally:
+                self._save_if_changed()
+
+    def remember(self, key: str, result: Dict[str, Any]):
+        # 取得したトークンを有効期限と共にメモリに保持する
+        if not result or "access_token" not in result:
+            return
+        expires_at = time.time() + float(result.get("expires_in", 0))
+        with self._memory_lock:
+            self._memory[key] = {**result, "expires_at": expires_at}
+
+    def recall(self, key: str, margin: float) -> Optional[Dict[str, Any]]:
+        # 有効期限までmargin秒以上残っていればファイルもMSALも参照せずに返す
+        with self._memory_lock:
+            result = self._memory.get(key)
+        if result is None or time.time() >= result["expires_at"] - margin:
+            return None
+        return {**result, "expires_in": int(result["expires_at"] - time.time())}
+
+    def forget(self, key: str):
+        with self._memory_lock:
+            self._memory.pop(key, None)
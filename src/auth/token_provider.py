@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+import time
+from typing import Optional, Dict, Any
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.config import Config
+from src.utils.logger import get_logger
+
+
+# 固定のアクセストークン（更新できないため401はそのまま呼び出し側に返る）
+class StaticTokenProvider:
+    def __init__(self, access_token: str):
+        self.access_token = access_token
+
+    def get_token(self) -> str:
+        return self.access_token
+
+    def refresh(self, stale_token: Optional[str] = None) -> Optional[str]:
+        return None
+
+    def close(self):
+        pass
+
+
+# 期限が近づいたアクセストークンを更新して返すプロバイダー
+# 更新は同時に1回だけ行い（single-flight）、待っていた他のワーカーは更新後のトークンを使う
+# background=Trueなら期限の少し前にバックグラウンドで更新し、リクエストが更新を待たないようにする
+class TokenProvider:
+    def __init__(self, authenticator, refresh_margin: Optional[float] = None, background: Optional[bool] = None):
+        self.authenticator = authenticator
+        self.refresh_margin = Config.TOKEN_REFRESH_MARGIN_SECONDS if refresh_margin is None else refresh_margin
+        self.background = Config.TOKEN_BACKGROUND_REFRESH if background is None else background
+        self.logger = get_logger()
+        self._lock = threading.Lock()
+        self._access_token: Optional[str] = None
+        self._expires_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _apply(self, result: Dict[str, Any]):
+        if not result or "access_token" not in result:
+            raise Exception("アクセストークンの取得に失敗しました")
+        self._access_token = result["access_token"]
+        self._expires_at = time.time() + float(result.get("expires_in", 3600))
+
+    def _needs_refresh(self) -> bool:
+        return self._access_token is None or time.time() >= self._expires_at - self.refresh_margin
+
+    @property
+    def expires_at(self) -> float:
+        return self._expires_at
+
+    def get_token(self) -> str:
+        if self._needs_refresh():
+            with self._lock:
+                # ロック待ちの間に他のスレッドが更新していれば、それを使う
+                if self._access_token is None:
+                    self._apply(self.authenticator.get_token())
+                elif self._needs_refresh():
+                    self._refresh_locked()
+        self._start_background()
+        return self._access_token
+
+    def refresh(self, stale_token: Optional[str] = None) -> Optional[str]:
+        # 401を受けたときに呼ぶ。stale_tokenが既に更新済みなら新しいトークンをそのまま返す
+        with self._lock:
+            if stale_token is not None and self._access_token != stale_token:
+                return self._access_token
+            try:
+                self._refresh_locked()
+            except Exception as e:
+                self.logger.error(f"アクセストークンの更新に失敗しました: {str(e)}")
+                return None
+            return self._access_token
+
+    def _refresh_locked(self):
+        started = time.monotonic()
+        self._apply(self.authenticator.refresh_token(force_refresh=True, allow_interactive=False))
+        self.logger.info(
+            f"アクセストークンを更新しました（{time.monotonic() - started:.1f}秒, "
+            f"有効期限まで {self._expires_at - time.time():.0f}秒）"
+        )
+
+    def _start_background(self):
+        if not self.background or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None or self._stop.is_set():
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, name="TokenRefresher", daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            wait = self._expires_at - self.refresh_margin - time.time()
+            if wait > 0:
+                self._stop.wait(wait)
+                continue
+            try:
+                with self._lock:
+                    if self._needs_refresh():
+                        self._refresh_locked()
+            except Exception as e:
+                # 失敗してもリクエスト時の更新や401からの回復に任せ、少し待ってから再試行する
+                self.logger.warning(f"バックグラウンドでのトークン更新に失敗しました: {str(e)}")
+                self._stop.wait(min(60.0, max(1.0, self.refresh_margin / 10)))
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
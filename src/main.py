@@ -1,23 +1,45 @@
+import argparse
+import io
+import json
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
 from requests.exceptions import HTTPError
 
 # プロジェクトルートをPythonパスに追加
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.auth.authenticator import OneDriveAuthenticator
+from src.auth.token_provider import TokenProvider
 from src.api.onedrive_client import OneDriveClient
+from src.api.remote_index import RemoteIndex
 from src.utils.config import Config
 from src.utils.logger import get_logger
+from src.utils.metrics import get_metrics, start_metrics_exporters
 from src.utils.retry import retry_on_exception
+from src.utils.file_walker import walk_files, walk_empty_directories
+from src.utils.folder_cache import normalize_folder_path
+from src.utils.sync_compare import remote_file_state, upload_reason
+from src.utils.manifest import UploadManifest, get_upload_manifest
+from src.utils.archive_stream import DirectoryArchiveStream, dumps_index, index_remote_path, extract_member
+from src.sources.s3_source import S3Source
 
 
 class OneDriveUploader:
-    def __init__(self):
+    def __init__(self, client: Optional[OneDriveClient] = None):
+        # clientを渡した場合は認証済みとみなし、initialize()は不要（ベンチマークなど）
         self.logger = get_logger()
-        self.authenticator = OneDriveAuthenticator()
-        self.client = None
+        self.authenticator = OneDriveAuthenticator() if client is None else None
+        self.token_provider = None
+        self.client = client
+        self.remote_index = None
+        self.manifest = get_upload_manifest(Config.UPLOAD_MANIFEST_DB) if Config.UPLOAD_MANIFEST_DB else None
+        # METRICS_PORT / METRICS_TEXTFILE が設定されていればPrometheus形式で公開する
+        self.metrics = get_metrics()
+        start_metrics_exporters()
         
     def initialize(self):
         try:
@@ -26,13 +48,14 @@ class OneDriveUploader:
             
             # 認証
             self.logger.info("認証を開始します...")
-            token_result = self.authenticator.get_token()
+            # 長時間の転送中もトークンが失効しないよう、プロバイダー経由で期限前に更新する
+            self.token_provider = TokenProvider(self.authenticator)
+            self.token_provider.get_token()
             
-            if "access_token" not in token_result:
-                raise Exception("アクセストークンの取得に失敗しました")
-            
-            self.client = OneDriveClient(token_result["access_token"])
+            self.client = OneDriveClient(self.token_provider)
             self.logger.log_auth("トークン取得", True)
+            self._warm_up_connections()
+            self._cleanup_upload_sessions()
             self.logger.info("OneDriveへの接続に成功しました")
             
         except Exception as e:
@@ -40,8 +63,72 @@ class OneDriveUploader:
             self.logger.log_auth("初期化", False)
             raise
     
+    def _warm_up_connections(self):
+        # 接続の事前確立に失敗してもアップロード自体は継続できるため警告のみ
+        try:
+            count = self.client.warm_up()
+            self.logger.debug(f"接続ウォームアップ完了: {count}接続")
+        except Exception as e:
+            self.logger.warning(f"接続ウォームアップに失敗しました: {str(e)}")
+    
+    def _cleanup_upload_sessions(self):
+        # 前回の実行で放棄されたアップロードセッションを片付ける
+        try:
+            cancelled = self.client.cleanup_upload_sessions()
+            if cancelled:
+                self.logger.info(f"放棄されたアップロードセッションをキャンセルしました: {cancelled}件")
+        except Exception as e:
+            self.logger.warning(f"アップロードセッションの整理に失敗しました: {str(e)}")
+    
+    def load_remote_index(self, index_file: Optional[str] = None) -> RemoteIndex:
+        # 初回は全件、2回目以降は前回のデルタトークンからの変更のみを取得する
+        try:
+            index = RemoteIndex(self.client, index_file)
+            full_sync = index.delta_link is None
+            changes = index.refresh()
+            self.remote_index = index
+            mode = "全件取得" if full_sync else "差分取得"
+            self.logger.info(f"リモートインデックスを更新しました（{mode}）: 変更 {changes}件 / 合計 {len(index)}件")
+            return index
+        except Exception as e:
+            self.logger.error(f"リモートインデックスの更新エラー: {str(e)}")
+            raise
+    
+    def get_remote_info(self, remote_path: str):
+        # リモートインデックスがあればローカルで解決し、なければAPIに問い合わせる
+        if self.remote_index is not None:
+            return self.remote_index.get(remote_path)
+        return self.client.get_file_info(remote_path)
+    
+    def remote_exists(self, remote_path: str) -> bool:
+        return self.get_remote_info(remote_path) is not None
+    
+    def get_connection_stats(self):
+        return self.client.get_connection_stats()
+    
+    def get_rate_stats(self):
+        return self.client.get_rate_stats()
+    
+    def upload_file(self, local_path: str, remote_path: str, show_progress: bool = True):
+        # 再試行を含めた1ファイル分の結果をマニフェストに記録する
+        attempts = [0]
+        started_at = time.time()
+        started = time.monotonic()
+        try:
+            result = self._upload_file_with_retry(local_path, remote_path, show_progress, attempts)
+        except Exception as e:
+            self._record_metrics(UploadManifest.OUTCOME_FAILED, attempts[0])
+            self._record_manifest(local_path, remote_path, UploadManifest.OUTCOME_FAILED,
+                                  started_at, time.monotonic() - started, attempts[0], error=str(e))
+            raise
+        self._record_metrics(UploadManifest.OUTCOME_SUCCESS, attempts[0])
+        self._record_manifest(local_path, remote_path, UploadManifest.OUTCOME_SUCCESS,
+                              started_at, time.monotonic() - started, attempts[0], item=result)
+        return result
+    
     @retry_on_exception(max_retries=3, delay=1.0, backoff=2.0, exceptions=(HTTPError,))
-    def upload_file(self, local_path: str, remote_path: str):
+    def _upload_file_with_retry(self, local_path: str, remote_path: str, show_progress: bool, attempts: List[int]):
+        attempts[0] += 1
         if not os.path.exists(local_path):
             raise FileNotFoundError(f"ファイルが見つかりません: {local_path}")
         
@@ -53,20 +140,488 @@ class OneDriveUploader:
             print(f"\rアップロード進捗: {percent:.1f}% ({uploaded:,}/{total:,} bytes)", end="")
         
         try:
-            result = self.client.upload_file(local_path, remote_path, progress_callback)
-            print()  # 改行
+            result = self.client.upload_file(local_path, remote_path, progress_callback if show_progress else None)
+            if show_progress:
+                print()  # 改行
+            if self.remote_index is not None:
+                self.remote_index.record_item(remote_path, result)
             self.logger.log_upload(local_path, remote_path, file_size, True)
             self.logger.info(f"アップロード完了: {result.get('name', remote_path)}")
             return result
         except Exception as e:
-            print()  # 改行
+            if show_progress:
+                print()  # 改行
             self.logger.error(f"アップロードエラー: {str(e)}")
             self.logger.log_upload(local_path, remote_path, file_size, False)
             raise
     
+    def _record_metrics(self, outcome: str, attempts: int = 1):
+        self.metrics.files.inc("upload", outcome)
+        if attempts > 1:
+            self.metrics.retries.add(attempts - 1, "file", "http_error")
+    
+    def _record_manifest(self, local_path: str, remote_path: str, outcome: str, started_at: float,
+                         duration: float, attempts: int, item: Optional[Dict[str, Any]] = None,
+                         error: Optional[str] = None, kind: str = UploadManifest.KIND_FILE,
+                         size: Optional[int] = None):
+        # sizeを省略した場合はローカルファイルのサイズを使う（S3やストリームなどローカルにない場合は渡す）
+        if self.manifest is None:
+            return
+        mtime = None
+        if os.path.isfile(local_path):
+            stat = os.stat(local_path)
+            mtime = stat.st_mtime
+            if size is None:
+                size = stat.st_size
+        hashes = ((item or {}).get("file") or {}).get("hashes") or {}
+        self.manifest.record(
+            local_path, remote_path, size or 0, outcome,
+            started_at=started_at,
+            duration=duration,
+            item_id=(item or {}).get("id"),
+            mtime=mtime,
+            quick_xor_hash=hashes.get("quickXorHash"),
+            attempts=attempts,
+            error=error,
+            kind=kind,
+        )
+    
+    def upload_directory(self, local_root: str, remote_root: str, workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        if not os.path.isdir(local_root):
+            raise NotADirectoryError(f"ディレクトリが見つかりません: {local_root}")
+        
+        workers = workers or Config.UPLOAD_WORKERS
+        tasks = list(walk_files(local_root, remote_root))
+        self.logger.info(f"一括アップロード開始: {local_root} -> {remote_root} ({len(tasks)}ファイル, {workers}並列)")
+        
+        results = self._upload_tasks(tasks, workers)
+        self._finish_directory_upload(local_root, remote_root)
+        
+        succeeded = sum(1 for result in results if result["success"])
+        self.logger.info(f"一括アップロード完了: 成功 {succeeded}件 / 失敗 {len(results) - succeeded}件")
+        return results
+    
+    def sync(self, local_root: str, remote_root: str, workers: Optional[int] = None,
+             compare_hash: Optional[bool] = None) -> Dict[str, Any]:
+        # 新規・変更ファイルのみをアップロードする（サイズと更新日時、任意でquickXorHashで比較）
+        if not os.path.isdir(local_root):
+            raise NotADirectoryError(f"ディレクトリが見つかりません: {local_root}")
+        
+        workers = workers or Config.UPLOAD_WORKERS
+        compare_hash = Config.SYNC_COMPARE_HASH if compare_hash is None else compare_hash
+        remote_files = self._collect_remote_files(remote_root)
+        
+        tasks = []
+        reasons: Dict[str, int] = {}
+        skipped = 0
+        for local_path, remote_path, size in walk_files(local_root, remote_root):
+            remote = remote_files.get(normalize_folder_path(remote_path))
+            reason = upload_reason(local_path, size, os.path.getmtime(local_path), remote, compare_hash)
+            if reason is None:
+                skipped += 1
+                continue
+            reasons[reason] = reasons.get(reason, 0) + 1
+            tasks.append((local_path, remote_path, size))
+        
+        self.logger.info(
+            f"同期開始: {local_root} -> {remote_root} "
+            f"(アップロード {len(tasks)}件 / スキップ {skipped}件, 理由: {reasons or 'なし'})"
+        )
+        results = self._upload_tasks(tasks, workers)
+        self._finish_directory_upload(local_root, remote_root)
+        
+        uploaded = sum(1 for result in results if result["success"])
+        summary = {
+            "uploaded": uploaded,
+            "skipped": skipped,
+            "failed": len(results) - uploaded,
+            "uploaded_bytes": sum(result["size"] for result in results if result["success"]),
+            "reasons": reasons,
+            "results": results,
+        }
+        self.logger.info(
+            f"同期完了: アップロード {summary['uploaded']}件 / スキップ {skipped}件 / 失敗 {summary['failed']}件"
+        )
+        return summary
+    
+    def upload_from_stream(self, stream, remote_path: str, show_progress: bool = True) -> Dict[str, Any]:
+        # 標準入力やパイプなど、長さの分からないストリームをアップロードする
+        # ストリームは巻き戻せないため、失敗しても再試行しない
+        started_at = time.time()
+        started = time.monotonic()
+        # 標準入力などファイル名のないストリームは "-" として記録する
+        source_name = getattr(stream, "name", None)
+        source_name = source_name if isinstance(source_name, str) and not source_name.startswith("<") else "-"
+        self.logger.info(f"ストリームのアップロード開始: {remote_path}")
+        sent = [0]
+        
+        def progress_callback(uploaded, total):
+            sent[0] = uploaded
+            if show_progress:
+                print(f"\rアップロード済み: {uploaded:,} bytes", end="", file=sys.stderr)
+        
+        try:
+            result = self.client.upload_stream(stream, remote_path, progress_callback)
+        except Exception as e:
+            if show_progress:
+                print(file=sys.stderr)  # 改行
+            self.logger.error(f"ストリームのアップロードエラー: {str(e)}")
+            self._record_metrics(UploadManifest.OUTCOME_FAILED)
+            self._record_manifest(source_name, remote_path, UploadManifest.OUTCOME_FAILED, started_at,
+                                  time.monotonic() - started, 1, error=str(e),
+                                  kind=UploadManifest.KIND_STREAM, size=sent[0])
+            raise
+        self._record_metrics(UploadManifest.OUTCOME_SUCCESS)
+        if show_progress:
+            print(file=sys.stderr)  # 改行
+        
+        size = result.get("size", 0)
+        elapsed = time.monotonic() - started
+        self._record_manifest(source_name, remote_path, UploadManifest.OUTCOME_SUCCESS, started_at, elapsed, 1,
+                              item=result, kind=UploadManifest.KIND_STREAM, size=size)
+        self.logger.info(f"ストリームのアップロード完了: {remote_path} ({size:,} bytes, {elapsed:.1f}秒)")
+        if self.remote_index is not None:
+            self.remote_index.record_item(remote_path, result)
+        return result
+    
+    def upload_archive(self, local_root: str, remote_path: str, compress: bool = False,
+                       write_index: bool = True) -> Dict[str, Any]:
+        # ディレクトリを1つのtar（compress=Trueならzstd）としてその場で生成しながらアップロードする
+        # 小さなファイルが大量にある場合に、ファイルごとのリクエストをなくす
+        started_at = time.time()
+        started = time.monotonic()
+        archive = DirectoryArchiveStream(
+            local_root,
+            compress=compress,
+            frame_size=Config.ARCHIVE_FRAME_SIZE,
+            level=Config.ARCHIVE_ZSTD_LEVEL
+        )
+        self.logger.info(f"アーカイブのアップロード開始: {local_root} -> {remote_path}{'（zstd圧縮）' if compress else ''}")
+        
+        try:
+            result = self.client.upload_stream(archive, remote_path, total_size=archive.size)
+        except Exception as e:
+            archive.close()
+            self.logger.error(f"アーカイブのアップロードエラー: {str(e)}")
+            self._record_manifest(local_root, remote_path, UploadManifest.OUTCOME_FAILED, started_at,
+                                  time.monotonic() - started, 1, error=str(e),
+                                  kind=UploadManifest.KIND_ARCHIVE, size=archive.size or 0)
+            raise
+        
+        index = archive.build_index()
+        if write_index:
+            # メンバーを範囲ダウンロードで取り出すためのインデックスを隣に置く
+            index_data = dumps_index(index)
+            self.client.upload_stream(io.BytesIO(index_data), index_remote_path(remote_path), total_size=len(index_data))
+        
+        elapsed = time.monotonic() - started
+        self._record_manifest(local_root, remote_path, UploadManifest.OUTCOME_SUCCESS, started_at, elapsed, 1,
+                              item=result, kind=UploadManifest.KIND_ARCHIVE, size=index["archive_size"])
+        self.logger.info(
+            f"アーカイブのアップロード完了: {len(index['members'])}ファイル, "
+            f"{index['archive_size']:,} bytes, {elapsed:.1f}秒"
+        )
+        if self.remote_index is not None:
+            self.remote_index.record_item(remote_path, result)
+        return {"item": result, "index": index}
+    
+    def extract_archive_member(self, remote_path: str, name: str, local_path: str) -> Dict[str, Any]:
+        # インデックスを読み込み、アーカイブから1ファイルだけを範囲ダウンロードで取り出してlocal_pathに保存する
+        index_path = index_remote_path(remote_path)
+        info = self.client.get_file_info(index_path)
+        if info is None:
+            raise FileNotFoundError(f"アーカイブのインデックスが見つかりません: {index_path}")
+        index = json.loads(self.client.download_range(index_path, 0, info["size"] - 1))
+        
+        # 途中で失敗した場合に不完全なファイルを残さないよう、書き終えてから置き換える
+        os.makedirs(os.path.dirname(os.path.abspath(local_path)), exist_ok=True)
+        part_file = f"{local_path}.part"
+        try:
+            with open(part_file, 'wb') as f:
+                size = extract_member(self.client, remote_path, index, name, f, Config.DOWNLOAD_RANGE_SIZE)
+            os.replace(part_file, local_path)
+        except BaseException:
+            if os.path.exists(part_file):
+                os.remove(part_file)
+            raise
+        self.logger.info(f"アーカイブから取り出しました: {remote_path}:{name} -> {local_path} ({size:,} bytes)")
+        return {"name": name, "local_path": local_path, "size": size}
+    
+    def download_file(self, remote_path: str, local_path: str, show_progress: bool = True) -> Dict[str, Any]:
+        # 大きなファイルを複数のRange要求で並列に取得する（中断しても再実行すれば続きから取得する）
+        self.logger.info(f"ダウンロード開始: {remote_path} -> {local_path}")
+        started_at = time.time()
+        started = time.monotonic()
+        
+        def progress_callback(downloaded, total):
+            percent = (downloaded / total) * 100 if total else 100.0
+            print(f"\rダウンロード進捗: {percent:.1f}% ({downloaded:,}/{total:,} bytes)", end="")
+        
+        try:
+            result = self.client.download_file(remote_path, local_path, progress_callback if show_progress else None)
+        except Exception as e:
+            if show_progress:
+                print()  # 改行
+            self.logger.error(f"ダウンロードエラー: {remote_path}: {str(e)}")
+            self._record_manifest(local_path, remote_path, UploadManifest.OUTCOME_FAILED, started_at,
+                                  time.monotonic() - started, 1, error=str(e),
+                                  kind=UploadManifest.KIND_DOWNLOAD, size=0)
+            raise
+        if show_progress:
+            print()  # 改行
+        self.logger.info(self._format_download_result(result))
+        self._record_manifest(local_path, remote_path, UploadManifest.OUTCOME_SUCCESS, started_at,
+                              result["elapsed"], 1, kind=UploadManifest.KIND_DOWNLOAD)
+        return result
+    
+    def download_folder(self, remote_root: str, local_root: str) -> List[Dict[str, Any]]:
+        # フォルダー全体を取得する（取得済みのファイルは省略される）
+        connections = Config.DOWNLOAD_WORKERS * Config.DOWNLOAD_FILE_WORKERS
+        if connections > self.client.transport.pool_maxsize:
+            self.logger.warning(
+                f"同時Range要求数({connections})が接続プールの上限({self.client.transport.pool_maxsize})を超えています。"
+                "HTTP_POOL_MAXSIZEの引き上げを検討してください"
+            )
+        started_at = time.time()
+        started = time.monotonic()
+        self.logger.info(f"一括ダウンロード開始: {remote_root} -> {local_root}")
+        results = self.client.download_folder(remote_root, local_root)
+        for result in results:
+            # 取得済みで省略したファイルは転送していないため記録しない
+            if result["skipped"]:
+                continue
+            outcome = UploadManifest.OUTCOME_SUCCESS if result["success"] else UploadManifest.OUTCOME_FAILED
+            self._record_manifest(result["local_path"], result["remote_path"], outcome, started_at,
+                                  result.get("elapsed"), 1, error=result["error"],
+                                  kind=UploadManifest.KIND_DOWNLOAD, size=result["size"] if result["success"] else 0)
+        
+        failed = [result for result in results if not result["success"]]
+        for result in failed:
+            self.logger.error(f"ダウンロードエラー: {result['remote_path']}: {result['error']}")
+        skipped = sum(1 for result in results if result["skipped"])
+        downloaded = sum(result["size"] for result in results if result["success"] and not result["skipped"])
+        self.logger.info(
+            f"一括ダウンロード完了: 取得 {len(results) - len(failed) - skipped}件 / 省略 {skipped}件 / "
+            f"失敗 {len(failed)}件 ({downloaded:,} bytes, {time.monotonic() - started:.1f}秒)"
+        )
+        return results
+    
+    @staticmethod
+    def _format_download_result(result: Dict[str, Any]) -> str:
+        elapsed = result["elapsed"]
+        speed = result["size"] / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+        verified = {True: "ハッシュ一致", False: "ハッシュ不一致", None: "未検証"}[result["verified"]]
+        resumed = f", 再開 {result['resumed_ranges']}/{result['ranges']}範囲" if result["resumed_ranges"] else ""
+        return (
+            f"ダウンロード完了: {result['local_path']} ({result['size']:,} bytes, {elapsed:.1f}秒, "
+            f"{speed:.1f} MB/s, {verified}{resumed})"
+        )
+    
+    def _collect_remote_files(self, remote_root: str) -> Dict[str, Dict[str, Any]]:
+        # 正規化したリモートパス -> 比較用の状態
+        # リモートインデックスがあればAPIを呼ばずに解決し、なければフォルダーを順に列挙する
+        remote_files = {}
+        if self.remote_index is not None:
+            for entry in self.remote_index.iter_items(remote_root):
+                if not entry["folder"]:
+                    remote_files[normalize_folder_path(entry["path"])] = remote_file_state(entry)
+            return remote_files
+        
+        select = ["id", "name", "size", "folder", "file", "lastModifiedDateTime", "fileSystemInfo"]
+        pending = [remote_root.strip("/")]
+        while pending:
+            folder_path = pending.pop()
+            try:
+                for item in self.client.iter_files(folder_path, select=select):
+                    item_path = f"{folder_path}/{item['name']}" if folder_path else item["name"]
+                    if "folder" in item:
+                        pending.append(item_path)
+                    else:
+                        remote_files[normalize_folder_path(item_path)] = remote_file_state(item)
+            except HTTPError as e:
+                # 同期先のフォルダーがまだ存在しない場合はすべて新規
+                if e.response is not None and e.response.status_code == 404 and folder_path == remote_root.strip("/"):
+                    continue
+                raise
+        return remote_files
+    
+    def _upload_tasks(self, tasks: List[Tuple[str, str, int]], workers: int,
+                      upload_entry=None) -> List[Dict[str, Any]]:
+        # upload_entryは (読み込み元, リモートパス, サイズ) を受け取り結果を返す（既定はローカルファイル）
+        upload_entry = upload_entry or self._upload_directory_entry
+        if workers > self.client.transport.pool_maxsize:
+            self.logger.warning(
+                f"並列数({workers})が接続プールの上限({self.client.transport.pool_maxsize})を超えています。"
+                "HTTP_POOL_MAXSIZEの引き上げを検討してください"
+            )
+        if not self.client.reserve_upload_buffers(workers):
+            self.logger.warning(
+                f"並列数({workers})に対してバッファプール({self.client.buffer_pool.max_buffers}個)が不足しています。"
+                "大きなファイルのアップロードはバッファの空きを待ちます。UPLOAD_BUFFER_POOL_SIZEの引き上げを検討してください"
+            )
+        
+        # 大きいファイルから先に投入して全体の完了時間を短くする
+        tasks = sorted(tasks, key=lambda task: task[2], reverse=True)
+        results = []
+        queue_depth = self.metrics.queue_depth
+        
+        def start_entry(source, remote_path: str, size: int) -> Dict[str, Any]:
+            # ワーカーが取り出した時点で待ち数から外す
+            queue_depth.dec("upload")
+            return upload_entry(source, remote_path, size)
+        
+        queue_depth.add(len(tasks), "upload")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(start_entry, source, remote_path, size)
+                for source, remote_path, size in tasks
+            ]
+            for future in as_completed(futures):
+                results.append(future.result())
+        
+        rate_stats = self.client.get_rate_stats()
+        if rate_stats["throttled"]:
+            self.logger.info(
+                f"スロットリング: {rate_stats['throttled']}回 / 待機 {rate_stats['waited_seconds']:.1f}秒"
+            )
+        return results
+    
+    def _finish_directory_upload(self, local_root: str, remote_root: str):
+        # ファイルを含まないディレクトリだけは明示的に作成する
+        for folder_path in walk_empty_directories(local_root, remote_root):
+            try:
+                self.client.create_folders(folder_path)
+            except Exception as e:
+                self.logger.error(f"フォルダー作成エラー: {folder_path}: {str(e)}")
+        self.client.folder_cache.save()
+        if self.remote_index is not None:
+            self.remote_index.save()
+    
+    def _upload_directory_entry(self, local_path: str, remote_path: str, size: int) -> Dict[str, Any]:
+        # 1ファイルの失敗でバッチ全体を止めないよう、例外は結果として返す
+        started = time.monotonic()
+        result = {
+            "local_path": local_path,
+            "remote_path": remote_path,
+            "size": size,
+            "success": False,
+            "error": None,
+        }
+        try:
+            item = self.upload_file(local_path, remote_path, show_progress=False)
+            result["success"] = True
+            result["item_id"] = item.get("id")
+        except Exception as e:
+            result["error"] = str(e)
+        result["elapsed"] = time.monotonic() - started
+        return result
+    
+    def upload_s3_object(self, bucket: str, key: str, remote_path: str, source: Optional[S3Source] = None,
+                         show_progress: bool = True) -> Dict[str, Any]:
+        # S3オブジェクトをローカルディスクに保存せず、範囲GETで読みながらアップロードする
+        source = source or S3Source(bucket)
+        info = source.stat(key)
+        return self._upload_s3_and_record(source, key, remote_path, info["size"], info["etag"], show_progress)
+    
+    def _upload_s3_and_record(self, source: S3Source, key: str, remote_path: str, size: int,
+                              etag: Optional[str], show_progress: bool = False) -> Dict[str, Any]:
+        # 再試行を含めた1オブジェクト分の結果をメトリクスとマニフェストに記録する
+        attempts = [0]
+        started_at = time.time()
+        started = time.monotonic()
+        try:
+            result = self._upload_s3_object(source, key, remote_path, size, etag, show_progress, attempts)
+        except Exception as e:
+            self._record_metrics(UploadManifest.OUTCOME_FAILED, attempts[0])
+            self._record_manifest(source.url(key), remote_path, UploadManifest.OUTCOME_FAILED, started_at,
+                                  time.monotonic() - started, attempts[0], error=str(e),
+                                  kind=UploadManifest.KIND_S3, size=size)
+            raise
+        self._record_metrics(UploadManifest.OUTCOME_SUCCESS, attempts[0])
+        self._record_manifest(source.url(key), remote_path, UploadManifest.OUTCOME_SUCCESS, started_at,
+                              time.monotonic() - started, attempts[0], item=result,
+                              kind=UploadManifest.KIND_S3, size=size)
+        return result
+    
+    @retry_on_exception(max_retries=3, delay=1.0, backoff=2.0, exceptions=(HTTPError,))
+    def _upload_s3_object(self, source: S3Source, key: str, remote_path: str, size: int,
+                          etag: Optional[str], show_progress: bool = False,
+                          attempts: Optional[List[int]] = None) -> Dict[str, Any]:
+        if attempts is not None:
+            attempts[0] += 1
+        self.logger.info(f"アップロード開始: {source.url(key)} ({size:,} bytes)")
+        
+        def progress_callback(uploaded, total):
+            percent = (uploaded / total) * 100
+            print(f"\rアップロード進捗: {percent:.1f}% ({uploaded:,}/{total:,} bytes)", end="")
+        
+        try:
+            with source.open(key, size, etag) as reader:
+                result = self.client.upload_fileobj(reader, size, remote_path,
+                                                    progress_callback if show_progress else None)
+            if show_progress:
+                print()  # 改行
+        except Exception as e:
+            if show_progress:
+                print()  # 改行
+            self.logger.error(f"アップロードエラー: {source.url(key)}: {str(e)}")
+            self.logger.log_upload(source.url(key), remote_path, size, False)
+            raise
+        if self.remote_index is not None:
+            self.remote_index.record_item(remote_path, result)
+        self.logger.log_upload(source.url(key), remote_path, size, True)
+        self.logger.info(f"アップロード完了: {result.get('name', remote_path)}")
+        return result
+    
+    def upload_s3_prefix(self, bucket: str, prefix: str, remote_root: str, workers: Optional[int] = None,
+                         source: Optional[S3Source] = None) -> List[Dict[str, Any]]:
+        # S3のプレフィックス配下をワーカープールでまとめて転送する（prefix以下の相対パスでremote_rootに配置）
+        source = source or S3Source(bucket)
+        workers = workers or Config.UPLOAD_WORKERS
+        tasks = []
+        etags: Dict[str, Optional[str]] = {}
+        for key, remote_path, size, etag in source.walk_objects(prefix, remote_root):
+            tasks.append((key, remote_path, size))
+            etags[key] = etag
+        self.logger.info(
+            f"S3からの一括アップロード開始: {source.url(prefix)} -> {remote_root} ({len(tasks)}ファイル, {workers}並列)"
+        )
+        
+        def upload_entry(key: str, remote_path: str, size: int) -> Dict[str, Any]:
+            return self._upload_s3_entry(source, key, remote_path, size, etags[key])
+        
+        results = self._upload_tasks(tasks, workers, upload_entry)
+        self.client.folder_cache.save()
+        if self.remote_index is not None:
+            self.remote_index.save()
+        
+        succeeded = sum(1 for result in results if result["success"])
+        self.logger.info(f"S3からの一括アップロード完了: 成功 {succeeded}件 / 失敗 {len(results) - succeeded}件")
+        return results
+    
+    def _upload_s3_entry(self, source: S3Source, key: str, remote_path: str, size: int,
+                         etag: Optional[str]) -> Dict[str, Any]:
+        started = time.monotonic()
+        result = {
+            "source": source.url(key),
+            "remote_path": remote_path,
+            "size": size,
+            "success": False,
+            "error": None,
+        }
+        try:
+            item = self._upload_s3_and_record(source, key, remote_path, size, etag)
+            result["success"] = True
+            result["item_id"] = item.get("id")
+        except Exception as e:
+            result["error"] = str(e)
+        result["elapsed"] = time.monotonic() - started
+        return result
+    
     def create_folder(self, folder_path: str):
+        # 親フォルダーも含めて作成する（既知のフォルダーへのリクエストは省略される）
         try:
-            result = self.client.create_folder(folder_path)
+            result = self.client.create_folders(folder_path)
             if result.get("status") == "already_exists":
                 self.logger.info(f"フォルダーは既に存在します: {folder_path}")
             else:
@@ -76,29 +631,50 @@ class OneDriveUploader:
             self.logger.error(f"フォルダー作成エラー: {str(e)}")
             raise
     
-    def list_files(self, folder_path: str = ""):
+    def list_files(self, folder_path: str = "", return_items: bool = True):
+        # ページ単位で取得しながら表示する（return_items=Falseなら件数のみ返し、メモリ使用量を一定に保つ）
         try:
-            result = self.client.list_files(folder_path)
-            files = result.get("value", [])
+            files = []
+            count = 0
             
             self.logger.info(f"フォルダー内のファイル一覧: {folder_path or 'ルート'}")
-            for file in files:
+            for file in self.client.iter_files(folder_path, select=["id", "name", "size", "folder", "file"]):
                 file_type = "フォルダー" if "folder" in file else "ファイル"
                 size = file.get("size", 0) if "folder" not in file else "-"
                 print(f"  {file_type}: {file['name']} (サイズ: {size})")
+                count += 1
+                if return_items:
+                    files.append(file)
             
-            return files
+            return files if return_items else count
         except Exception as e:
             self.logger.error(f"ファイル一覧取得エラー: {str(e)}")
             raise
 
 
-def main():
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="OneDrive EC2 Uploader")
+    parser.add_argument(
+        "--stdin",
+        metavar="REMOTE_PATH",
+        help="標準入力の内容をREMOTE_PATHにアップロードする（例: pg_dump mydb | python run.py --stdin backups/mydb.sql）"
+    )
+    parser.add_argument("--no-progress", action="store_true", help="進捗を表示しない")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
     uploader = OneDriveUploader()
     
     try:
         uploader.initialize()
         
+        if args.stdin:
+            # 標準入力はサイズが分からないため、フラグメント単位で送りながら読み進める
+            uploader.upload_from_stream(sys.stdin.buffer, args.stdin, show_progress=not args.no_progress)
+            return
+        
         # デモ: テキストファイルのアップロード
         demo_file = "test_upload.txt"
         if not os.path.exists(demo_file):
@@ -107,10 +683,7 @@ def main():
                 f.write("これはテストファイルです。\n")
                 f.write("正常にアップロードされるはずです。\n")
         
-        # フォルダーの作成
-        uploader.create_folder("test_folder")
-        
-        # ファイルのアップロード
+        # ファイルのアップロード（パス指定のアップロードで親フォルダーも作成される）
         uploader.upload_file(demo_file, "test_folder/test_upload.txt")
         
         # ファイル一覧の表示
@@ -0,0 +1,185 @@
+import os
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Any, Iterator, Tuple
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:  # S3からの転送を使わない場合は不要
+    boto3 = None
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.config import Config
+from src.utils.file_walker import to_remote_path
+
+
+# S3オブジェクトを範囲GETで読み込むシーク可能なファイル風オブジェクト
+# 現在位置の範囲に加えて次のread_ahead個の範囲を並列に取得しておき、アップロードの送信と重ねる
+# メモリに保持するのは range_size × (read_ahead + 1) までで、オブジェクトのサイズには依存しない
+class S3ObjectReader:
+    def __init__(self, client, bucket: str, key: str, size: int, etag: Optional[str] = None,
+                 range_size: Optional[int] = None, read_ahead: Optional[int] = None):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self.etag = etag
+        self.range_size = range_size or Config.S3_RANGE_SIZE
+        self.read_ahead = max(0, Config.S3_READ_AHEAD if read_ahead is None else read_ahead)
+        self.closed = False
+        self.requests = 0
+        self._position = 0
+        self._ranges: Dict[int, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=self.read_ahead + 1, thread_name_prefix="s3-read-ahead")
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("負の位置にはシークできません")
+        # 先読み済みの範囲は次のreadintoで必要なものだけが残る
+        self._position = offset
+        return offset
+
+    def _schedule(self, index: int):
+        last = (self.size - 1) // self.range_size
+        wanted = range(index, min(index + self.read_ahead, last) + 1)
+        for stale in [i for i in self._ranges if i not in wanted]:
+            self._ranges.pop(stale).cancel()
+        for i in wanted:
+            if i not in self._ranges:
+                self._ranges[i] = self._executor.submit(self._fetch, i)
+
+    def _fetch(self, index: int) -> bytes:
+        start = index * self.range_size
+        end = min(self.size, start + self.range_size) - 1
+        params = {"Bucket": self.bucket, "Key": self.key, "Range": f"bytes={start}-{end}"}
+        if self.etag:
+            # 転送中にオブジェクトが置き換えられた場合は、異なる内容を混ぜずに失敗させる
+            params["IfMatch"] = self.etag
+
+        error = None
+        for attempt in range(1, Config.CHUNK_MAX_RETRIES + 2):
+            try:
+                self.requests += 1
+                data = self.client.get_object(**params)["Body"].read()
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "412"):
+                    raise IOError(f"転送中にS3オブジェクトが変更されました: s3://{self.bucket}/{self.key}") from e
+                raise
+            except BotoCoreError as e:
+                # 本文の読み込み途中の切断はbotocoreが再試行しないため、範囲単位で取り直す
+                error = e
+            else:
+                if len(data) == end - start + 1:
+                    return data
+                error = IOError(f"範囲GETの長さが一致しません: {len(data)} != {end - start + 1}")
+            time.sleep(min(Config.CHUNK_RETRY_DELAY * (2 ** (attempt - 1)), Config.CHUNK_RETRY_MAX_DELAY))
+        raise error
+
+    def readinto(self, buffer) -> int:
+        if self.closed:
+            raise ValueError("閉じたオブジェクトからは読み込めません")
+        view = memoryview(buffer).cast('B')
+        copied = 0
+        while copied < len(view) and self._position < self.size:
+            index = self._position // self.range_size
+            self._schedule(index)
+            try:
+                data = self._ranges[index].result()
+            except BaseException:
+                self._ranges.pop(index, None)
+                raise
+            start = self._position - index * self.range_size
+            length = min(len(view) - copied, len(data) - start)
+            view[copied:copied + length] = data[start:start + length]
+            copied += length
+            self._position += length
+        return copied
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = max(0, self.size - self._position)
+        buffer = bytearray(size)
+        length = self.readinto(buffer)
+        return bytes(buffer[:length])
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for future in self._ranges.values():
+            future.cancel()
+        self._ranges.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# S3バケットを読み込み元とするアダプター
+# ローカルディスクに保存せずに、範囲GETで読みながらOneDriveのアップロードセッションへ送る
+class S3Source:
+    def __init__(self, bucket: str, client=None, endpoint_url: Optional[str] = None,
+                 range_size: Optional[int] = None, read_ahead: Optional[int] = None):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("S3からの転送にはboto3パッケージが必要です")
+            client = boto3.client(
+                "s3",
+                endpoint_url=endpoint_url or Config.S3_ENDPOINT_URL or None,
+                config=BotoConfig(max_pool_connections=Config.S3_MAX_POOL_CONNECTIONS)
+            )
+        self.client = client
+        self.bucket = bucket
+        self.range_size = range_size
+        self.read_ahead = read_ahead
+
+    def url(self, key: str) -> str:
+        return f"s3://{self.bucket}/{key}"
+
+    def stat(self, key: str) -> Dict[str, Any]:
+        response = self.client.head_object(Bucket=self.bucket, Key=key)
+        return {"key": key, "size": response["ContentLength"], "etag": response.get("ETag")}
+
+    def iter_objects(self, prefix: str = "") -> Iterator[Dict[str, Any]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"].endswith("/"):
+                    # フォルダーを表す空のオブジェクト
+                    continue
+                yield {"key": obj["Key"], "size": obj["Size"], "etag": obj.get("ETag")}
+
+    def walk_objects(self, prefix: str, remote_root: str) -> Iterator[Tuple[str, str, int, Optional[str]]]:
+        # (キー, リモートパス, サイズ, ETag) を列挙する。prefixはフォルダーとして扱う
+        prefix = prefix.strip("/")
+        if prefix:
+            prefix += "/"
+        for obj in self.iter_objects(prefix):
+            yield obj["key"], to_remote_path(remote_root, obj["key"][len(prefix):]), obj["size"], obj["etag"]
+
+    def open(self, key: str, size: Optional[int] = None, etag: Optional[str] = None) -> S3ObjectReader:
+        if size is None:
+            info = self.stat(key)
+            size, etag = info["size"], etag or info["etag"]
+        return S3ObjectReader(self.client, self.bucket, key, size, etag, self.range_size, self.read_ahead)
@@ -0,0 +1,363 @@
+import bisect
+import copy
+import io
+import json
+import os
+import queue
+import sys
+import tarfile
+import threading
+from typing import Optional, Dict, Any, List, Tuple, Iterator
+
+try:
+    import zstandard
+except ImportError:  # 圧縮なしのアーカイブのみ作成できる
+    zstandard = None
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.file_walker import walk_files, walk_empty_directories
+
+
+# 2: 大きなメンバーを複数のフレームに分割する（1では1メンバーが1フレームに収まる）
+ARCHIVE_INDEX_VERSION = 2
+_TAR_BLOCK = tarfile.BLOCKSIZE
+# tarfileは512バイト単位の細かい書き込みを行うため、この大きさまでまとめてからパイプへ渡す
+_WRITE_COALESCE_SIZE = 256 * 1024
+_CLOSED = object()
+# メンバーを取り出すときに1回の範囲ダウンロードで取得する大きさ
+_EXTRACT_RANGE_SIZE = 16 * 1024 * 1024
+
+
+# 生成スレッドが書き込み、アップロード側がreadintoで読み出す有限長のパイプ
+# キューが一杯なら書き込み側を待たせるため、メモリ使用量は max_chunks × 書き込み単位に収まる
+class StreamPipe:
+    _POLL_INTERVAL = 0.1
+
+    def __init__(self, max_chunks: int = 64):
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._pending = memoryview(b"")
+        self._eof = False
+        self._cancelled = threading.Event()
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(data, timeout=self._POLL_INTERVAL)
+                return len(data)
+            except queue.Full:
+                continue
+        raise IOError("読み出し側が終了したため書き込みを中止しました")
+
+    def close(self, error: Optional[BaseException] = None):
+        # 生成側の例外は読み出し側で送出する
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(error or _CLOSED, timeout=self._POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        while not self._pending and not self._eof:
+            item = self._queue.get()
+            if item is _CLOSED:
+                self._eof = True
+            elif isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            else:
+                self._pending = memoryview(item)
+        length = min(len(view), len(self._pending))
+        view[:length] = self._pending[:length]
+        self._pending = self._pending[length:]
+        return length
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            chunks = []
+            while True:
+                chunk = self.read(1024 * 1024)
+                if not chunk:
+                    return b"".join(chunks)
+                chunks.append(chunk)
+        buffer = bytearray(size)
+        length = self.readinto(buffer)
+        return bytes(buffer[:length])
+
+
+# tarfileに渡す書き込み先。tarの位置（tell）を数え、圧縮する場合はzstdのフレームに区切ってパイプへ流す
+# フレームはメンバーの先頭で切り替え、frame_sizeを超える大きなメンバーは途中でも次のフレームに分ける
+# 取り出すときはメンバーと重なるフレームだけを範囲ダウンロードし、先頭から順に展開する
+class _ArchiveWriter:
+    def __init__(self, pipe: StreamPipe, compress: bool, frame_size: int, level: int):
+        self.pipe = pipe
+        self.compress = compress
+        self.frame_size = frame_size
+        self._position = 0
+        self._output = 0
+        self._compressor = zstandard.ZstdCompressor(level=level) if compress else None
+        self._frame = None
+        self._buffer = bytearray()
+        self.frames: List[Dict[str, int]] = []
+        self._frame_offsets: List[int] = []
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        length = len(data)
+        if not length:
+            return 0
+        if self._compressor is None:
+            self._emit(data)
+        else:
+            if self._frame is None:
+                self._start_frame()
+            elif self._position - self._frame["tar_offset"] >= self.frame_size:
+                # 展開時に一度に扱う量をフレームの大きさに抑える
+                self._end_frame()
+                self._start_frame()
+            self._emit(self._frame["compressor"].compress(data))
+        self._position += length
+        return length
+
+    def _emit(self, data):
+        if data:
+            self._buffer += data
+            self._output += len(data)
+            if len(self._buffer) >= _WRITE_COALESCE_SIZE:
+                self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self.pipe.write(self._buffer)
+            self._buffer = bytearray()
+
+    def _start_frame(self):
+        self._frame = {
+            "compressor": self._compressor.compressobj(),
+            "offset": self._output,
+            "tar_offset": self._position,
+        }
+
+    def _end_frame(self):
+        frame = self._frame
+        self._emit(frame["compressor"].flush(zstandard.COMPRESSOBJ_FLUSH_FINISH))
+        self.frames.append({
+            "offset": frame["offset"],
+            "length": self._output - frame["offset"],
+            "tar_offset": frame["tar_offset"],
+            "tar_length": self._position - frame["tar_offset"],
+        })
+        self._frame_offsets.append(frame["tar_offset"])
+        self._frame = None
+
+    def member_boundary(self) -> Optional[int]:
+        # 次のメンバーの直前で呼ぶ。フレームが十分大きければ閉じる（戻り値は現在のフレーム番号）
+        if self._compressor is None:
+            return None
+        if self._frame is not None and self._position - self._frame["tar_offset"] >= self.frame_size:
+            self._end_frame()
+        if self._frame is None:
+            self._start_frame()
+        return len(self.frames)
+
+    def frame_at(self, tar_offset: int) -> int:
+        # tar内の位置を含むフレームの番号
+        if self._frame is not None and tar_offset >= self._frame["tar_offset"]:
+            return len(self.frames)
+        return bisect.bisect_right(self._frame_offsets, tar_offset) - 1
+
+    def close(self):
+        if self._frame is not None:
+            self._end_frame()
+        self._flush()
+
+    @property
+    def output_size(self) -> int:
+        return self._output
+
+
+# ディレクトリをtar（任意でzstd圧縮）としてその場で生成するストリーム
+# ディスクには何も書き出さず、生成と同時にアップロードできる
+# 圧縮しない場合は、生成前に全メンバーのヘッダーを作って総サイズ（size）を求めておく
+class DirectoryArchiveStream:
+    def __init__(self, local_root: str, compress: bool = False, frame_size: int = 4 * 1024 * 1024,
+                 level: int = 3, max_chunks: int = 64):
+        if compress and zstandard is None:
+            raise RuntimeError("zstd圧縮にはzstandardパッケージが必要です")
+        if not os.path.isdir(local_root):
+            raise NotADirectoryError(f"ディレクトリが見つかりません: {local_root}")
+        self.local_root = local_root
+        self.compress = compress
+        self.pipe = StreamPipe(max_chunks)
+        self._writer = _ArchiveWriter(self.pipe, compress, frame_size, level)
+        self.members: List[Dict[str, Any]] = []
+        self._entries, tar_size = self._scan()
+        # アップロード時に全フラグメントのContent-Rangeへ付ける総サイズ（圧縮後のサイズは事前に分からない）
+        self.size: Optional[int] = None if compress else tar_size
+        self._thread = threading.Thread(target=self._produce, name="ArchiveProducer", daemon=True)
+        self._thread.start()
+
+    def _scan(self) -> Tuple[List[Tuple[Optional[str], tarfile.TarInfo]], int]:
+        # (ローカルパス, TarInfo) の一覧と、tarfileが書き出すバイト数を返す
+        # 生成時も同じTarInfoを使うため、途中でファイルが伸びてもサイズは変わらない（縮んだ場合は生成が失敗する）
+        tar = tarfile.open(fileobj=io.BytesIO(), mode='w', format=tarfile.PAX_FORMAT)
+        entries = []
+        for local_path, arcname, size in walk_files(self.local_root, ""):
+            entries.append((local_path, self._tarinfo(tar, local_path, arcname)))
+        for arcname in walk_empty_directories(self.local_root, ""):
+            entries.append((None, self._tarinfo(tar, os.path.join(self.local_root, arcname), arcname)))
+        
+        size = 0
+        for local_path, tarinfo in entries:
+            # ヘッダー（長い名前などのPAX拡張ヘッダーを含む）と、512バイト単位に埋めたデータ
+            size += len(copy.copy(tarinfo).tobuf(tar.format, tar.encoding, tar.errors))
+            size += (tarinfo.size + _TAR_BLOCK - 1) // _TAR_BLOCK * _TAR_BLOCK
+        # 終端の0ブロック2つを書いた後、tarfileはレコードサイズの倍数まで0で埋める
+        size += 2 * _TAR_BLOCK
+        size = (size + tarfile.RECORDSIZE - 1) // tarfile.RECORDSIZE * tarfile.RECORDSIZE
+        return entries, size
+
+    @staticmethod
+    def _tarinfo(tar: tarfile.TarFile, local_path: str, arcname: str) -> tarfile.TarInfo:
+        tarinfo = tar.gettarinfo(local_path, arcname=arcname)
+        # 小数のmtimeはメンバーごとにPAX拡張ヘッダー（1KB）を増やすため秒単位にする
+        tarinfo.mtime = int(tarinfo.mtime)
+        return tarinfo
+
+    def _produce(self):
+        error = None
+        try:
+            with tarfile.open(fileobj=self._writer, mode='w', format=tarfile.PAX_FORMAT) as tar:
+                for local_path, tarinfo in self._entries:
+                    if local_path is None:
+                        self._writer.member_boundary()
+                        tar.addfile(tarinfo)
+                    else:
+                        self._add_file(tar, local_path, tarinfo)
+            # tarの終端ブロックは閉じたときに書き込まれるため、その後でフレームを閉じる
+            self._writer.close()
+        except BaseException as e:
+            error = e
+        self.pipe.close(error)
+
+    def _add_file(self, tar: tarfile.TarFile, local_path: str, tarinfo: tarfile.TarInfo):
+        frame = self._writer.member_boundary()
+        with open(local_path, 'rb') as f:
+            tar.addfile(tarinfo, f)
+        # addfile後のtar.offsetはパディング済みデータの末尾
+        padded = (tarinfo.size + _TAR_BLOCK - 1) // _TAR_BLOCK * _TAR_BLOCK
+        member = {
+            "name": tarinfo.name,
+            "size": tarinfo.size,
+            "mtime": tarinfo.mtime,
+            "offset": tar.offset - padded,
+        }
+        if frame is not None:
+            # データの先頭を含むフレーム（ヘッダーの後でフレームが切り替わる場合がある）
+            member["frame"] = self._writer.frame_at(member["offset"])
+        self.members.append(member)
+
+    def readinto(self, buffer) -> int:
+        return self.pipe.readinto(buffer)
+
+    def read(self, size: int = -1) -> bytes:
+        return self.pipe.read(size)
+
+    def close(self):
+        self.pipe.cancel()
+        self._thread.join()
+
+    def build_index(self) -> Dict[str, Any]:
+        # 生成が終わってから呼ぶ（メンバーごとのtar内オフセットと、圧縮時はフレームの位置）
+        self._thread.join()
+        index = {
+            "version": ARCHIVE_INDEX_VERSION,
+            "compression": "zstd" if self.compress else None,
+            "archive_size": self._writer.output_size,
+            "members": self.members,
+        }
+        if self.compress:
+            index["frames"] = self._writer.frames
+        return index
+
+
+def index_remote_path(archive_remote_path: str) -> str:
+    return f"{archive_remote_path}.index.json"
+
+
+def find_member(index: Dict[str, Any], name: str) -> Optional[Dict[str, Any]]:
+    name = name.replace(os.sep, "/").strip("/")
+    for member in index["members"]:
+        if member["name"] == name:
+            return member
+    return None
+
+
+def extract_member(client, archive_remote_path: str, index: Dict[str, Any], name: str, fileobj,
+                   range_size: int = _EXTRACT_RANGE_SIZE) -> int:
+    # 範囲ダウンロードでアーカイブから1つのメンバーだけを取り出し、fileobjへ順に書き込む（戻り値は書き込んだバイト数）
+    # メモリに保持するのは範囲1つ分とその展開結果だけで、メンバーの大きさには依存しない
+    member = find_member(index, name)
+    if member is None:
+        raise KeyError(f"アーカイブにメンバーが見つかりません: {name}")
+    start = member["offset"]
+    end = start + member["size"]
+    if member["size"] == 0:
+        return 0
+
+    if not index.get("compression"):
+        for data in _download_ranges(client, archive_remote_path, start, end, range_size):
+            fileobj.write(data)
+        return member["size"]
+
+    if zstandard is None:
+        raise RuntimeError("zstd圧縮にはzstandardパッケージが必要です")
+    written = 0
+    for frame in _overlapping_frames(index["frames"], start, end):
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        position = frame["tar_offset"]
+        compressed_end = frame["offset"] + frame["length"]
+        for compressed in _download_ranges(client, archive_remote_path, frame["offset"], compressed_end, range_size):
+            data = decompressor.decompress(compressed)
+            # 展開したデータのうちメンバーと重なる部分だけを書き込む
+            low = max(start - position, 0)
+            high = min(end - position, len(data))
+            if low < high:
+                fileobj.write(memoryview(data)[low:high])
+                written += high - low
+            position += len(data)
+            if position >= end:
+                break
+    if written != member["size"]:
+        raise IOError(f"メンバーを取り出せませんでした: {name}（{written:,}/{member['size']:,} bytes）")
+    return written
+
+
+def _download_ranges(client, remote_path: str, start: int, end: int, range_size: int) -> Iterator[bytes]:
+    # [start, end) をrange_sizeごとに範囲ダウンロードする
+    while start < end:
+        stop = min(start + range_size, end)
+        yield client.download_range(remote_path, start, stop - 1)
+        start = stop
+
+
+def _overlapping_frames(frames: List[Dict[str, int]], start: int, end: int) -> Iterator[Dict[str, int]]:
+    # tar内の [start, end) と重なるフレームを先頭から順に返す
+    first = max(bisect.bisect_right([frame["tar_offset"] for frame in frames], start) - 1, 0)
+    for frame in frames[first:]:
+        if frame["tar_offset"] >= end:
+            return
+        yield frame
+
+
+def dumps_index(index: Dict[str, Any]) -> bytes:
+    return json.dumps(index, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
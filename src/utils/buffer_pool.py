@@ -0,0 +1,99 @@
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.logger import get_logger
+
+
+# チャンク読み込み用の再利用可能なバッファプール
+# 確保するバッファ数の上限を設けることで、並列アップロード数に関係なくメモリ使用量を
+# buffer_size * max_buffers に抑える
+class BufferPool:
+    # 空き待ちがこの秒数を超えたら警告する（並列数に対してバッファが足りていない）
+    WAIT_WARNING_SECONDS = 10.0
+
+    def __init__(self, buffer_size: int, max_buffers: int, wait_warning: Optional[float] = None):
+        if buffer_size <= 0 or max_buffers <= 0:
+            raise ValueError("buffer_size と max_buffers は正の値である必要があります")
+        self.buffer_size = buffer_size
+        self.max_buffers = max_buffers
+        self.wait_warning = self.WAIT_WARNING_SECONDS if wait_warning is None else wait_warning
+        self._free: List[bytearray] = []
+        self._allocated = 0
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._waits = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> bytearray:
+        # 空きがなければ他のアップロードが返却するまで待つ
+        with self._condition:
+            started = time.monotonic()
+            warned = False
+            if not self._free and self._allocated >= self.max_buffers:
+                self._waits += 1
+            while not self._free and self._allocated >= self.max_buffers:
+                waited = time.monotonic() - started
+                if timeout is not None and waited >= timeout:
+                    raise TimeoutError("バッファプールの空き待ちがタイムアウトしました")
+                wait = None if timeout is None else timeout - waited
+                if not warned:
+                    if waited >= self.wait_warning:
+                        warned = True
+                        get_logger().warning(
+                            f"バッファプールの空きを{waited:.1f}秒待っています（上限 {self.max_buffers}個）。"
+                            "並列数に対してUPLOAD_BUFFER_POOL_SIZEが不足しています"
+                        )
+                    else:
+                        remaining = self.wait_warning - waited
+                        wait = remaining if wait is None else min(wait, remaining)
+                self._condition.wait(wait)
+            if self._free:
+                buffer = self._free.pop()
+            else:
+                buffer = bytearray(self.buffer_size)
+                self._allocated += 1
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+            return buffer
+
+    def reserve(self, max_buffers: int):
+        # 上限を引き上げる（バッファは必要になった時点で確保するため、すぐにはメモリを使わない）
+        with self._condition:
+            if max_buffers > self.max_buffers:
+                self.max_buffers = max_buffers
+                self._condition.notify_all()
+
+    def release(self, buffer: bytearray):
+        with self._condition:
+            self._in_use -= 1
+            self._free.append(buffer)
+            self._condition.notify()
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                "buffer_size": self.buffer_size,
+                "max_buffers": self.max_buffers,
+                "allocated": self._allocated,
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "waits": self._waits,
+            }
+
+
+def read_into(f, view: memoryview) -> int:
+    # 指定サイズを満たすかEOFに達するまでreadintoを繰り返す
+    total = 0
+    length = len(view)
+    while total < length:
+        read = f.readinto(view[total:])
+        if not read:
+            break
+        total += read
+    return total
@@ -0,0 +1,158 @@
+import os
+import queue
+import sys
+import threading
+from typing import Callable, Optional
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.buffer_pool import BufferPool, read_into
+
+
+class Fragment:
+    def __init__(self, offset: int, buffer: bytearray, data: memoryview):
+        self.offset = offset
+        self.buffer = buffer
+        self.data = data
+
+
+# ディスクから1フラグメントずつ読み込む（送信中は次の読み込みを行わない）
+class SequentialChunkReader:
+    def __init__(self, fileobj, start_offset: int, total_size: int, buffer_pool: BufferPool,
+                 size_fn: Callable[[], int]):
+        self.fileobj = fileobj
+        self.total_size = total_size
+        self.buffer_pool = buffer_pool
+        self.size_fn = size_fn
+        self._buffer = buffer_pool.acquire()
+        self._view = memoryview(self._buffer)
+        self._offset = start_offset
+        self.fileobj.seek(start_offset)
+
+    def next(self) -> Fragment:
+        size = min(self.size_fn(), len(self._view), self.total_size - self._offset)
+        length = read_into(self.fileobj, self._view[:size])
+        if length < size:
+            raise IOError("読み込み中にファイルサイズが変更されました")
+        fragment = Fragment(self._offset, self._buffer, self._view[:length])
+        self._offset += length
+        return fragment
+
+    def release(self, fragment: Fragment):
+        pass
+
+    def restart(self, offset: int):
+        self._offset = offset
+        self.fileobj.seek(offset)
+
+    def close(self):
+        if self._buffer is not None:
+            self.buffer_pool.release(self._buffer)
+            self._buffer = None
+
+
+# 読み込みスレッドが次のN個のフラグメントを先読みし、送信とディスク読み込みを重ねる
+# Graphはフラグメントを順番に受け付けるため、並列化するのはI/Oのみ
+class PrefetchingChunkReader:
+    _POLL_INTERVAL = 0.1
+
+    def __init__(self, fileobj, start_offset: int, total_size: int, buffer_pool: BufferPool,
+                 size_fn: Callable[[], int], depth: int):
+        self.fileobj = fileobj
+        self.total_size = total_size
+        self.buffer_pool = buffer_pool
+        self.size_fn = size_fn
+        self.depth = max(1, depth)
+        self._queue = None
+        self._stop = None
+        self._thread = None
+        self._start(start_offset)
+
+    def _start(self, offset: int):
+        self._queue = queue.Queue(maxsize=self.depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._read_loop,
+            args=(offset, self._queue, self._stop),
+            name="chunk-prefetch",
+            daemon=True
+        )
+        self._thread.start()
+
+    def _put(self, fragment_queue: queue.Queue, stop: threading.Event, item) -> bool:
+        while not stop.is_set():
+            try:
+                fragment_queue.put(item, timeout=self._POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _acquire(self, stop: threading.Event) -> Optional[bytearray]:
+        while not stop.is_set():
+            try:
+                return self.buffer_pool.acquire(timeout=self._POLL_INTERVAL)
+            except TimeoutError:
+                continue
+        return None
+
+    def _read_loop(self, offset: int, fragment_queue: queue.Queue, stop: threading.Event):
+        try:
+            self.fileobj.seek(offset)
+            while offset < self.total_size and not stop.is_set():
+                buffer = self._acquire(stop)
+                if buffer is None:
+                    return
+                view = memoryview(buffer)
+                size = min(self.size_fn(), len(view), self.total_size - offset)
+                length = read_into(self.fileobj, view[:size])
+                if length < size:
+                    self.buffer_pool.release(buffer)
+                    raise IOError("読み込み中にファイルサイズが変更されました")
+                if not self._put(fragment_queue, stop, Fragment(offset, buffer, view[:length])):
+                    self.buffer_pool.release(buffer)
+                    return
+                offset += length
+        except Exception as e:
+            self._put(fragment_queue, stop, e)
+
+    def next(self) -> Fragment:
+        item = self._queue.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def release(self, fragment: Fragment):
+        self.buffer_pool.release(fragment.buffer)
+
+    def _stop_reader(self):
+        # 読み込みスレッドを止め、先読み済みのバッファをプールに返す
+        self._stop.set()
+        self._thread.join()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, Fragment):
+                self.buffer_pool.release(item.buffer)
+
+    def restart(self, offset: int):
+        self._stop_reader()
+        self._start(offset)
+
+    def close(self):
+        self._stop_reader()
+
+
+def buffers_per_reader(prefetch_depth: int) -> int:
+    # 先読みでは、キュー内のdepth個に加えて読み込み中と送信中の1個ずつを同時に使う
+    return prefetch_depth + 2 if prefetch_depth > 0 else 1
+
+
+def open_chunk_reader(fileobj, start_offset: int, total_size: int, buffer_pool: BufferPool,
+                      size_fn: Callable[[], int], prefetch_depth: int = 0):
+    if prefetch_depth > 0:
+        return PrefetchingChunkReader(fileobj, start_offset, total_size, buffer_pool, size_fn, prefetch_depth)
+    return SequentialChunkReader(fileobj, start_offset, total_size, buffer_pool, size_fn)
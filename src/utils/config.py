@@ -19,7 +19,103 @@ class Config:
     
     # 個人用アカウント向けのエンドポイントを使用
     AUTHORITY = "https://login.microsoftonline.com/consumers"
-    GRAPH_API_ENDPOINT = "https://graph.microsoft.com/v1.0"
+    # ベンチマークや試験ではローカルの代替サーバーを指定できる
+    GRAPH_API_ENDPOINT = os.getenv('GRAPH_API_ENDPOINT', 'https://graph.microsoft.com/v1.0')
+    
+    # HTTP接続プールの設定（ホスト数とホストごとの最大接続数）
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '4'))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '16'))
+    HTTP_POOL_BLOCK = os.getenv('HTTP_POOL_BLOCK', 'true').lower() == 'true'
+    HTTP_WARMUP_CONNECTIONS = int(os.getenv('HTTP_WARMUP_CONNECTIONS', '1'))
+    
+    # アップロードセッションのジャーナル（空文字で無効化）と放棄とみなすまでの秒数
+    UPLOAD_SESSION_JOURNAL = os.getenv('UPLOAD_SESSION_JOURNAL', 'upload_sessions.json')
+    UPLOAD_SESSION_ABANDON_SECONDS = float(os.getenv('UPLOAD_SESSION_ABANDON_SECONDS', '86400'))
+    # ジャーナルへの進捗の書き込みを間引く（このフラグメント数・秒数のどちらかに達したら書き込む）
+    UPLOAD_SESSION_SAVE_FRAGMENTS = int(os.getenv('UPLOAD_SESSION_SAVE_FRAGMENTS', '10'))
+    UPLOAD_SESSION_SAVE_INTERVAL = float(os.getenv('UPLOAD_SESSION_SAVE_INTERVAL', '5'))
+    
+    # チャンクサイズ（320KiBの倍数）と単純アップロードを使うファイルサイズの上限
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', str(10 * 1024 * 1024)))
+    SIMPLE_UPLOAD_THRESHOLD = int(os.getenv('SIMPLE_UPLOAD_THRESHOLD', str(4 * 1024 * 1024)))
+    
+    # 計測したスループットとRTTからチャンクサイズを調整する適応モード
+    ADAPTIVE_CHUNK_SIZE = os.getenv('ADAPTIVE_CHUNK_SIZE', 'false').lower() == 'true'
+    ADAPTIVE_CHUNK_TARGET_SECONDS = float(os.getenv('ADAPTIVE_CHUNK_TARGET_SECONDS', '2.0'))
+    ADAPTIVE_SIMPLE_UPLOAD_MAX = int(os.getenv('ADAPTIVE_SIMPLE_UPLOAD_MAX', str(60 * 1024 * 1024)))
+    ADAPTIVE_CHUNK_MAX_SIZE = int(os.getenv('ADAPTIVE_CHUNK_MAX_SIZE', str(60 * 1024 * 1024)))
+    
+    # チャンク読み込み用バッファの数（メモリ使用量はバッファ数×最大チャンクサイズ）
+    # 0なら並列数（UPLOAD_WORKERSまたは一括アップロードの並列数）と先読み数から決める
+    UPLOAD_BUFFER_POOL_SIZE = int(os.getenv('UPLOAD_BUFFER_POOL_SIZE', '0'))
+    # 送信中に先読みしておくフラグメント数（0で先読みなし）
+    UPLOAD_PREFETCH_DEPTH = int(os.getenv('UPLOAD_PREFETCH_DEPTH', '0'))
+    
+    # チャンク単位のリトライ（1チャンクあたり・1ファイルあたりの上限回数と待機秒数）
+    CHUNK_MAX_RETRIES = int(os.getenv('CHUNK_MAX_RETRIES', '5'))
+    FILE_MAX_RETRIES = int(os.getenv('FILE_MAX_RETRIES', '20'))
+    CHUNK_RETRY_DELAY = float(os.getenv('CHUNK_RETRY_DELAY', '1.0'))
+    CHUNK_RETRY_MAX_DELAY = float(os.getenv('CHUNK_RETRY_MAX_DELAY', '30.0'))
+    
+    # 既知のフォルダーを保存するファイル（空文字の場合はプロセス内のみ）
+    KNOWN_FOLDERS_CACHE = os.getenv('KNOWN_FOLDERS_CACHE', '')
+    
+    # /deltaで構築したリモートインデックスとデルタトークンの保存先
+    REMOTE_INDEX_FILE = os.getenv('REMOTE_INDEX_FILE', 'remote_index.json')
+    
+    # アップロード履歴を記録するSQLiteファイル（空文字の場合は記録しない）
+    UPLOAD_MANIFEST_DB = os.getenv('UPLOAD_MANIFEST_DB', 'upload_manifest.db')
+    
+    # MSALのトークンキャッシュ（複数プロセスで共有し、ロックファイルは末尾に.lockを付けたパス）
+    TOKEN_CACHE_FILE = os.getenv('TOKEN_CACHE_FILE', 'token_cache.json')
+    # アクセストークンを有効期限の何秒前に更新するか、バックグラウンドで更新するか
+    TOKEN_REFRESH_MARGIN_SECONDS = float(os.getenv('TOKEN_REFRESH_MARGIN_SECONDS', '300'))
+    TOKEN_BACKGROUND_REFRESH = os.getenv('TOKEN_BACKGROUND_REFRESH', 'true').lower() == 'true'
+    
+    # リクエストレートの上限（毎秒のリクエスト数、0で無制限）とバースト数
+    RATE_LIMIT_PER_SECOND = float(os.getenv('RATE_LIMIT_PER_SECOND', '0'))
+    RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', '20'))
+    # 指定すると同じホスト上の全プロセスでレート制限とスロットリングによる停止を共有する
+    RATE_LIMIT_LOCK_FILE = os.getenv('RATE_LIMIT_LOCK_FILE', '')
+    # Retry-Afterのない429を受けたときに停止する秒数
+    RATE_LIMIT_DEFAULT_RETRY_AFTER = float(os.getenv('RATE_LIMIT_DEFAULT_RETRY_AFTER', '10'))
+    # スロットリングされたリクエスト（本文のストリーミングを伴わないもの）を再送する回数
+    RATE_LIMIT_MAX_REPLAYS = int(os.getenv('RATE_LIMIT_MAX_REPLAYS', '3'))
+    
+    # 一括アップロードの並列ワーカー数
+    UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '4'))
+    
+    # 非同期クライアントの同時リクエスト数の上限
+    ASYNC_MAX_CONCURRENCY = int(os.getenv('ASYNC_MAX_CONCURRENCY', '64'))
+    
+    # アーカイブモードのzstd圧縮レベルと、1フレームに含める非圧縮データ量の目安
+    # （大きなメンバーは複数のフレームに分け、取り出すときはメンバーと重なるフレームだけをダウンロードする）
+    ARCHIVE_ZSTD_LEVEL = int(os.getenv('ARCHIVE_ZSTD_LEVEL', '3'))
+    ARCHIVE_FRAME_SIZE = int(os.getenv('ARCHIVE_FRAME_SIZE', str(4 * 1024 * 1024)))
+    
+    # 同期時にサイズ・更新日時に加えてquickXorHashでも内容を比較するか
+    SYNC_COMPARE_HASH = os.getenv('SYNC_COMPARE_HASH', 'false').lower() == 'true'
+    
+    # 並列ダウンロード（1ファイルあたりの同時Range要求数・範囲の大きさ・同時に取得するファイル数）
+    DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', '8'))
+    DOWNLOAD_RANGE_SIZE = int(os.getenv('DOWNLOAD_RANGE_SIZE', str(16 * 1024 * 1024)))
+    DOWNLOAD_FILE_WORKERS = int(os.getenv('DOWNLOAD_FILE_WORKERS', '2'))
+    # ダウンロード後にquickXorHash（なければsha1Hash）で内容を検証するか
+    DOWNLOAD_VERIFY_HASH = os.getenv('DOWNLOAD_VERIFY_HASH', 'true').lower() == 'true'
+    
+    # S3からの転送（S3_ENDPOINT_URLを指定するとMinIOなどS3互換のエンドポイントに接続する）
+    # 1オブジェクトあたり S3_RANGE_SIZE × (S3_READ_AHEAD + 1) までを先読みしてメモリに保持する
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL', '')
+    S3_RANGE_SIZE = int(os.getenv('S3_RANGE_SIZE', str(10 * 1024 * 1024)))
+    S3_READ_AHEAD = int(os.getenv('S3_READ_AHEAD', '2'))
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', '32'))
+    
+    # メトリクスの公開（METRICS_PORTを指定するとMETRICS_HOSTの/metricsで公開、0なら無効）
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+    # node_exporterのtextfileコレクター向けの出力先（空文字の場合は書き出さない）と書き出し間隔（秒）
+    METRICS_TEXTFILE = os.getenv('METRICS_TEXTFILE', '')
+    METRICS_TEXTFILE_INTERVAL = float(os.getenv('METRICS_TEXTFILE_INTERVAL', '15'))
     
     @classmethod
     def validate(cls):
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# プロセス間で共有する排他ロック（fcntl.flock、Windowsではmsvcrt.locking）
+# 同じプロセス内のスレッド同士はthreading.Lockで直列化する
+class FileLock:
+    def __init__(self, lock_file: str):
+        self.lock_file = lock_file
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        try:
+            directory = os.path.dirname(os.path.abspath(self.lock_file))
+            os.makedirs(directory, exist_ok=True)
+            f = open(self.lock_file, 'a+b')
+            try:
+                _lock(f)
+            except BaseException:
+                f.close()
+                raise
+            self._file = f
+            return self
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        f, self._file = self._file, None
+        try:
+            if f is not None:
+                _unlock(f)
+                f.close()
+        finally:
+            self._thread_lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def read_text(self) -> str:
+        # ロック中のファイル自体を小さな共有状態の置き場として使う
+        self._file.seek(0)
+        return self._file.read().decode('utf-8')
+
+    def write_text(self, text: str):
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(text.encode('utf-8'))
+        self._file.flush()
+
+
+def _lock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    # msvcrt.lockingはロック済みだと約10秒で諦めるため、取得できるまで繰り返す
+    while True:
+        try:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            time.sleep(0.05)
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return
+    f.seek(0)
+    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,32 @@
+import os
+from typing import Iterator, Tuple
+
+
+def to_remote_path(remote_root: str, relative_path: str) -> str:
+    # OneDrive側のパスは常に"/"区切り
+    relative_path = relative_path.replace(os.sep, "/")
+    remote_root = remote_root.strip("/")
+    if not remote_root:
+        return relative_path
+    return f"{remote_root}/{relative_path}"
+
+
+def walk_files(local_root: str, remote_root: str) -> Iterator[Tuple[str, str, int]]:
+    # (ローカルパス, リモートパス, サイズ) を列挙する
+    for dirpath, dirnames, filenames in os.walk(local_root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            local_path = os.path.join(dirpath, filename)
+            if not os.path.isfile(local_path):
+                continue
+            relative_path = os.path.relpath(local_path, local_root)
+            yield local_path, to_remote_path(remote_root, relative_path), os.path.getsize(local_path)
+
+
+def walk_empty_directories(local_root: str, remote_root: str) -> Iterator[str]:
+    # ファイルを含まない末端のディレクトリ（リモートパス）を列挙する
+    # ファイルを含むディレクトリはパス指定のアップロードで自動的に作成される
+    for dirpath, dirnames, filenames in os.walk(local_root):
+        if dirnames or filenames or os.path.samefile(dirpath, local_root):
+            continue
+        yield to_remote_path(remote_root, os.path.relpath(dirpath, local_root))
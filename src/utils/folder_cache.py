@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+import threading
+from typing import Optional, List
+
+from src.utils.file_lock import FileLock
+
+
+def normalize_folder_path(folder_path: str) -> str:
+    # OneDriveのパスは大文字小文字を区別しない
+    return "/".join(part for part in folder_path.strip("/").split("/") if part).lower()
+
+
+def folder_ancestors(folder_path: str) -> List[str]:
+    # "a/b/c" -> ["a", "a/b", "a/b/c"]
+    parts = [part for part in folder_path.strip("/").split("/") if part]
+    return ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+# 存在が確認できたフォルダーのキャッシュ（任意でファイルに永続化）
+# 既知のフォルダーに対する作成リクエスト（409になるだけの往復）を省略するために使う
+class KnownFoldersCache:
+    def __init__(self, cache_file: Optional[str] = None):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(f"{cache_file}.lock") if cache_file else None
+        # まだ書き込んでいない変更（保存時にディスク上の内容へ反映する）
+        self._added = set()
+        self._removed = set()
+        self._cleared = False
+        self._folders = self._load()
+
+    def _load(self) -> set:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return set()
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return set(json.load(f))
+        except (OSError, ValueError):
+            return set()
+
+    @property
+    def _dirty(self) -> bool:
+        return bool(self._added or self._removed or self._cleared)
+
+    def __contains__(self, folder_path: str) -> bool:
+        key = normalize_folder_path(folder_path)
+        if not key:
+            return True  # ルートは常に存在する
+        with self._lock:
+            return key in self._folders
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._folders)
+
+    def add(self, folder_path: str):
+        # フォルダーが存在するなら祖先もすべて存在する
+        with self._lock:
+            for ancestor in folder_ancestors(normalize_folder_path(folder_path)):
+                if ancestor not in self._folders:
+                    self._folders.add(ancestor)
+                    self._added.add(ancestor)
+                    self._removed.discard(ancestor)
+
+    def add_parents_of(self, item_path: str):
+        parent_path = "/".join(item_path.strip("/").split("/")[:-1])
+        if parent_path:
+            self.add(parent_path)
+
+    def discard(self, path: str):
+        # 削除されたパス配下のフォルダーも取り除く
+        key = normalize_folder_path(path)
+        prefix = f"{key}/"
+        with self._lock:
+            removed = {folder for folder in self._folders if folder == key or folder.startswith(prefix)}
+            if removed:
+                self._folders -= removed
+                self._added -= removed
+                self._removed |= removed
+
+    def clear(self):
+        with self._lock:
+            self._folders.clear()
+            self._added.clear()
+            self._removed.clear()
+            self._cleared = True
+
+    def save(self):
+        if not self.cache_file:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            with self._file_lock:
+                # 他のプロセスが書き込んだ内容を読み直し、このプロセスの変更だけを反映する
+                folders = set() if self._cleared else self._load()
+                folders -= self._removed
+                folders |= self._added
+                directory = os.path.dirname(os.path.abspath(self.cache_file))
+                fd, tmp_file = tempfile.mkstemp(prefix=f"{os.path.basename(self.cache_file)}.", suffix=".tmp",
+                                                dir=directory)
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        json.dump(sorted(folders), f, ensure_ascii=False)
+                    os.replace(tmp_file, self.cache_file)
+                except BaseException:
+                    if os.path.exists(tmp_file):
+                        os.remove(tmp_file)
+                    raise
+            self._folders = folders
+            self._added.clear()
+            self._removed.clear()
+            self._cleared = False
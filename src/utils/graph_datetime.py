@@ -0,0 +1,25 @@
+import re
+from datetime import datetime, timezone
+from typing import Optional
+
+
+_GRAPH_DATETIME_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(\.\d+)?(Z|[+-]\d{2}:\d{2})?$")
+
+
+def parse_graph_datetime(value: Optional[str]) -> Optional[float]:
+    # Graph APIの日時文字列（例: 2024-01-01T00:00:00.1234567Z）をUNIX時刻に変換する
+    if not value:
+        return None
+    match = _GRAPH_DATETIME_PATTERN.match(value.strip())
+    if not match:
+        return None
+    base, fraction, zone = match.groups()
+    parsed = datetime.strptime(base, "%Y-%m-%dT%H:%M:%S")
+    if zone and zone != "Z":
+        parsed = datetime.fromisoformat(f"{base}{zone}")
+    else:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    timestamp = parsed.timestamp()
+    if fraction:
+        timestamp += float(fraction)
+    return timestamp
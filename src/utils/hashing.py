@@ -0,0 +1,191 @@
+import base64
+import hashlib
+import mmap
+import os
+from typing import Optional, Dict
+
+try:
+    import numpy as np
+except ImportError:  # NumPyがなければ多倍長整数による実装を使う
+    np = None
+
+
+_MASK64 = (1 << 64) - 1
+_WIDTH_IN_BITS = 160
+_WIDTH_IN_BYTES = _WIDTH_IN_BITS // 8
+_SHIFT = 11
+_MASK160 = (1 << _WIDTH_IN_BITS) - 1
+# 11と160は互いに素なので、ビット位置は160バイトごとに一巡する
+_PERIOD = _WIDTH_IN_BITS
+_ROW_BITS = _PERIOD * 8
+
+# ファイルをmmapから読み込む単位
+HASH_BLOCK_SIZE = 64 * 1024 * 1024
+
+
+# OneDriveのquickXorHash（160ビット幅、1バイトごとに11ビットずつシフトしてXOR）
+# Microsoftが公開しているC#実装をそのまま移植したもの（1バイトずつ処理するため遅い。検証・ベンチマーク用）
+class ReferenceQuickXorHash:
+    WIDTH_IN_BITS = _WIDTH_IN_BITS
+    SHIFT = _SHIFT
+
+    def __init__(self):
+        self._data = [0, 0, 0]
+        self._length = 0
+        self._shift_so_far = 0
+
+    def update(self, data: bytes):
+        data = memoryview(data).cast('B')
+        size = len(data)
+        current_shift = self._shift_so_far
+        vector_index = current_shift // 64
+        vector_offset = current_shift % 64
+        iterations = min(size, self.WIDTH_IN_BITS)
+
+        for i in range(iterations):
+            is_last_cell = vector_index == len(self._data) - 1
+            bits_in_cell = 32 if is_last_cell else 64
+
+            if vector_offset <= bits_in_cell - 8:
+                for j in range(i, size, self.WIDTH_IN_BITS):
+                    self._data[vector_index] = (self._data[vector_index] ^ (data[j] << vector_offset)) & _MASK64
+            else:
+                index1 = vector_index
+                index2 = 0 if is_last_cell else vector_index + 1
+                low = bits_in_cell - vector_offset
+                xored_byte = 0
+                for j in range(i, size, self.WIDTH_IN_BITS):
+                    xored_byte ^= data[j]
+                self._data[index1] = (self._data[index1] ^ (xored_byte << vector_offset)) & _MASK64
+                self._data[index2] ^= xored_byte >> low
+
+            vector_offset += self.SHIFT
+            while vector_offset >= bits_in_cell:
+                vector_index = 0 if is_last_cell else vector_index + 1
+                vector_offset -= bits_in_cell
+
+        self._shift_so_far = (self._shift_so_far + self.SHIFT * (size % self.WIDTH_IN_BITS)) % self.WIDTH_IN_BITS
+        self._length += size
+
+    def digest(self) -> bytes:
+        result = bytearray(_WIDTH_IN_BYTES)
+        for i, cell in enumerate(self._data):
+            cell_bytes = cell.to_bytes(8, 'little')
+            start = i * 8
+            count = min(8, len(result) - start)
+            result[start:start + count] = cell_bytes[:count]
+        return _finalize(result, self._length)
+
+    def b64digest(self) -> str:
+        return base64.b64encode(self.digest()).decode('ascii')
+
+
+def _finalize(result: bytearray, length: int) -> bytes:
+    # 末尾8バイトにデータ長をXORする
+    length_bytes = length.to_bytes(8, 'little')
+    offset = _WIDTH_IN_BYTES - len(length_bytes)
+    for i, value in enumerate(length_bytes):
+        result[offset + i] ^= value
+    return bytes(result)
+
+
+def _xor_columns_numpy(data) -> bytes:
+    # 160バイトを1行として全行をXORで畳み込む（1行は20個のuint64になる）
+    view = np.frombuffer(data, dtype=np.uint8)
+    full = len(view) - len(view) % _PERIOD
+    columns = np.zeros(_PERIOD, dtype=np.uint8)
+    if full:
+        rows = view[:full]
+        if rows.ctypes.data % 8 == 0:
+            reduced = np.bitwise_xor.reduce(rows.view(np.uint64).reshape(-1, _PERIOD // 8), axis=0)
+            columns ^= reduced.view(np.uint8)
+        else:
+            columns ^= np.bitwise_xor.reduce(rows.reshape(-1, _PERIOD), axis=0)
+    tail = view[full:]
+    columns[:len(tail)] ^= tail
+    return columns.tobytes()
+
+
+def _xor_columns_int(data) -> bytes:
+    # NumPyがない場合: ブロック全体を1つの整数として読み、上位半分と下位半分のXORを繰り返して1行に畳み込む
+    data = memoryview(data).cast('B')
+    full = len(data) - len(data) % _PERIOD
+    rows = full // _PERIOD
+    value = int.from_bytes(data[:full], 'little') if rows else 0
+    while rows > 1:
+        half = rows // 2
+        low_bits = half * _ROW_BITS
+        value = (value & ((1 << low_bits) - 1)) ^ (value >> low_bits)
+        rows -= half
+    columns = bytearray(value.to_bytes(_PERIOD, 'little'))
+    for i, byte in enumerate(data[full:]):
+        columns[i] ^= byte
+    return bytes(columns)
+
+
+# 同じ位置（先頭からのオフセット mod 160）のバイトは同じビット位置にXORされるため、
+# ブロックごとに160列へ畳み込んでから、列ごとに1回だけ回転して状態に加える
+class QuickXorHash:
+    def __init__(self, use_numpy: Optional[bool] = None):
+        if use_numpy is None:
+            use_numpy = np is not None
+        if use_numpy and np is None:
+            raise RuntimeError("NumPyがインストールされていません")
+        self._xor_columns = _xor_columns_numpy if use_numpy else _xor_columns_int
+        self._state = 0
+        self._length = 0
+
+    def update(self, data: bytes):
+        size = len(memoryview(data).cast('B'))
+        if not size:
+            return
+        columns = self._xor_columns(data)
+        base = self._length % _PERIOD
+        state = self._state
+        for column, byte in enumerate(columns):
+            if byte:
+                shift = ((base + column) * _SHIFT) % _WIDTH_IN_BITS
+                rotated = byte << shift
+                state ^= (rotated | (rotated >> _WIDTH_IN_BITS)) & _MASK160
+        self._state = state
+        self._length += size
+
+    def digest(self) -> bytes:
+        return _finalize(bytearray(self._state.to_bytes(_WIDTH_IN_BYTES, 'little')), self._length)
+
+    def b64digest(self) -> str:
+        return base64.b64encode(self.digest()).decode('ascii')
+
+
+def _hash_file(hasher, file_path: str, block_size: int = HASH_BLOCK_SIZE):
+    # mmapしたファイルを大きなブロック単位でコピーせずにハッシュへ渡す
+    with open(file_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if not file_size:
+            return hasher
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                for offset in range(0, file_size, block_size):
+                    with view[offset:offset + block_size] as block:
+                        hasher.update(block)
+    return hasher
+
+
+def quickxorhash_file(file_path: str, block_size: int = HASH_BLOCK_SIZE) -> str:
+    return _hash_file(QuickXorHash(), file_path, block_size).b64digest()
+
+
+def sha1_file(file_path: str, block_size: int = HASH_BLOCK_SIZE) -> str:
+    # OneDriveのsha1Hashは大文字の16進表記
+    return _hash_file(hashlib.sha1(), file_path, block_size).hexdigest().upper()
+
+
+def matches_remote_hash(file_path: str, remote_hashes: Optional[Dict[str, str]]) -> Optional[bool]:
+    # リモートのハッシュと一致するか（比較できるハッシュがなければNone）
+    if not remote_hashes:
+        return None
+    if remote_hashes.get("quickXorHash"):
+        return quickxorhash_file(file_path) == remote_hashes["quickXorHash"]
+    if remote_hashes.get("sha1Hash"):
+        return sha1_file(file_path) == remote_hashes["sha1Hash"].upper()
+    return None
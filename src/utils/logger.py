@@ -1,5 +1,6 @@
 import logging
 import os
+import threading
 from datetime import datetime
 import sys
 
@@ -11,19 +12,29 @@ from src.utils.config import Config
 
 class Logger:
     _instance = None
+    # 複数のワーカースレッドから同時に生成されても初期化は一度だけ行う
+    _lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._initialized = False
+                    cls._instance = instance
         return cls._instance
     
     def __init__(self):
         if self._initialized:
             return
         
-        self._initialized = True
-        
+        with self._lock:
+            if self._initialized:
+                return
+            self._setup()
+            self._initialized = True
+    
+    def _setup(self):
         # ログディレクトリの作成
         log_dir = "logs"
         if not os.path.exists(log_dir):
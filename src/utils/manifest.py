@@ -0,0 +1,279 @@
+import atexit
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from typing import Optional, Dict, Any, List
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.logger import get_logger
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    local_path TEXT NOT NULL,
+    remote_path TEXT NOT NULL,
+    item_id TEXT,
+    size INTEGER NOT NULL,
+    mtime REAL,
+    quick_xor_hash TEXT,
+    started_at REAL NOT NULL,
+    duration REAL,
+    bytes_per_second REAL,
+    attempts INTEGER NOT NULL,
+    outcome TEXT NOT NULL,
+    error TEXT,
+    kind TEXT NOT NULL DEFAULT 'file'
+);
+CREATE INDEX IF NOT EXISTS idx_uploads_local_path ON uploads (local_path, started_at);
+CREATE INDEX IF NOT EXISTS idx_uploads_remote_path ON uploads (remote_path COLLATE NOCASE, started_at);
+CREATE INDEX IF NOT EXISTS idx_uploads_outcome ON uploads (outcome, started_at);
+"""
+
+_COLUMNS = (
+    "local_path", "remote_path", "item_id", "size", "mtime", "quick_xor_hash",
+    "started_at", "duration", "bytes_per_second", "attempts", "outcome", "error", "kind",
+)
+
+_INSERT = f"INSERT INTO uploads ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' for _ in _COLUMNS)})"
+
+# ロックを待つ秒数と、ロック待ちなどで書き込めなかったときの再試行（回数・初回の待機秒数・上限）
+_BUSY_TIMEOUT = 30
+_WRITE_RETRIES = 3
+_WRITE_RETRY_DELAY = 0.5
+_WRITE_RETRY_MAX_DELAY = 5.0
+# close()で書き込みスレッドの終了を待つ秒数
+_CLOSE_TIMEOUT = 60
+
+
+def _connect(db_file: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(db_file, timeout=_BUSY_TIMEOUT)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+# 転送履歴のSQLiteマニフェスト（ローカルファイル・ストリーム・アーカイブ・S3からのアップロードとダウンロード）
+# 記録はキューに積むだけで、専用スレッドがWALモードのDBにまとめて書き込む（アップロード処理を待たせない）
+# 書き込めなかった記録はログに残して破棄し、書き込みスレッドは止めない（止まるとflush()が戻らなくなる）
+class UploadManifest:
+    OUTCOME_SUCCESS = "success"
+    OUTCOME_FAILED = "failed"
+    # 転送の種類（kind列）。local_pathはfile/archive/downloadではローカルのパス、
+    # streamでは読み込み元の名前（標準入力は "-"）、s3ではs3://バケット/キー
+    KIND_FILE = "file"
+    KIND_STREAM = "stream"
+    KIND_ARCHIVE = "archive"
+    KIND_S3 = "s3"
+    KIND_DOWNLOAD = "download"
+    _LOCAL_KINDS = (KIND_FILE, KIND_ARCHIVE, KIND_DOWNLOAD)
+
+    def __init__(self, db_file: str, batch_size: int = 500):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._local = threading.local()
+        self._closed = False
+        self.logger = get_logger()
+
+        connection = _connect(db_file)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+        # kind列がない以前のDBには列を追加する（既存の記録はローカルファイルのアップロード）
+        columns = [row["name"] for row in connection.execute("PRAGMA table_info(uploads)")]
+        if "kind" not in columns:
+            connection.execute("ALTER TABLE uploads ADD COLUMN kind TEXT NOT NULL DEFAULT 'file'")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_uploads_kind ON uploads (kind, started_at)")
+        connection.commit()
+        connection.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name="UploadManifestWriter", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _write_loop(self):
+        connection = None
+        while True:
+            row = self._queue.get()
+            rows = [row]
+            # 溜まっている分をまとめて1トランザクションで書き込む
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in rows
+            records = [row for row in rows if row is not None]
+            try:
+                if records:
+                    if connection is None:
+                        connection = self._open_writer()
+                    self._write_records(connection, records)
+            except Exception as e:
+                # 接続できない場合なども記録を破棄して続ける（次の記録で接続し直す）
+                self.logger.error(f"アップロード履歴を記録できませんでした（{len(records)}件を破棄）: {str(e)}")
+                if connection is not None:
+                    connection.close()
+                    connection = None
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+            if stop:
+                break
+        if connection is not None:
+            connection.close()
+
+    def _open_writer(self) -> sqlite3.Connection:
+        connection = _connect(self.db_file)
+        # WALではsynchronous=NORMALでもクラッシュでDBは壊れない（直近のコミットが失われるのみ）
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _write_records(self, connection: sqlite3.Connection, records: List[tuple]):
+        for attempt in range(_WRITE_RETRIES + 1):
+            try:
+                with connection:
+                    connection.executemany(_INSERT, records)
+                return
+            except sqlite3.OperationalError as e:
+                # ロック待ちのタイムアウトなど一時的なエラーは間隔を空けて再試行し、それでも失敗すれば破棄する
+                if attempt == _WRITE_RETRIES:
+                    raise
+                delay = min(_WRITE_RETRY_DELAY * (2 ** attempt), _WRITE_RETRY_MAX_DELAY)
+                self.logger.warning(f"アップロード履歴の書き込みに失敗しました。{delay:.1f}秒後に再試行します: {str(e)}")
+                time.sleep(delay)
+            except sqlite3.Error:
+                # 制約違反などは記録自体の問題のため、1件ずつ書き込んで問題のある記録だけを破棄する
+                for record in records:
+                    try:
+                        with connection:
+                            connection.execute(_INSERT, record)
+                    except sqlite3.Error as e:
+                        self.logger.error(f"アップロード履歴の記録を破棄しました: {record[0]}: {str(e)}")
+                return
+
+    def record(self, local_path: str, remote_path: str, size: int, outcome: str,
+               started_at: Optional[float] = None, duration: Optional[float] = None,
+               item_id: Optional[str] = None, mtime: Optional[float] = None,
+               quick_xor_hash: Optional[str] = None, attempts: int = 1, error: Optional[str] = None,
+               kind: str = KIND_FILE):
+        if self._closed:
+            return
+        if started_at is None:
+            started_at = time.time() - (duration or 0)
+        bytes_per_second = size / duration if duration and outcome == self.OUTCOME_SUCCESS else None
+        if kind in self._LOCAL_KINDS:
+            local_path = os.path.abspath(local_path)
+        self._queue.put((
+            local_path, remote_path.strip("/"), item_id, size, mtime, quick_xor_hash,
+            started_at, duration, bytes_per_second, attempts, outcome, error, kind,
+        ))
+
+    def flush(self):
+        # キューに積まれた記録がすべて書き込まれるまで待つ（書き込みスレッドが終了していれば待たない）
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks and self._writer.is_alive():
+                self._queue.all_tasks_done.wait(0.1)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(_CLOSE_TIMEOUT)
+        if self._writer.is_alive():
+            self.logger.warning("アップロード履歴の書き込みが終わらないため、待たずに終了します")
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        # 未書き込みの記録も結果に含めるため、先にキューを空にする
+        if not self._closed:
+            self.flush()
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = _connect(self.db_file)
+            self._local.connection = connection
+        return [dict(row) for row in connection.execute(sql, params).fetchall()]
+
+    def history(self, local_path: Optional[str] = None, remote_path: Optional[str] = None,
+                kind: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        # 指定したファイル・種類の転送履歴（新しい順）
+        conditions = []
+        params: list = []
+        if local_path is not None:
+            conditions.append("local_path IN (?, ?)")
+            params.extend((local_path, os.path.abspath(local_path)))
+        if remote_path is not None:
+            conditions.append("remote_path = ? COLLATE NOCASE")
+            params.append(remote_path.strip("/"))
+        if kind is not None:
+            conditions.append("kind = ?")
+            params.append(kind)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit)
+        return self._query(f"SELECT * FROM uploads {where} ORDER BY started_at DESC LIMIT ?", tuple(params))
+
+    def last_success(self, local_path: str, kind: str = KIND_FILE) -> Optional[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT * FROM uploads WHERE local_path = ? AND kind = ? AND outcome = ? ORDER BY started_at DESC LIMIT 1",
+            (os.path.abspath(local_path) if kind in self._LOCAL_KINDS else local_path, kind, self.OUTCOME_SUCCESS)
+        )
+        return rows[0] if rows else None
+
+    def was_uploaded(self, local_path: str, size: Optional[int] = None, mtime: Optional[float] = None) -> bool:
+        # 最後に成功したアップロードが、指定したサイズ・更新日時のファイルだったか
+        last = self.last_success(local_path)
+        if last is None:
+            return False
+        if size is not None and last["size"] != size:
+            return False
+        if mtime is not None and last["mtime"] is not None and abs(last["mtime"] - mtime) > 1e-3:
+            return False
+        return True
+
+    def failures(self, since: Optional[float] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        return self._query(
+            "SELECT * FROM uploads WHERE outcome = ? AND started_at >= ? ORDER BY started_at DESC LIMIT ?",
+            (self.OUTCOME_FAILED, since or 0, limit)
+        )
+
+    def summary(self, since: Optional[float] = None, kind: Optional[str] = None) -> Dict[str, Any]:
+        # 期間内の件数・転送量・平均速度（kindを指定するとその種類の転送だけ）
+        rows = self._query(
+            """
+            SELECT
+                COUNT(*) AS transfers,
+                COALESCE(SUM(outcome = 'success'), 0) AS succeeded,
+                COALESCE(SUM(outcome = 'failed'), 0) AS failed,
+                COALESCE(SUM(CASE WHEN outcome = 'success' THEN size END), 0) AS bytes,
+                COALESCE(SUM(CASE WHEN outcome = 'success' THEN duration END), 0) AS duration,
+                AVG(bytes_per_second) AS average_bytes_per_second,
+                COALESCE(SUM(attempts - 1), 0) AS retries
+            FROM uploads WHERE started_at >= ? AND (? IS NULL OR kind = ?)
+            """,
+            (since or 0, kind, kind)
+        )
+        return rows[0]
+
+
+_manifests: Dict[str, UploadManifest] = {}
+_manifests_lock = threading.Lock()
+
+
+def get_upload_manifest(db_file: str) -> UploadManifest:
+    # 同じDBファイルに対しては書き込みスレッドを1つだけにする
+    path = os.path.abspath(db_file)
+    with _manifests_lock:
+        manifest = _manifests.get(path)
+        if manifest is None or manifest._closed:
+            manifest = UploadManifest(db_file)
+            _manifests[path] = manifest
+        return manifest
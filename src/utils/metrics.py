@@ -0,0 +1,322 @@
+import atexit
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, List, Tuple
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.config import Config
+from src.utils.logger import get_logger
+
+
+METRIC_PREFIX = "onedrive_uploader_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# リクエストの所要時間（秒）。フラグメントの送信は数十秒かかることがあるため上限を広げている
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# フラグメントごとの送信速度（バイト/秒）
+THROUGHPUT_BUCKETS = tuple(mb * 1024 * 1024 for mb in (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# ラベルの値の組ごとに値を持つ計測値の基底クラス
+# 更新はロックを取って辞書の値を書き換えるだけで、フラグメントの送信（数MB〜数十MB）に比べて無視できる
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def value(self, *labelvalues) -> float:
+        with self._lock:
+            return self._values.get(labelvalues, 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_label_text(self.labelnames, labels)} {_format_value(value)}" for labels, value in items]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}", *self._samples()]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + 1
+
+    def add(self, amount: float, *labelvalues):
+        if amount <= 0:
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def add(self, amount: float, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def inc(self, *labelvalues):
+        self.add(1, *labelvalues)
+
+    def dec(self, *labelvalues):
+        self.add(-1, *labelvalues)
+
+    def track(self, *labelvalues) -> "_GaugeTracker":
+        # withの間だけ1増やす（実行中の転送数など）
+        return _GaugeTracker(self, labelvalues)
+
+
+class _GaugeTracker:
+    def __init__(self, gauge: Gauge, labelvalues: Tuple[str, ...]):
+        self.gauge = gauge
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.gauge.inc(*self.labelvalues)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.gauge.dec(*self.labelvalues)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベルの値の組 -> [バケットごとの件数（累積前）..., +Infの件数, 合計]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labelvalues) -> int:
+        with self._lock:
+            series = self._series.get(labelvalues)
+            return int(sum(series[:-1])) if series else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {cumulative}")
+            label_text = _label_text(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+# アップローダーが記録する計測値の一覧
+class UploaderMetrics:
+    def __init__(self):
+        self.requests = Counter("requests_total", "Graph APIへのリクエスト数（通信エラーはstatus=\"error\"）",
+                                ("method", "endpoint", "status"))
+        self.request_seconds = Histogram("request_duration_seconds", "リクエストの所要時間（本文の送信を含む）",
+                                         ("method", "endpoint"))
+        self.bytes_sent = Counter("bytes_sent_total", "リクエスト本文として送信したバイト数（再送を含む）", ("endpoint",))
+        self.uploaded_bytes = Counter("uploaded_bytes_total", "サーバーが受け付けたアップロードのバイト数", ("kind",))
+        self.downloaded_bytes = Counter("downloaded_bytes_total", "ダウンロードを完了した範囲のバイト数")
+        self.fragment_throughput = Histogram("fragment_throughput_bytes_per_second", "フラグメントごとの送信速度",
+                                             buckets=THROUGHPUT_BUCKETS)
+        self.retries = Counter("retries_total", "リトライ回数（scope: request / fragment / range / file）",
+                               ("scope", "reason"))
+        self.throttled = Counter("throttled_total", "スロットリング（429/503）を受けた回数", ("status",))
+        self.throttle_wait_seconds = Counter("rate_limit_wait_seconds_total",
+                                             "レート制限とスロットリングによる停止で待機した秒数")
+        self.files = Counter("files_total", "転送を終えたファイル数", ("direction", "outcome"))
+        self.in_flight = Gauge("transfers_in_flight", "実行中の転送数", ("direction",))
+        self.queue_depth = Gauge("queue_depth", "並列転送で開始を待っているファイル数", ("direction",))
+        self.started = Gauge("start_time_seconds", "プロセスの開始時刻（UNIX時間）")
+        self.started.set(time.time())
+
+    def all(self) -> List[_Metric]:
+        return [metric for metric in vars(self).values() if isinstance(metric, _Metric)]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.all():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def record_request(self, method: str, endpoint: str, status: str, elapsed: float, body_size: int):
+        self.requests.inc(method, endpoint, status)
+        self.request_seconds.observe(elapsed, method, endpoint)
+        if body_size:
+            self.bytes_sent.add(body_size, endpoint)
+
+    def record_fragment(self, length: int, elapsed: float):
+        self.uploaded_bytes.add(length, "fragment")
+        if elapsed > 0:
+            self.fragment_throughput.observe(length / elapsed)
+
+
+def endpoint_label(method: str, url: str, base_url: str, headers: Optional[Dict[str, str]] = None) -> str:
+    # URLをラベルに使うとパスごとに系列が増えるため、操作の種類にまとめる
+    if not url.startswith(base_url):
+        # アップロードセッションのURLと事前認証済みのダウンロードURLはGraphの外にある
+        return "download" if headers and 'Range' in headers else "upload_session"
+    path = url[len(base_url):].split("?", 1)[0]
+    if path.endswith(":/content"):
+        return "content"
+    if path.endswith(":/createUploadSession"):
+        return "create_upload_session"
+    if path.endswith("/children"):
+        return "children"
+    if path.endswith("$batch"):
+        return "batch"
+    if "/delta" in path:
+        return "delta"
+    if path == "/me/drive":
+        return "drive"
+    return "item"
+
+
+_metrics: Optional[UploaderMetrics] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> UploaderMetrics:
+    # プロセス内の全クライアント・ワーカーで共有する
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = UploaderMetrics()
+    return _metrics
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        data = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+# Prometheusがスクレイプする /metrics エンドポイント
+class MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int, metrics: Optional[UploaderMetrics] = None):
+        super().__init__((host, port), _MetricsHandler)
+        self.metrics = metrics or get_metrics()
+        self._thread = threading.Thread(target=self.serve_forever, name="MetricsServer", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+# node_exporterのtextfileコレクター向けに、一定間隔でファイルへ書き出す
+# 読み込み途中のファイルを見せないよう、一時ファイルに書いてから置き換える
+class TextfileExporter:
+    def __init__(self, path: str, interval: float = 15.0, metrics: Optional[UploaderMetrics] = None):
+        self.path = path
+        self.interval = max(1.0, interval)
+        self.metrics = metrics or get_metrics()
+        self.logger = get_logger()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="MetricsTextfileExporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def write(self):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(self.metrics.render())
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            self.logger.warning(f"メトリクスの書き出しに失敗しました: {self.path}: {str(e)}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        # 終了時に最終値を書き出す
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self.write()
+
+
+_exporters: Dict[str, object] = {}
+_exporters_lock = threading.Lock()
+
+
+def start_metrics_exporters() -> Dict[str, object]:
+    # METRICS_PORT / METRICS_TEXTFILE が設定されていれば一度だけ起動する
+    with _exporters_lock:
+        if Config.METRICS_PORT and "server" not in _exporters:
+            try:
+                _exporters["server"] = MetricsServer(Config.METRICS_HOST, Config.METRICS_PORT)
+                get_logger().info(f"メトリクスを公開しています: {_exporters['server'].url}")
+            except OSError as e:
+                get_logger().warning(f"メトリクスのエンドポイントを起動できませんでした: {str(e)}")
+        if Config.METRICS_TEXTFILE and "textfile" not in _exporters:
+            _exporters["textfile"] = TextfileExporter(Config.METRICS_TEXTFILE, Config.METRICS_TEXTFILE_INTERVAL)
+    return dict(_exporters)
@@ -0,0 +1,176 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.config import Config
+from src.utils.file_lock import FileLock
+from src.utils.logger import get_logger
+from src.utils.metrics import get_metrics
+
+
+# 全ワーカーで一時停止するステータスコード
+THROTTLE_STATUS_CODES = (429, 503)
+# 現在のリクエストレートを計算する期間（秒）
+RATE_WINDOW_SECONDS = 10.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-Afterは秒数またはHTTP日付
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# トークンバケットによるリクエストレート制限
+# スロットリング（429/503）を受けたら、Retry-Afterの間は全ワーカーのリクエストをまとめて止める
+# lock_fileを指定すると、同じホスト上の複数プロセスでバケットと一時停止を共有する
+class RateLimiter:
+    def __init__(self, rate: float = 0.0, burst: int = 20, lock_file: Optional[str] = None,
+                 default_retry_after: float = 10.0):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.default_retry_after = default_retry_after
+        self.logger = get_logger()
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(lock_file) if lock_file else None
+        self._state = self._initial_state()
+        self._recent = deque()
+        self._requests = 0
+        self._throttled = 0
+        self._waited_seconds = 0.0
+        self.metrics = get_metrics()
+
+    @property
+    def host_wide(self) -> bool:
+        return self._file_lock is not None
+
+    def _initial_state(self) -> Dict[str, float]:
+        return {"tokens": float(self.burst), "updated": time.time(), "paused_until": 0.0}
+
+    def _take(self, state: Dict[str, float], now: float) -> float:
+        # 取得できれば0、できなければ待つべき秒数を返す
+        if state["paused_until"] > now:
+            return state["paused_until"] - now
+        if self.rate <= 0:
+            return 0.0
+        state["tokens"] = min(float(self.burst), state["tokens"] + (now - state["updated"]) * self.rate)
+        state["updated"] = now
+        if state["tokens"] >= 1:
+            state["tokens"] -= 1
+            return 0.0
+        return (1 - state["tokens"]) / self.rate
+
+    def _update_shared(self, update):
+        # ロックファイル上の状態を読み込み、更新して書き戻す
+        with self._file_lock as lock:
+            try:
+                state = {**self._initial_state(), **json.loads(lock.read_text() or "{}")}
+            except ValueError:
+                state = self._initial_state()
+            result = update(state)
+            lock.write_text(json.dumps(state))
+            return result
+
+    def acquire(self):
+        while True:
+            now = time.time()
+            if self._file_lock is not None:
+                wait = self._update_shared(lambda state: self._take(state, now))
+            else:
+                with self._lock:
+                    wait = self._take(self._state, now)
+            if wait <= 0:
+                break
+            with self._lock:
+                self._waited_seconds += wait
+            self.metrics.throttle_wait_seconds.add(wait)
+            time.sleep(wait)
+
+        with self._lock:
+            self._requests += 1
+            self._recent.append(now)
+            while self._recent and self._recent[0] < now - RATE_WINDOW_SECONDS:
+                self._recent.popleft()
+
+    def pause(self, seconds: float):
+        until = time.time() + seconds
+
+        def extend(state):
+            extended = until > state["paused_until"]
+            state["paused_until"] = max(state["paused_until"], until)
+            return extended
+
+        with self._lock:
+            extended = extend(self._state)
+        if self._file_lock is not None:
+            extended = self._update_shared(extend) or extended
+        if extended:
+            self.logger.warning(f"スロットリングのため全リクエストを{seconds:.1f}秒停止します")
+
+    def observe(self, response) -> Optional[float]:
+        # スロットリングされていれば停止秒数を返す（429はRetry-Afterがなくても既定の秒数だけ止める）
+        if response is None or response.status_code not in THROTTLE_STATUS_CODES:
+            return None
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is None:
+            if response.status_code != 429:
+                return None
+            retry_after = self.default_retry_after
+        with self._lock:
+            self._throttled += 1
+        self.metrics.throttled.inc(str(response.status_code))
+        self.pause(retry_after)
+        return retry_after
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        # ホスト全体で共有している場合は、他のプロセスが設定した停止もロックファイルから読む
+        shared_paused_until = 0.0
+        if self._file_lock is not None:
+            shared_paused_until = self._update_shared(lambda state: state["paused_until"])
+        with self._lock:
+            paused_until = max(self._state["paused_until"], shared_paused_until)
+            recent = sum(1 for timestamp in self._recent if timestamp >= now - RATE_WINDOW_SECONDS)
+            return {
+                "requests": self._requests,
+                "throttled": self._throttled,
+                "current_rate": recent / RATE_WINDOW_SECONDS,
+                "limit_per_second": self.rate,
+                "waited_seconds": self._waited_seconds,
+                "paused_for": max(0.0, paused_until - now),
+                "host_wide": self.host_wide,
+            }
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    # 同じプロセス内のクライアントは1つのリミッターを共有する
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter(
+                Config.RATE_LIMIT_PER_SECOND,
+                Config.RATE_LIMIT_BURST,
+                Config.RATE_LIMIT_LOCK_FILE or None,
+                Config.RATE_LIMIT_DEFAULT_RETRY_AFTER
+            )
+        return _rate_limiter
@@ -0,0 +1,164 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Optional, Dict, Any, List
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.config import Config
+from src.utils.file_lock import FileLock
+
+
+# 実行中のアップロードセッションを記録するディスク上のジャーナル
+# プロセスが強制終了してもuploadUrlと確定済みオフセットから再開できるようにする
+# 複数のプロセスが同じファイルを使えるよう、書き込みはロックを取ってディスク上の内容に自分の変更だけを反映する
+# 再開時のオフセットはサーバーに問い合わせるため、進捗の書き込みはフラグメント数・秒数で間引く
+class UploadSessionJournal:
+    def __init__(self, journal_file: str, save_fragments: Optional[int] = None,
+                 save_interval: Optional[float] = None):
+        self.journal_file = journal_file
+        self.save_fragments = Config.UPLOAD_SESSION_SAVE_FRAGMENTS if save_fragments is None else save_fragments
+        self.save_interval = Config.UPLOAD_SESSION_SAVE_INTERVAL if save_interval is None else save_interval
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(f"{journal_file}.lock")
+        self._entries = self._load()
+        # まだ書き込んでいない変更（Noneは削除）
+        self._pending: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._unsaved_fragments = 0
+        self._last_save = time.monotonic()
+        atexit.register(self.flush)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.journal_file):
+            return {}
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # 壊れたジャーナルは破棄して最初からやり直す
+            return {}
+
+    def _save(self):
+        # self._lockを取得した状態で呼ぶ
+        with self._file_lock:
+            # 他のプロセスが書き込んだ内容を読み直し、このプロセスの変更だけを反映する
+            entries = self._load()
+            for key, entry in self._pending.items():
+                if entry is None:
+                    entries.pop(key, None)
+                else:
+                    entries[key] = entry
+            # 一時ファイル（プロセス・書き込みごとに別の名前）に書き込んでからrenameし、
+            # 書き込み途中のクラッシュでも壊れないようにする
+            tmp_file = f"{self.journal_file}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.journal_file)
+            except BaseException:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                raise
+        self._entries = entries
+        self._pending.clear()
+        self._unsaved_fragments = 0
+        self._last_save = time.monotonic()
+
+    def flush(self):
+        # 間引いて書き込んでいない進捗を書き込む
+        with self._lock:
+            if self._pending:
+                self._save()
+
+    @staticmethod
+    def make_key(local_path: str, remote_path: str) -> str:
+        return f"{os.path.abspath(local_path)}|{remote_path}"
+
+    @staticmethod
+    def file_identity(local_path: str) -> Dict[str, int]:
+        stat = os.stat(local_path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def get(self, local_path: str, remote_path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(self.make_key(local_path, remote_path))
+            return dict(entry) if entry else None
+
+    def record(self, local_path: str, remote_path: str, upload_url: str,
+               expiration: Optional[float], offset: int = 0) -> Dict[str, Any]:
+        entry = {
+            "local_path": os.path.abspath(local_path),
+            "remote_path": remote_path,
+            "upload_url": upload_url,
+            "expiration": expiration,
+            "offset": offset,
+            "updated_at": time.time(),
+            **self.file_identity(local_path),
+        }
+        key = self.make_key(local_path, remote_path)
+        with self._lock:
+            self._entries[key] = entry
+            self._pending[key] = entry
+            self._save()
+        return dict(entry)
+
+    def update_progress(self, local_path: str, remote_path: str, offset: int,
+                        expiration: Optional[float] = None):
+        key = self.make_key(local_path, remote_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry["offset"] = offset
+            entry["updated_at"] = time.time()
+            if expiration:
+                entry["expiration"] = expiration
+            self._pending[key] = entry
+            self._unsaved_fragments += 1
+            if (self._unsaved_fragments >= self.save_fragments
+                    or time.monotonic() - self._last_save >= self.save_interval):
+                self._save()
+
+    def remove(self, local_path: str, remote_path: str):
+        key = self.make_key(local_path, remote_path)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._pending[key] = None
+                self._save()
+
+    def entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+    def matches_file(self, entry: Dict[str, Any]) -> bool:
+        # 記録時からローカルファイルが変更されていないか
+        try:
+            identity = self.file_identity(entry["local_path"])
+        except OSError:
+            return False
+        return identity["size"] == entry.get("size") and identity["mtime_ns"] == entry.get("mtime_ns")
+
+    @staticmethod
+    def is_expired(entry: Dict[str, Any], margin: float = 60.0) -> bool:
+        expiration = entry.get("expiration")
+        return bool(expiration) and expiration - margin <= time.time()
+
+
+_journals: Dict[str, UploadSessionJournal] = {}
+_journals_lock = threading.Lock()
+
+
+def get_session_journal(journal_file: str) -> UploadSessionJournal:
+    # 同じファイルを複数のクライアントが上書きし合わないよう、パスごとに1インスタンスを共有する
+    path = os.path.abspath(journal_file)
+    with _journals_lock:
+        if path not in _journals:
+            _journals[path] = UploadSessionJournal(path)
+        return _journals[path]
@@ -0,0 +1,48 @@
+import os
+import sys
+from typing import Optional, Dict, Any
+
+# プロジェクトルートをPythonパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.utils.graph_datetime import parse_graph_datetime
+from src.utils.hashing import matches_remote_hash
+
+
+# ファイルシステムによってはmtimeの精度が2秒単位のため、その範囲の差は同一とみなす
+MTIME_TOLERANCE_SECONDS = 2.0
+
+
+def remote_file_state(item: Dict[str, Any]) -> Dict[str, Any]:
+    # Graphの項目とRemoteIndexのエントリーのどちらからでも比較用の状態を取り出す
+    if "last_modified" in item or "fs_last_modified" in item:
+        modified = item.get("fs_last_modified") or item.get("last_modified")
+        hashes = item.get("hashes")
+    else:
+        file_system_info = item.get("fileSystemInfo") or {}
+        modified = file_system_info.get("lastModifiedDateTime") or item.get("lastModifiedDateTime")
+        hashes = (item.get("file") or {}).get("hashes")
+    return {
+        "size": item.get("size", 0),
+        "modified": parse_graph_datetime(modified),
+        "hashes": hashes,
+    }
+
+
+def upload_reason(local_path: str, size: int, mtime: float,
+                  remote: Optional[Dict[str, Any]], compare_hash: bool = False) -> Optional[str]:
+    # アップロードが必要な理由を返す（不要ならNone）
+    if remote is None:
+        return "new"
+    if remote["size"] != size:
+        return "size"
+
+    if compare_hash:
+        matched = matches_remote_hash(local_path, remote["hashes"])
+        if matched is not None:
+            return None if matched else "hash"
+
+    # サイズが同じなら、リモートの更新日時がローカル以降であれば変更なしとみなす
+    if remote["modified"] is None or mtime > remote["modified"] + MTIME_TOLERANCE_SECONDS:
+        return "mtime"
+    return None
@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+
+# プロジェクトルートとベンチマーク用の代替サーバーをPythonパスに追加
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from src.utils.config import Config
+from src.api.onedrive_client import OneDriveClient
+from fake_graph_server import FakeGraphServer
+from fault_server import FaultInjectingServer
+
+
+FRAGMENT_SIZE = 320 * 1024
+
+
+@pytest.fixture(autouse=True)
+def isolated_config(monkeypatch, tmp_path):
+    # 実行時ファイル（ジャーナル・キャッシュ・マニフェスト）を作業ディレクトリに残さず、待機時間を短くする
+    monkeypatch.chdir(tmp_path)
+    settings = {
+        "UPLOAD_SESSION_JOURNAL": "",
+        "KNOWN_FOLDERS_CACHE": "",
+        "UPLOAD_MANIFEST_DB": "",
+        "TOKEN_BACKGROUND_REFRESH": False,
+        "UPLOAD_CHUNK_SIZE": FRAGMENT_SIZE,
+        "SIMPLE_UPLOAD_THRESHOLD": 64 * 1024,
+        "CHUNK_RETRY_DELAY": 0.01,
+        "CHUNK_RETRY_MAX_DELAY": 0.05,
+    }
+    for name, value in settings.items():
+        monkeypatch.setattr(Config, name, value)
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    server = FakeGraphServer(keep_content=True).start()
+    monkeypatch.setattr(Config, "GRAPH_API_ENDPOINT", server.endpoint)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fault_server(monkeypatch):
+    # 障害の設定は server.injector.configure({...}) で試験ごとに与える
+    server = FaultInjectingServer(keep_content=True).start()
+    monkeypatch.setattr(Config, "GRAPH_API_ENDPOINT", server.endpoint)
+    yield server
+    server.stop()
+
+
+def _client():
+    client = OneDriveClient("test-token")
+    client.transport.session.trust_env = False
+    return client
+
+
+@pytest.fixture
+def fake_client(fake_server):
+    client = _client()
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def fault_client(fault_server):
+    client = _client()
+    yield client
+    client.close()
+
@@ -0,0 +1,127 @@
+import io
+import os
+import tarfile
+
+import pytest
+import requests
+
+from src.main import OneDriveUploader
+from src.utils.config import Config
+from src.utils.archive_stream import DirectoryArchiveStream, extract_member
+
+
+def _make_tree(root) -> dict:
+    files = {
+        "a.txt": b"hello",
+        "empty.bin": b"",
+        "block.bin": os.urandom(512 * 3),
+        "sub/data.bin": os.urandom(700000),
+        # 100バイトを超える名前と非ASCIIの名前はPAX拡張ヘッダーになる
+        "sub/" + "long" * 40 + ".txt": b"long name",
+        "日本語/レポート.csv": "列1,列2\n".encode("utf-8"),
+    }
+    for name, data in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    (root / "empty_dir").mkdir()
+    return files
+
+
+def test_precomputed_size_matches_generated_tar(tmp_path):
+    files = _make_tree(tmp_path / "src")
+    archive = DirectoryArchiveStream(str(tmp_path / "src"))
+    data = archive.read()
+    assert archive.size == len(data)
+
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        for name, content in files.items():
+            assert tar.extractfile(name).read() == content
+        assert tar.getmember("empty_dir").isdir()
+
+
+def test_compressed_archive_has_no_precomputed_size(tmp_path):
+    _make_tree(tmp_path / "src")
+    archive = DirectoryArchiveStream(str(tmp_path / "src"), compress=True)
+    archive.read()
+    assert archive.size is None
+
+
+def test_uncompressed_archive_sends_total_size_in_every_fragment(tmp_path, fake_server, fake_client):
+    fake_server.reject_unknown_total = True
+    files = _make_tree(tmp_path / "src")
+    uploader = OneDriveUploader(client=fake_client)
+    result = uploader.upload_archive(str(tmp_path / "src"), "archives/backup.tar")
+
+    stored = fake_server.state.items["archives/backup.tar"]["content"]
+    assert result["item"]["size"] == len(stored) == result["index"]["archive_size"]
+    for i, (name, content) in enumerate(files.items()):
+        extracted = uploader.extract_archive_member("archives/backup.tar", name, str(tmp_path / f"out{i}"))
+        assert extracted["size"] == len(content)
+        assert (tmp_path / f"out{i}").read_bytes() == content
+
+
+def test_writer_rejects_data_beyond_total_size(fake_server, fake_client):
+    with pytest.raises(ValueError):
+        fake_client.upload_stream(io.BytesIO(b"x" * 1000), "stream/too_long.bin", total_size=999)
+
+
+def test_writer_rejects_short_stream(fake_server, fake_client):
+    with pytest.raises(ValueError):
+        fake_client.upload_stream(io.BytesIO(b"x" * 1000), "stream/too_short.bin", total_size=1001)
+    assert "stream/too_short.bin" not in fake_server.state.items
+
+
+def test_unknown_length_stream_is_rejected_when_total_is_required(fake_server, fake_client):
+    # 長さの分からないストリームは "*" を送るため、総サイズを必須にするサーバーでは失敗する（READMEに記載した制限）
+    fake_server.reject_unknown_total = True
+    with pytest.raises(requests.HTTPError):
+        fake_client.upload_stream(io.BytesIO(os.urandom(1024 * 1024)), "stream/unknown.bin")
+
+
+class _RecordingWriter(io.BytesIO):
+    def __init__(self):
+        super().__init__()
+        self.largest_write = 0
+
+    def write(self, data):
+        self.largest_write = max(self.largest_write, len(data))
+        return super().write(data)
+
+
+def test_large_member_is_split_across_frames_and_streamed(tmp_path, monkeypatch, fake_server, fake_client):
+    frame_size = 64 * 1024
+    monkeypatch.setattr(Config, "ARCHIVE_FRAME_SIZE", frame_size)
+    monkeypatch.setattr(Config, "DOWNLOAD_RANGE_SIZE", 16 * 1024)
+    root = tmp_path / "src"
+    root.mkdir()
+    large = os.urandom(700 * 1024)
+    (root / "large.bin").write_bytes(large)
+    (root / "small.txt").write_bytes(b"small")
+
+    uploader = OneDriveUploader(client=fake_client)
+    index = uploader.upload_archive(str(root), "archives/split.tar.zst", compress=True)["index"]
+    member = next(member for member in index["members"] if member["name"] == "large.bin")
+    overlapping = [frame for frame in index["frames"]
+                   if frame["tar_offset"] < member["offset"] + member["size"]
+                   and frame["tar_offset"] + frame["tar_length"] > member["offset"]]
+    assert len(overlapping) > 5
+    assert all(frame["tar_length"] <= frame_size + 64 * 1024 for frame in index["frames"])
+
+    output = _RecordingWriter()
+    assert extract_member(fake_client, "archives/split.tar.zst", index, "large.bin", output, 16 * 1024) == len(large)
+    assert output.getvalue() == large
+    assert output.largest_write <= frame_size + 64 * 1024
+
+    extracted = uploader.extract_archive_member("archives/split.tar.zst", "small.txt", str(tmp_path / "small.txt"))
+    assert extracted["size"] == 5
+    assert (tmp_path / "small.txt").read_bytes() == b"small"
+
+
+def test_extract_missing_member_leaves_no_partial_file(tmp_path, fake_server, fake_client):
+    _make_tree(tmp_path / "src")
+    uploader = OneDriveUploader(client=fake_client)
+    uploader.upload_archive(str(tmp_path / "src"), "archives/backup.tar")
+    with pytest.raises(KeyError):
+        uploader.extract_archive_member("archives/backup.tar", "missing.txt", str(tmp_path / "out" / "missing.txt"))
+    assert not os.listdir(tmp_path / "out")
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import threading
+
+import aiohttp
+
+from src.api import async_onedrive_client
+from src.api.async_onedrive_client import AsyncOneDriveClient
+from src.async_main import AsyncOneDriveUploader
+from src.auth.token_provider import TokenProvider
+
+
+class _Authenticator:
+    def __init__(self):
+        self.refreshes = 0
+        self.lock = threading.Lock()
+
+    def get_token(self):
+        return {"access_token": "token-0", "expires_in": 3600}
+
+    def refresh_token(self, force_refresh=False, allow_interactive=True):
+        with self.lock:
+            self.refreshes += 1
+            return {"access_token": f"token-{self.refreshes}", "expires_in": 3600}
+
+
+def test_token_expiring_mid_upload_is_refreshed_once_and_requests_replayed(tmp_path, monkeypatch, fake_server):
+    (tmp_path / "src").mkdir()
+    files = {f"f{i:02d}.bin": os.urandom(32 * 1024) for i in range(20)}
+    for name, data in files.items():
+        (tmp_path / "src" / name).write_bytes(data)
+    authenticator = _Authenticator()
+    read_file = async_onedrive_client._read_file
+    reads = []
+
+    def expiring_read(file_path):
+        # 5ファイル目を読んだ時点で最初のトークンを失効させる
+        reads.append(file_path)
+        if len(reads) == 5:
+            fake_server.revoked_tokens.add("token-0")
+        return read_file(file_path)
+
+    monkeypatch.setattr(async_onedrive_client, "_read_file", expiring_read)
+    statuses = []
+
+    async def run():
+        async def on_request_end(session, context, params):
+            statuses.append(params.response.status)
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_end.append(on_request_end)
+        provider = TokenProvider(authenticator, background=False)
+        async with aiohttp.ClientSession(trace_configs=[trace]) as session:
+            client = AsyncOneDriveClient(provider, max_concurrency=4, session=session)
+            uploader = AsyncOneDriveUploader(client=client)
+            results = await uploader.upload_directory(str(tmp_path / "src"), "async")
+            await client.close()
+            return results
+
+    results = asyncio.run(run())
+    assert all(result["success"] for result in results)
+    for name, data in files.items():
+        assert fake_server.state.items[f"async/{name}"]["content"] == data
+    assert 401 in statuses
+    # 同時に401を受けたタスクがあっても更新は1回だけ
+    assert authenticator.refreshes == 1
+
+
+def test_resumable_upload_survives_token_expiry(tmp_path, fake_server):
+    data = os.urandom(5 * 1024 * 1024)
+    (tmp_path / "large.bin").write_bytes(data)
+    authenticator = _Authenticator()
+    # セッションを作る前にトークンが失効している
+    fake_server.revoked_tokens.add("token-0")
+
+    async def run():
+        async with AsyncOneDriveClient(TokenProvider(authenticator, background=False), max_concurrency=1) as client:
+            return await client.upload_file(str(tmp_path / "large.bin"), "async/large.bin")
+
+    assert asyncio.run(run())["size"] == len(data)
+    assert fake_server.state.items["async/large.bin"]["content"] == data
+    assert authenticator.refreshes == 1
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+
+from src.api import async_onedrive_client
+from src.api.async_onedrive_client import AsyncOneDriveClient
+from src.async_main import AsyncOneDriveUploader
+
+
+def _make_files(root, count: int, size: int):
+    root.mkdir()
+    files = {}
+    for i in range(count):
+        data = bytes([i % 256]) * size
+        (root / f"f{i:03d}.bin").write_bytes(data)
+        files[f"f{i:03d}.bin"] = data
+    return files
+
+
+def test_upload_directory_bounds_buffered_files_and_tasks(tmp_path, monkeypatch, fake_server):
+    files = _make_files(tmp_path / "src", 40, 64 * 1024)
+    max_concurrency = 3
+    state = {"buffered": 0, "peak_buffered": 0, "running": 0, "peak_running": 0}
+    lock = threading.Lock()
+    read_file = async_onedrive_client._read_file
+
+    def counting_read(file_path):
+        with lock:
+            state["buffered"] += 1
+            state["peak_buffered"] = max(state["peak_buffered"], state["buffered"])
+        return read_file(file_path)
+
+    monkeypatch.setattr(async_onedrive_client, "_read_file", counting_read)
+
+    async def run():
+        async with AsyncOneDriveClient("test-token", max_concurrency=max_concurrency) as client:
+            send = client._send
+
+            async def counting_send(*args, **kwargs):
+                try:
+                    return await send(*args, **kwargs)
+                finally:
+                    if kwargs.get("data") is not None:
+                        with lock:
+                            state["buffered"] -= 1
+
+            client._send = counting_send
+            uploader = AsyncOneDriveUploader(client=client)
+            entry = uploader._upload_directory_entry
+
+            async def counting_entry(*args):
+                state["running"] += 1
+                state["peak_running"] = max(state["peak_running"], state["running"])
+                try:
+                    return await entry(*args)
+                finally:
+                    state["running"] -= 1
+
+            uploader._upload_directory_entry = counting_entry
+            return await uploader.upload_directory(str(tmp_path / "src"), "async")
+
+    results = asyncio.run(run())
+    assert all(result["success"] for result in results)
+    for name, data in files.items():
+        assert fake_server.state.items[f"async/{name}"]["content"] == data
+    assert state["peak_buffered"] <= max_concurrency
+    assert state["peak_running"] <= max_concurrency
+
+
+def test_resumable_upload_through_async_client(tmp_path, fake_server):
+    data = bytes(range(256)) * (5 * 1024 * 1024 // 256)
+    (tmp_path / "large.bin").write_bytes(data)
+
+    async def run():
+        async with AsyncOneDriveClient("test-token", max_concurrency=1) as client:
+            return await client.upload_file(str(tmp_path / "large.bin"), "async/large.bin")
+
+    assert asyncio.run(run())["size"] == len(data)
+    assert fake_server.state.items["async/large.bin"]["content"] == data
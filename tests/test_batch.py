@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+from src.api.batch import BatchError, GraphBatch, MAX_BATCH_SIZE, item_path_url
+
+
+def _folder_body(name: str):
+    return {"name": name, "folder": {}, "@microsoft.graph.conflictBehavior": "fail"}
+
+
+def _count_batches(client):
+    sizes = []
+
+    def hook(response, *args, **kwargs):
+        if response.request.url.endswith("/$batch"):
+            sizes.append(len(response.json()["responses"]))
+    client.transport.session.hooks["response"].append(hook)
+    return sizes
+
+
+def test_new_folder_with_more_than_20_children(fake_server, fake_client):
+    sizes = _count_batches(fake_client)
+    paths = ["new"] + [f"new/{i}" for i in range(25)]
+    results = fake_client.batch_create_folders(paths)
+    assert set(results) == set(paths)
+    assert all(fake_server.state.items[path]["folder"] for path in paths)
+    assert sizes == [1, MAX_BATCH_SIZE, 5]
+
+
+def test_existing_folders_are_accepted(fake_server, fake_client):
+    fake_server.state.create_folder("docs/old")
+    results = fake_client.batch_create_folders(["docs", "docs/old", "docs/old/a", "docs/new"])
+    assert results["docs"] == {"status": "already_exists"}
+    assert results["docs/old"] == {"status": "already_exists"}
+    assert fake_server.state.items["docs/old/a"]["folder"]
+    assert "docs/new" in fake_client.folder_cache
+
+
+def test_children_of_a_failed_folder_are_not_sent(fake_server, fake_client):
+    # 親が存在しないため "missing/child" は404になり、その下のフォルダーは送らずに424とする
+    with pytest.raises(BatchError) as error:
+        fake_client.batch_create_folders(["missing/child", "missing/child/grandchild", "ok"])
+    assert set(error.value.results) == {"ok"}
+    assert error.value.failures["missing/child"].status == 404
+    assert error.value.failures["missing/child/grandchild"].status == 424
+    assert "missing/child" not in fake_server.state.items
+
+
+def test_dependency_chain_longer_than_a_batch_is_split(fake_server, fake_client):
+    sizes = _count_batches(fake_client)
+    batch = GraphBatch(fake_client)
+    parent = ""
+    previous = None
+    for i in range(MAX_BATCH_SIZE + 5):
+        url = item_path_url(parent, ":/children") if parent else "/me/drive/root/children"
+        previous = batch.add("POST", url, body=_folder_body(f"d{i}"), depends_on=[previous] if previous else None)
+        parent = f"{parent}/d{i}".strip("/")
+    results = batch.execute()
+    assert all(result.status == 201 for result in results.values())
+    assert parent in fake_server.state.items
+    assert sizes == [MAX_BATCH_SIZE, 5]
+
+
+def test_failed_dependency_in_an_earlier_batch_skips_the_rest_of_the_chain(fake_server, fake_client):
+    batch = GraphBatch(fake_client)
+    previous = batch.add("GET", item_path_url("does/not/exist"))
+    for i in range(MAX_BATCH_SIZE + 2):
+        previous = batch.add("POST", "/me/drive/root/children", body=_folder_body(f"never{i}"), depends_on=[previous])
+    results = batch.execute()
+    assert results["1"].status == 404
+    assert all(result.status == 424 for request_id, result in results.items() if request_id != "1")
+    assert not any(path.startswith("never") for path in fake_server.state.items)
+
+
+def test_throttled_requests_and_their_dependents_are_retried(fault_server, fault_client):
+    fault_server.injector.configure({"batch_throttle_rate": 0.3, "retry_after": 0.01, "seed": 3})
+    batch = GraphBatch(fault_client, max_retries=10)
+    parent = ""
+    previous = None
+    for i in range(MAX_BATCH_SIZE + 5):
+        url = item_path_url(parent, ":/children") if parent else "/me/drive/root/children"
+        previous = batch.add("POST", url, body=_folder_body(f"t{i}"), depends_on=[previous] if previous else None)
+        parent = f"{parent}/t{i}".strip("/")
+    results = batch.execute(accepted_statuses=(409,))
+    assert all(result.status in (201, 409) for result in results.values())
+    assert parent in fault_server.state.items
+    assert fault_server.injector.stats()["faults"]["batch_throttle"] > 0
+
+    # batch_create_foldersは既定の再送回数（3回）で送る
+    fault_server.injector.configure({"batch_throttle_rate": 0.1, "retry_after": 0.01, "seed": 3})
+    paths = ["wide"] + [f"wide/{i}" for i in range(30)]
+    assert set(fault_client.batch_create_folders(paths)) == set(paths)
+
+
+def test_request_missing_from_the_batch_response_is_a_failure(fake_server, fake_client):
+    def drop_response(response, *args, **kwargs):
+        # 応答から "drop/b" の作成結果を取り除く
+        if response.request.url.endswith("/$batch"):
+            data = response.json()
+            sent = json.loads(response.request.body)["requests"]
+            dropped = {request["id"] for request in sent if request["body"]["name"] == "b"}
+            data["responses"] = [item for item in data["responses"] if item["id"] not in dropped]
+            response._content = json.dumps(data).encode("utf-8")
+        return response
+
+    fake_client.transport.session.hooks["response"].append(drop_response)
+    with pytest.raises(BatchError) as error:
+        fake_client.batch_create_folders(["drop", "drop/a", "drop/b", "drop/b/c"])
+    assert set(error.value.results) == {"drop", "drop/a"}
+    assert error.value.failures["drop/b"].status == 0
+    # 応答のなかったフォルダーの子は送らない
+    assert error.value.failures["drop/b/c"].status == 424
+    assert "drop/b" not in fake_client.folder_cache
@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+
+import pytest
+
+from src.main import OneDriveUploader
+from src.utils import buffer_pool as buffer_pool_module
+from src.utils.buffer_pool import BufferPool
+from src.utils.config import Config
+
+
+class _Warnings:
+    def __init__(self):
+        self.messages = []
+
+    def warning(self, message: str):
+        self.messages.append(message)
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def _make_files(root, count: int, size: int):
+    os.makedirs(root)
+    for i in range(count):
+        with open(os.path.join(root, f"{i}.bin"), 'wb') as f:
+            f.write(os.urandom(size))
+
+
+def test_waiting_for_a_buffer_logs_a_warning_and_keeps_waiting(monkeypatch):
+    warnings = _Warnings()
+    monkeypatch.setattr(buffer_pool_module, "get_logger", lambda: warnings)
+    pool = BufferPool(16, 1, wait_warning=0.05)
+    held = pool.acquire()
+    threading.Timer(0.3, pool.release, args=(held,)).start()
+
+    assert pool.acquire() is held
+    assert len(warnings.messages) == 1
+    assert pool.stats()["waits"] == 1
+
+
+def test_acquire_timeout_and_reserve():
+    pool = BufferPool(16, 1)
+    pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+
+    # 上限を引き上げると待っているスレッドも確保できる
+    threading.Timer(0.1, pool.reserve, args=(2,)).start()
+    started = time.monotonic()
+    pool.acquire(timeout=5)
+    assert time.monotonic() - started < 5
+    assert pool.stats()["allocated"] == 2
+
+
+@pytest.mark.parametrize("prefetch_depth", [0, 1])
+def test_more_concurrent_uploads_than_default_buffers(tmp_path, monkeypatch, fault_server, fault_client, prefetch_depth):
+    # 各リクエストに遅延を入れ、6ファイルのアップロードが同時に進むようにする
+    monkeypatch.setattr(Config, "UPLOAD_PREFETCH_DEPTH", prefetch_depth)
+    fault_server.injector.configure({"latency": {"distribution": "fixed", "ms": 20}})
+    _make_files(str(tmp_path / "src"), 6, 4 * 320 * 1024)
+    assert fault_client.buffer_pool.max_buffers < 6
+
+    uploader = OneDriveUploader(client=fault_client)
+    results = uploader.upload_directory(str(tmp_path / "src"), "many", workers=6)
+    assert all(result["success"] for result in results)
+    stats = fault_client.buffer_pool.stats()
+    assert stats["max_buffers"] == 6 * (prefetch_depth + 2 if prefetch_depth else 1)
+    assert stats["waits"] == 0
+    assert stats["peak_in_use"] > 4
+
+
+def test_configured_pool_size_is_kept_and_reported(tmp_path, monkeypatch, fake_server, fake_client):
+    monkeypatch.setattr(Config, "UPLOAD_BUFFER_POOL_SIZE", 2)
+    fake_client.buffer_pool = BufferPool(fake_client.buffer_pool.buffer_size, 2)
+    _make_files(str(tmp_path / "src"), 4, 2 * 320 * 1024)
+
+    uploader = OneDriveUploader(client=fake_client)
+    warnings = _Warnings()
+    uploader.logger = warnings
+    results = uploader.upload_directory(str(tmp_path / "src"), "capped", workers=4)
+    assert all(result["success"] for result in results)
+    assert any("UPLOAD_BUFFER_POOL_SIZE" in message for message in warnings.messages)
+    assert fake_client.buffer_pool.stats()["max_buffers"] == 2
+    assert fake_client.buffer_pool.stats()["peak_in_use"] <= 2
@@ -0,0 +1,131 @@
+import os
+
+import pytest
+import requests
+
+from src.api.downloader import ParallelDownloader
+from src.utils.config import Config
+
+RANGE_SIZE = 256 * 1024
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _range_requests(client):
+    ranges = []
+
+    def hook(response, *args, **kwargs):
+        if "Range" in response.request.headers:
+            ranges.append(response.request.headers["Range"])
+    client.transport.session.hooks["response"].append(hook)
+    return ranges
+
+
+def _interrupt_after(limit: int):
+    def callback(done, total):
+        if done >= limit:
+            raise Interrupted()
+    return callback
+
+
+def test_parallel_download_is_verified(tmp_path, fake_server, fake_client):
+    data = os.urandom(2 * 1024 * 1024 + 99)
+    fake_server.state.put_file("dl/data.bin", data)
+    local = tmp_path / "out" / "data.bin"
+    result = ParallelDownloader(fake_client, workers=4, range_size=RANGE_SIZE).download_file("dl/data.bin", str(local))
+    assert local.read_bytes() == data
+    assert result["verified"] is True
+    assert result["ranges"] == 9
+    assert not os.path.exists(f"{local}.part") and not os.path.exists(f"{local}.part.json")
+
+
+def test_interrupted_download_resumes_from_the_range_journal(tmp_path, fake_server, fake_client):
+    data = os.urandom(8 * RANGE_SIZE + 10)
+    fake_server.state.put_file("dl/resume.bin", data)
+    local = str(tmp_path / "resume.bin")
+
+    # 1ワーカーで3範囲を取得したところで中断する
+    downloader = ParallelDownloader(fake_client, workers=1, range_size=RANGE_SIZE)
+    with pytest.raises(Interrupted):
+        downloader.download_file("dl/resume.bin", local, progress_callback=_interrupt_after(3 * RANGE_SIZE + 1))
+    assert os.path.exists(f"{local}.part") and os.path.exists(f"{local}.part.json")
+    assert not os.path.exists(local)
+
+    ranges = _range_requests(fake_client)
+    result = ParallelDownloader(fake_client, workers=3, range_size=RANGE_SIZE).download_file("dl/resume.bin", local)
+    with open(local, 'rb') as f:
+        assert f.read() == data
+    assert result["resumed_ranges"] == 3
+    assert result["verified"] is True
+    assert len(ranges) == 6
+    assert f"bytes=0-{RANGE_SIZE - 1}" not in ranges
+
+
+def test_changed_remote_file_is_downloaded_again(tmp_path, fake_server, fake_client):
+    fake_server.state.put_file("dl/changed.bin", os.urandom(4 * RANGE_SIZE))
+    local = str(tmp_path / "changed.bin")
+    downloader = ParallelDownloader(fake_client, workers=1, range_size=RANGE_SIZE)
+    with pytest.raises(Interrupted):
+        downloader.download_file("dl/changed.bin", local, progress_callback=_interrupt_after(2 * RANGE_SIZE + 1))
+
+    # eTagが変わったため、ジャーナルの完了済み範囲は使わない
+    data = os.urandom(4 * RANGE_SIZE)
+    fake_server.state.put_file("dl/changed.bin", data)
+    result = downloader.download_file("dl/changed.bin", local)
+    assert result["resumed_ranges"] == 0
+    with open(local, 'rb') as f:
+        assert f.read() == data
+
+
+def test_hash_mismatch_discards_the_partial_file(tmp_path, fake_server, fake_client):
+    fake_server.state.put_file("dl/corrupt.bin", os.urandom(RANGE_SIZE * 2))
+    item = fake_client.get_file_info("dl/corrupt.bin")
+    item["file"]["hashes"]["quickXorHash"] = "AAAAAAAAAAAAAAAAAAAAAAAAAAA="
+    local = str(tmp_path / "corrupt.bin")
+    with pytest.raises(IOError):
+        ParallelDownloader(fake_client, range_size=RANGE_SIZE).download_file("dl/corrupt.bin", local, item=item)
+    assert not os.path.exists(local)
+    assert not os.path.exists(f"{local}.part") and not os.path.exists(f"{local}.part.json")
+
+
+def test_deleted_item_fails_instead_of_renewing_forever(tmp_path, fake_server, fake_client):
+    fake_server.state.put_file("dl/deleted.bin", os.urandom(RANGE_SIZE * 2))
+    item = fake_client.get_file_info("dl/deleted.bin")
+    fake_server.state.delete("dl/deleted.bin")
+    local = str(tmp_path / "deleted.bin")
+    with pytest.raises(FileNotFoundError):
+        ParallelDownloader(fake_client, range_size=RANGE_SIZE).download_file("dl/deleted.bin", local, item=item)
+    assert not os.path.exists(local)
+
+
+def test_replaced_item_fails_instead_of_mixing_versions(tmp_path, fake_server, fake_client):
+    fake_server.state.put_file("dl/replaced.bin", os.urandom(RANGE_SIZE * 2))
+    item = fake_client.get_file_info("dl/replaced.bin")
+    fake_server.state.delete("dl/replaced.bin")
+    fake_server.state.put_file("dl/replaced.bin", os.urandom(RANGE_SIZE * 2))
+    with pytest.raises(IOError):
+        ParallelDownloader(fake_client, range_size=RANGE_SIZE).download_file(
+            "dl/replaced.bin", str(tmp_path / "replaced.bin"), item=item)
+
+
+def test_url_that_stays_forbidden_is_renewed_a_limited_number_of_times(tmp_path, monkeypatch, fake_server, fake_client):
+    monkeypatch.setattr(Config, "CHUNK_MAX_RETRIES", 3)
+    fake_server.state.put_file("dl/forbidden.bin", os.urandom(RANGE_SIZE))
+    metadata_requests = []
+
+    def forbid_downloads(response, *args, **kwargs):
+        # 項目は取得できるが、ダウンロードURLは何度取得し直しても403になる
+        if "/download/" in response.request.url:
+            response.status_code = 403
+        else:
+            metadata_requests.append(response.request.url)
+        return response
+
+    fake_client.transport.session.hooks["response"].append(forbid_downloads)
+    with pytest.raises(requests.HTTPError):
+        ParallelDownloader(fake_client, range_size=RANGE_SIZE).download_file(
+            "dl/forbidden.bin", str(tmp_path / "forbidden.bin"))
+    # 最初の取得と、上限までのURLの取得し直し
+    assert len(metadata_requests) == 1 + 3
@@ -0,0 +1,107 @@
+import io
+import os
+
+import pytest
+
+from src.api.onedrive_client import UploadSessionLostError
+from src.utils.config import Config
+from src.utils.session_journal import UploadSessionJournal
+
+
+def _statuses(client):
+    statuses = []
+    client.transport.session.hooks["response"].append(lambda response, *args, **kwargs: statuses.append(response.status_code))
+    return statuses
+
+
+def _write(tmp_path, name: str, size: int):
+    path = tmp_path / name
+    data = os.urandom(size)
+    path.write_bytes(data)
+    return str(path), data
+
+
+@pytest.mark.parametrize("size", [3 * 320 * 1024, 2 * 1024 * 1024 + 777])
+def test_upload_file_continues_from_partially_accepted_fragments(tmp_path, fault_server, fault_client, size):
+    # すべての（最後以外の）フラグメントで半分だけ受信したことにする
+    fault_server.injector.configure({"truncate_rate": 1.0})
+    local, data = _write(tmp_path, "truncated.bin", size)
+    statuses = _statuses(fault_client)
+    progress = []
+    result = fault_client.upload_file(local, "faults/truncated.bin",
+                                      progress_callback=lambda done, total: progress.append(done))
+    assert result["size"] == size
+    assert fault_server.state.items["faults/truncated.bin"]["content"] == data
+    assert fault_server.injector.stats()["faults"]["truncate"] > 0
+    # 進捗はサーバーが受け取った位置だけを報告し、後戻りしない
+    assert progress == sorted(progress) and progress[-1] == size
+    # 次のフラグメントで416を受けて合わせ直すのではなく、202のnextExpectedRangesからすぐに続ける
+    assert 416 not in statuses
+
+
+def test_journal_never_records_more_than_the_server_accepted(tmp_path, fault_server, fault_client):
+    fault_server.injector.configure({"truncate_rate": 1.0})
+    local, data = _write(tmp_path, "journaled.bin", 4 * 320 * 1024)
+    journal = UploadSessionJournal(str(tmp_path / "journal.json"), save_fragments=1)
+    fault_client.journal = journal
+    offsets = []
+    update_progress = journal.update_progress
+
+    def recording_update(local_path, remote_path, offset, *args, **kwargs):
+        session = next(iter(fault_server.state.sessions.values()))
+        offsets.append((offset, session["received"]))
+        return update_progress(local_path, remote_path, offset, *args, **kwargs)
+
+    journal.update_progress = recording_update
+    fault_client.upload_file(local, "faults/journaled.bin")
+    assert offsets and all(recorded <= received for recorded, received in offsets)
+    assert fault_server.state.items["faults/journaled.bin"]["content"] == data
+    assert journal.entries() == []
+
+
+def test_upload_file_recovers_from_dropped_fragments(tmp_path, fault_server, fault_client):
+    fault_server.injector.configure({"drop_rate": 0.3, "seed": 11})
+    local, data = _write(tmp_path, "dropped.bin", 2 * 1024 * 1024)
+    fault_client.upload_file(local, "faults/dropped.bin")
+    assert fault_server.state.items["faults/dropped.bin"]["content"] == data
+    assert fault_server.injector.stats()["faults"]["drop"] > 0
+
+
+def test_upload_fileobj_recovers_from_truncation_and_drops(fault_server, fault_client):
+    fault_server.injector.configure({"truncate_rate": 0.5, "drop_rate": 0.2, "seed": 4})
+    data = os.urandom(2 * 1024 * 1024 + 5)
+    fault_client.upload_fileobj(io.BytesIO(data), len(data), "faults/fileobj.bin")
+    assert fault_server.state.items["faults/fileobj.bin"]["content"] == data
+
+
+def test_upload_file_waits_and_resends_after_a_202_without_progress(tmp_path, fault_server, fault_client):
+    fault_server.injector.configure({"stall_rate": 0.4, "seed": 2})
+    local, data = _write(tmp_path, "stalled.bin", 2 * 1024 * 1024)
+    statuses = _statuses(fault_client)
+    fault_client.upload_file(local, "faults/stalled.bin")
+    assert fault_server.state.items["faults/stalled.bin"]["content"] == data
+    assert fault_server.injector.stats()["faults"]["stall"] > 0
+    assert 416 not in statuses
+
+
+def test_upload_file_gives_up_when_the_server_never_makes_progress(tmp_path, monkeypatch, fault_server, fault_client):
+    monkeypatch.setattr(Config, "CHUNK_MAX_RETRIES", 3)
+    fault_server.injector.configure({"stall_rate": 1.0})
+    local, _ = _write(tmp_path, "stuck.bin", 2 * 320 * 1024)
+    with pytest.raises(UploadSessionLostError):
+        fault_client.upload_file(local, "faults/stuck.bin")
+    # 最初の送信と、上限までの再送だけを行う
+    assert fault_server.injector.stats()["fragments"] == 4
+
+
+def test_upload_file_honours_a_202_that_rewinds_the_session(tmp_path, fault_server, fault_client):
+    fault_server.injector.configure({"rewind_rate": 0.3, "seed": 6})
+    local, data = _write(tmp_path, "rewound.bin", 3 * 1024 * 1024)
+    statuses = _statuses(fault_client)
+    progress = []
+    fault_client.upload_file(local, "faults/rewound.bin", progress_callback=lambda done, total: progress.append(done))
+    assert fault_server.state.items["faults/rewound.bin"]["content"] == data
+    assert fault_server.injector.stats()["faults"]["rewind"] > 0
+    # 巻き戻された位置から送り直し、416で合わせ直すことはない
+    assert progress != sorted(progress)
+    assert 416 not in statuses
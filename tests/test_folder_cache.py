@@ -0,0 +1,46 @@
+import json
+import os
+import threading
+
+from src.utils.folder_cache import KnownFoldersCache
+
+
+def _saved(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return set(json.load(f))
+
+
+def test_two_caches_saving_the_same_file_keep_each_others_folders(tmp_path):
+    path = str(tmp_path / "folders.json")
+    first = KnownFoldersCache(path)
+    second = KnownFoldersCache(path)
+    first.add("a/b")
+    second.add("c")
+    first.save()
+    second.save()
+    assert _saved(path) == {"a", "a/b", "c"}
+
+    # 削除は他方が追加したフォルダーを消さずに反映される
+    first.discard("a/b")
+    first.save()
+    assert _saved(path) == {"a", "c"}
+    assert "c" in first
+
+
+def test_concurrent_saves_do_not_lose_folders_or_leave_temp_files(tmp_path):
+    path = str(tmp_path / "folders.json")
+    caches = [KnownFoldersCache(path) for _ in range(8)]
+
+    def work(index, cache):
+        for i in range(20):
+            cache.add(f"w{index}/f{i}")
+            cache.save()
+
+    threads = [threading.Thread(target=work, args=(index, cache)) for index, cache in enumerate(caches)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    saved = _saved(path)
+    assert all(f"w{index}/f{i}" in saved for index in range(8) for i in range(20))
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
@@ -0,0 +1,62 @@
+import base64
+import os
+
+import pytest
+
+from src.utils.hashing import QuickXorHash, ReferenceQuickXorHash, matches_remote_hash, quickxorhash_file, np
+
+
+def _spec_quickxorhash(data: bytes) -> str:
+    # 仕様どおりの素朴な実装: iバイト目を160ビットの状態の (i * 11) mod 160 ビット目から回転してXORし、
+    # 最後に長さ（64ビット、リトルエンディアン）を末尾8バイトにXORする
+    state = 0
+    for i, byte in enumerate(data):
+        rotated = byte << ((i * 11) % 160)
+        state ^= (rotated | (rotated >> 160)) & ((1 << 160) - 1)
+    digest = bytearray(state.to_bytes(20, "little"))
+    for i, byte in enumerate(len(data).to_bytes(8, "little")):
+        digest[12 + i] ^= byte
+    return base64.b64encode(bytes(digest)).decode("ascii")
+
+
+IMPLEMENTATIONS = [ReferenceQuickXorHash, lambda: QuickXorHash(use_numpy=False)]
+if np is not None:
+    IMPLEMENTATIONS.append(lambda: QuickXorHash(use_numpy=True))
+
+
+def test_empty_input():
+    for make in IMPLEMENTATIONS:
+        assert make().b64digest() == "AAAAAAAAAAAAAAAAAAAAAAAAAAA="
+
+
+@pytest.mark.parametrize("size", [1, 19, 20, 159, 160, 161, 1000, 4096 + 7])
+def test_matches_specification(size):
+    data = os.urandom(size)
+    expected = _spec_quickxorhash(data)
+    for make in IMPLEMENTATIONS:
+        hasher = make()
+        hasher.update(data)
+        assert hasher.b64digest() == expected
+
+
+def test_split_updates_match_a_single_update():
+    data = os.urandom(300000)
+    whole = QuickXorHash()
+    whole.update(data)
+    for make in IMPLEMENTATIONS[1:]:
+        hasher = make()
+        # 160バイトの周期にそろわない位置で分割する
+        for start, end in [(0, 1), (1, 161), (161, 70001), (70001, 300000)]:
+            hasher.update(memoryview(data)[start:end])
+        assert hasher.digest() == whole.digest()
+
+
+def test_file_hash_uses_blocks_and_compares_with_remote_hashes(tmp_path):
+    data = os.urandom(1024 * 1024 + 333)
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+    expected = _spec_quickxorhash(data)
+    assert quickxorhash_file(str(path), block_size=64 * 1024 + 1) == expected
+    assert matches_remote_hash(str(path), {"quickXorHash": expected}) is True
+    assert matches_remote_hash(str(path), {"quickXorHash": _spec_quickxorhash(b"other")}) is False
+    assert matches_remote_hash(str(path), {}) is None
@@ -0,0 +1,122 @@
+import io
+import sqlite3
+import threading
+
+import pytest
+
+from src.main import OneDriveUploader
+from src.utils import manifest as manifest_module
+from src.utils.manifest import UploadManifest
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    manifest = UploadManifest(str(tmp_path / "manifest.db"))
+    yield manifest
+    manifest.close()
+
+
+def test_records_are_queryable_after_flush(manifest):
+    manifest.record("a.txt", "/remote/a.txt", 10, UploadManifest.OUTCOME_SUCCESS, duration=0.5)
+    manifest.record("b.txt", "remote/b.txt", 20, UploadManifest.OUTCOME_FAILED, error="boom")
+    assert manifest.was_uploaded("a.txt", size=10)
+    assert not manifest.was_uploaded("b.txt")
+    assert manifest.history(remote_path="REMOTE/A.TXT")[0]["bytes_per_second"] == 20
+    assert manifest.summary()["failed"] == 1
+
+
+def test_invalid_record_is_dropped_without_stopping_the_writer(manifest):
+    # sizeはNOT NULLのため、この記録だけが書き込めない
+    manifest.record("bad.txt", "remote/bad.txt", None, UploadManifest.OUTCOME_SUCCESS)
+    manifest.record("good.txt", "remote/good.txt", 1, UploadManifest.OUTCOME_SUCCESS)
+    manifest.flush()
+    assert [row["local_path"].rsplit("/", 1)[-1] for row in manifest.history()] == ["good.txt"]
+
+    manifest.record("later.txt", "remote/later.txt", 2, UploadManifest.OUTCOME_SUCCESS)
+    assert manifest.was_uploaded("later.txt")
+    assert manifest._writer.is_alive()
+
+
+def test_locked_database_drops_the_batch_and_recovers(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest_module, "_BUSY_TIMEOUT", 0.05)
+    monkeypatch.setattr(manifest_module, "_WRITE_RETRY_DELAY", 0.01)
+    manifest = UploadManifest(str(tmp_path / "manifest.db"))
+    try:
+        blocker = sqlite3.connect(str(tmp_path / "manifest.db"))
+        blocker.execute("BEGIN EXCLUSIVE")
+        manifest.record("locked.txt", "remote/locked.txt", 1, UploadManifest.OUTCOME_SUCCESS)
+
+        flushed = threading.Event()
+        threading.Thread(target=lambda: (manifest.flush(), flushed.set()), daemon=True).start()
+        assert flushed.wait(10)
+        blocker.rollback()
+        blocker.close()
+
+        manifest.record("after.txt", "remote/after.txt", 1, UploadManifest.OUTCOME_SUCCESS)
+        assert manifest.was_uploaded("after.txt")
+        assert not manifest.was_uploaded("locked.txt")
+    finally:
+        manifest.close()
+    assert not manifest._writer.is_alive()
+
+
+def test_close_does_not_hang_when_writer_has_stopped(tmp_path):
+    manifest = UploadManifest(str(tmp_path / "manifest.db"))
+    manifest.close()
+    manifest._closed = False
+    # 書き込みスレッドが終了した後の記録でもflush()とclose()は戻る
+    manifest._queue.put(("x",) * 12)
+    manifest.flush()
+    manifest.close()
+
+
+def test_stream_archive_and_download_transfers_are_recorded(tmp_path, manifest, fake_server, fake_client):
+    uploader = OneDriveUploader(client=fake_client)
+    uploader.manifest = manifest
+    (tmp_path / "tree").mkdir()
+    (tmp_path / "tree" / "a.txt").write_bytes(b"a" * 1000)
+
+    uploader.upload_from_stream(io.BytesIO(b"s" * 5000), "kinds/stream.bin", show_progress=False)
+    archive = uploader.upload_archive(str(tmp_path / "tree"), "kinds/tree.tar")
+    uploader.download_file("kinds/stream.bin", str(tmp_path / "downloaded.bin"), show_progress=False)
+
+    rows = {row["kind"]: row for row in manifest.history()}
+    assert set(rows) == {UploadManifest.KIND_STREAM, UploadManifest.KIND_ARCHIVE, UploadManifest.KIND_DOWNLOAD}
+    assert rows["stream"]["local_path"] == "-" and rows["stream"]["size"] == 5000
+    assert rows["archive"]["remote_path"] == "kinds/tree.tar"
+    assert rows["archive"]["size"] == archive["index"]["archive_size"]
+    assert rows["download"]["local_path"] == str(tmp_path / "downloaded.bin")
+    assert rows["download"]["outcome"] == UploadManifest.OUTCOME_SUCCESS
+    assert manifest.summary(kind=UploadManifest.KIND_DOWNLOAD)["bytes"] == 5000
+    # ダウンロードしたファイルはアップロード済みとはみなさない
+    assert not manifest.was_uploaded(str(tmp_path / "downloaded.bin"))
+
+
+def test_failed_download_is_recorded(tmp_path, manifest, fake_server, fake_client):
+    uploader = OneDriveUploader(client=fake_client)
+    uploader.manifest = manifest
+    with pytest.raises(FileNotFoundError):
+        uploader.download_file("kinds/missing.bin", str(tmp_path / "missing.bin"), show_progress=False)
+    failure = manifest.failures()[0]
+    assert failure["kind"] == UploadManifest.KIND_DOWNLOAD
+    assert failure["remote_path"] == "kinds/missing.bin"
+
+
+def test_database_without_kind_column_is_migrated(tmp_path):
+    db_file = str(tmp_path / "old.db")
+    connection = sqlite3.connect(db_file)
+    connection.executescript(manifest_module._SCHEMA.replace(",\n    kind TEXT NOT NULL DEFAULT 'file'", ""))
+    connection.execute(
+        "INSERT INTO uploads (local_path, remote_path, size, started_at, attempts, outcome) VALUES (?, ?, ?, ?, ?, ?)",
+        (str(tmp_path / "old.txt"), "old.txt", 3, 1.0, 1, UploadManifest.OUTCOME_SUCCESS)
+    )
+    connection.commit()
+    connection.close()
+
+    manifest = UploadManifest(db_file)
+    try:
+        assert manifest.was_uploaded(str(tmp_path / "old.txt"))
+        manifest.record("s3://bucket/key", "new.bin", 4, UploadManifest.OUTCOME_SUCCESS, kind=UploadManifest.KIND_S3)
+        assert manifest.history(local_path="s3://bucket/key")[0]["kind"] == UploadManifest.KIND_S3
+    finally:
+        manifest.close()
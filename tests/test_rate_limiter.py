@@ -0,0 +1,82 @@
+import time
+from email.utils import formatdate
+
+from src.api.onedrive_client import OneDriveClient
+from src.utils.rate_limiter import RateLimiter, parse_retry_after
+
+
+class _Response:
+    def __init__(self, status_code: int, retry_after=None):
+        self.status_code = status_code
+        self.headers = {"Retry-After": retry_after} if retry_after is not None else {}
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(" 1.5 ") == 1.5
+    assert parse_retry_after("-4") == 0.0
+    assert 50 < parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after(formatdate(time.time() - 60, usegmt=True)) == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_token_bucket_allows_a_burst_then_limits_the_rate():
+    limiter = RateLimiter(rate=50, burst=5)
+    started = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    assert time.monotonic() - started < 0.05
+    for _ in range(10):
+        limiter.acquire()
+    # バーストの後の10件は毎秒50件（0.2秒）に制限される
+    assert 0.15 <= time.monotonic() - started < 1.0
+    assert limiter.get_stats()["waited_seconds"] > 0
+
+
+def test_retry_after_pauses_every_request():
+    limiter = RateLimiter(default_retry_after=0.2)
+    assert limiter.observe(_Response(200)) is None
+    assert limiter.observe(_Response(429, "0.3")) == 0.3
+    started = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - started >= 0.25
+
+    # Retry-Afterのない429は既定の秒数だけ止め、503は止めない
+    assert limiter.observe(_Response(429)) == 0.2
+    assert limiter.observe(_Response(503)) is None
+    assert limiter.get_stats()["throttled"] == 2
+
+
+def test_pause_is_shared_between_processes_through_the_lock_file(tmp_path):
+    lock_file = str(tmp_path / "rate.lock")
+    first = RateLimiter(lock_file=lock_file)
+    second = RateLimiter(lock_file=lock_file)
+    first.observe(_Response(503, "0.3"))
+    started = time.monotonic()
+    second.acquire()
+    assert time.monotonic() - started >= 0.25
+
+
+def test_paused_for_reports_a_pause_set_by_another_process(tmp_path):
+    lock_file = str(tmp_path / "rate.lock")
+    first = RateLimiter(lock_file=lock_file)
+    second = RateLimiter(lock_file=lock_file)
+    first.pause(30)
+    assert 25 < second.get_stats()["paused_for"] <= 30
+    assert RateLimiter().get_stats()["paused_for"] == 0.0
+
+
+def test_client_replays_throttled_requests(fault_server):
+    fault_server.injector.configure({"throttle_rate": 0.3, "retry_after": 0.05, "seed": 5})
+    fault_server.state.create_folder("throttled")
+    client = OneDriveClient("test-token", rate_limiter=RateLimiter())
+    client.transport.session.trust_env = False
+    try:
+        for _ in range(20):
+            assert client.get_file_info("throttled") is not None
+    finally:
+        client.close()
+    stats = client.get_rate_stats()
+    assert stats["throttled"] == fault_server.injector.stats()["faults"]["throttle"] > 0
+    assert stats["waited_seconds"] > 0
@@ -0,0 +1,67 @@
+import json
+import os
+import threading
+
+from src.api.remote_index import RemoteIndex
+
+
+class _Response:
+    def __init__(self, page):
+        self.status_code = 200
+        self.page = page
+
+    def json(self):
+        return self.page
+
+    def raise_for_status(self):
+        pass
+
+
+# /delta の1ページだけを返すクライアントの代替
+class _DeltaClient:
+    base_url = "https://graph.example/v1.0"
+    headers = {}
+
+    def __init__(self, token: str, names):
+        self.page = {
+            "value": [{"id": "root", "name": "root", "root": {}}] + [
+                {"id": name, "name": name, "parentReference": {"id": "root"}, "file": {}} for name in names
+            ],
+            "@odata.deltaLink": token,
+        }
+
+    def _request(self, method, url, **kwargs):
+        return _Response(self.page)
+
+
+def test_concurrent_saves_keep_the_token_and_items_together(tmp_path):
+    path = str(tmp_path / "index.json")
+    clients = [_DeltaClient(f"token-{i}", [f"{i}-{n}.bin" for n in range(50)]) for i in range(4)]
+
+    indexes = [RemoteIndex(client, path) for client in clients]
+    errors = []
+
+    def work(index):
+        try:
+            for _ in range(10):
+                index.refresh()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in indexes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    # 最後に書き込んだインデックスのトークンと項目がそろって残る
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    owner = data["delta_link"].split("-")[1]
+    assert {item["name"].split("-")[0] for item_id, item in data["items"].items() if item_id != "root"} == {owner}
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+    index = RemoteIndex(clients[0], path)
+    assert index.delta_link == data["delta_link"]
+    assert index.exists(f"{owner}-0.bin")
@@ -0,0 +1,127 @@
+import os
+import threading
+
+import pytest
+from botocore.exceptions import ClientError, ReadTimeoutError
+
+from src.main import OneDriveUploader
+from src.sources.s3_source import S3ObjectReader, S3Source
+from src.utils.config import Config
+
+RANGE_SIZE = 1000
+
+
+class _Body:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def read(self) -> bytes:
+        return self.data
+
+
+# get_objectの範囲GETとIfMatchだけを実装したS3クライアントの代替
+class FakeS3Client:
+    def __init__(self, objects):
+        self.objects = dict(objects)
+        self.etags = {key: f'"{i}"' for i, key in enumerate(self.objects)}
+        self.ranges = []
+        # 範囲ごとに、先頭から順に返す障害（"timeout" または "short"）
+        self.faults = {}
+        self.lock = threading.Lock()
+
+    def replace(self, key: str, data: bytes):
+        with self.lock:
+            self.objects[key] = data
+            self.etags[key] = f'"{self.etags[key]}-new"'
+
+    def head_object(self, Bucket, Key):
+        return {"ContentLength": len(self.objects[Key]), "ETag": self.etags[Key]}
+
+    def get_object(self, Bucket, Key, Range, IfMatch=None):
+        start, end = (int(value) for value in Range[len("bytes="):].split("-"))
+        with self.lock:
+            self.ranges.append(start)
+            if IfMatch is not None and IfMatch != self.etags[Key]:
+                raise ClientError({"Error": {"Code": "PreconditionFailed"}}, "GetObject")
+            faults = self.faults.get(start) or []
+            fault = faults.pop(0) if faults else None
+            data = self.objects[Key][start:end + 1]
+        if fault == "timeout":
+            raise ReadTimeoutError(endpoint_url="https://s3.example")
+        if fault == "short":
+            data = data[:-1]
+        return {"Body": _Body(data)}
+
+
+def _reader(client, key="data.bin", read_ahead=2, etag=True):
+    size = len(client.objects[key])
+    return S3ObjectReader(client, "bucket", key, size, client.etags[key] if etag else None,
+                          range_size=RANGE_SIZE, read_ahead=read_ahead)
+
+
+def test_reads_across_range_and_read_ahead_boundaries():
+    data = os.urandom(10 * RANGE_SIZE + 123)
+    client = FakeS3Client({"data.bin": data})
+    with _reader(client) as reader:
+        chunks = []
+        while True:
+            # 範囲の境目をまたぐ長さで読み、先読みは現在の範囲とread_ahead個までに限られる
+            chunk = reader.read(1500)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            assert len(reader._ranges) <= 3
+        assert b"".join(chunks) == data
+    # 先読みした範囲も含め、各範囲は1回だけ取得する
+    assert sorted(client.ranges) == [i * RANGE_SIZE for i in range(11)]
+
+
+def test_seek_back_fetches_the_range_again():
+    data = os.urandom(5 * RANGE_SIZE)
+    client = FakeS3Client({"data.bin": data})
+    with _reader(client, read_ahead=1) as reader:
+        reader.seek(3 * RANGE_SIZE + 10)
+        assert reader.read(100) == data[3 * RANGE_SIZE + 10:3 * RANGE_SIZE + 110]
+        reader.seek(5)
+        assert reader.read(RANGE_SIZE) == data[5:RANGE_SIZE + 5]
+        assert reader.tell() == RANGE_SIZE + 5
+
+
+def test_transient_errors_are_retried_per_range():
+    data = os.urandom(4 * RANGE_SIZE)
+    client = FakeS3Client({"data.bin": data})
+    client.faults = {RANGE_SIZE: ["timeout"], 2 * RANGE_SIZE: ["short", "timeout"]}
+    with _reader(client) as reader:
+        assert reader.read() == data
+    assert reader.requests == 4 + 3
+    assert client.ranges.count(2 * RANGE_SIZE) == 3
+
+
+def test_range_that_keeps_failing_raises(monkeypatch):
+    monkeypatch.setattr(Config, "CHUNK_MAX_RETRIES", 2)
+    client = FakeS3Client({"data.bin": os.urandom(2 * RANGE_SIZE)})
+    client.faults = {0: ["timeout"] * 10}
+    with _reader(client, read_ahead=0) as reader:
+        with pytest.raises(ReadTimeoutError):
+            reader.read(10)
+    assert client.ranges.count(0) == 3
+
+
+def test_object_replaced_during_transfer_fails():
+    data = os.urandom(3 * RANGE_SIZE)
+    client = FakeS3Client({"data.bin": data})
+    with _reader(client, read_ahead=0) as reader:
+        assert reader.read(RANGE_SIZE) == data[:RANGE_SIZE]
+        client.replace("data.bin", os.urandom(3 * RANGE_SIZE))
+        with pytest.raises(IOError):
+            reader.read(RANGE_SIZE)
+
+
+def test_upload_s3_object_streams_to_onedrive(fake_server, fake_client):
+    data = os.urandom(3 * 320 * 1024 + 17)
+    client = FakeS3Client({"logs/big.bin": data})
+    source = S3Source("bucket", client=client, range_size=256 * 1024, read_ahead=2)
+    uploader = OneDriveUploader(client=fake_client)
+    result = uploader.upload_s3_object("bucket", "logs/big.bin", "from_s3/big.bin", source=source, show_progress=False)
+    assert result["size"] == len(data)
+    assert fake_server.state.items["from_s3/big.bin"]["content"] == data
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+
+import pytest
+
+from src.api.onedrive_client import OneDriveClient
+from src.utils.session_journal import UploadSessionJournal
+
+
+def _on_disk(journal_file) -> dict:
+    with open(journal_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_progress_writes_are_throttled(tmp_path):
+    local = tmp_path / "data.bin"
+    local.write_bytes(b"x" * 100)
+    journal_file = tmp_path / "journal.json"
+    journal = UploadSessionJournal(str(journal_file), save_fragments=3, save_interval=3600)
+    journal.record(str(local), "remote/data.bin", "https://upload", None)
+    key = UploadSessionJournal.make_key(str(local), "remote/data.bin")
+
+    journal.update_progress(str(local), "remote/data.bin", 10)
+    journal.update_progress(str(local), "remote/data.bin", 20)
+    assert _on_disk(journal_file)[key]["offset"] == 0
+    assert journal.get(str(local), "remote/data.bin")["offset"] == 20
+    journal.update_progress(str(local), "remote/data.bin", 30)
+    assert _on_disk(journal_file)[key]["offset"] == 30
+
+    journal.update_progress(str(local), "remote/data.bin", 40)
+    journal.flush()
+    assert _on_disk(journal_file)[key]["offset"] == 40
+
+
+def test_journals_in_different_processes_keep_each_others_sessions(tmp_path):
+    # 別々のインスタンスは別プロセスと同じく、ファイルロックとマージだけで協調する
+    journal_file = str(tmp_path / "journal.json")
+    local = tmp_path / "data.bin"
+    local.write_bytes(b"x")
+    errors = []
+
+    def worker(name):
+        journal = UploadSessionJournal(journal_file, save_fragments=1)
+        try:
+            for i in range(30):
+                journal.record(str(local), f"{name}/{i}", f"https://upload/{name}/{i}", None)
+                journal.update_progress(str(local), f"{name}/{i}", i)
+                if i % 3 == 0:
+                    journal.remove(str(local), f"{name}/{i}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(f"w{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    entries = _on_disk(journal_file)
+    assert len(entries) == 4 * 20
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_interrupted_upload_resumes_from_the_server_offset(tmp_path, fake_server):
+    local = tmp_path / "large.bin"
+    data = os.urandom(8 * 320 * 1024 + 1000)
+    local.write_bytes(data)
+    journal = UploadSessionJournal(str(tmp_path / "journal.json"))
+
+    class Interrupted(Exception):
+        pass
+
+    def interrupt(uploaded, total):
+        if uploaded >= 3 * 320 * 1024:
+            raise Interrupted()
+
+    client = OneDriveClient("test-token", journal=journal)
+    with pytest.raises(Interrupted):
+        client.upload_file(str(local), "resume/large.bin", progress_callback=interrupt)
+    client.close()
+    assert journal.get(str(local), "resume/large.bin") is not None
+    received_before = fake_server.state.bytes_received
+
+    # 別のクライアント（プロセスの再起動に相当）が同じジャーナルから続きを送る
+    resumed = OneDriveClient("test-token", journal=UploadSessionJournal(str(tmp_path / "journal.json")))
+    progress = []
+    result = resumed.upload_file(str(local), "resume/large.bin", progress_callback=lambda done, total: progress.append(done))
+    resumed.close()
+
+    assert result["size"] == len(data)
+    assert fake_server.state.items["resume/large.bin"]["content"] == data
+    assert progress[0] >= 3 * 320 * 1024
+    assert fake_server.state.bytes_received - received_before < len(data)
+    assert UploadSessionJournal(str(tmp_path / "journal.json")).entries() == []
@@ -0,0 +1,50 @@
+import io
+import os
+
+import pytest
+
+
+def _payload(size: int) -> bytes:
+    return os.urandom(size)
+
+
+def test_open_write_uploads_in_fragments(fake_server, fake_client):
+    data = _payload(1024 * 1024 + 12345)
+    with fake_client.open_write("stream/written.bin") as writer:
+        for start in range(0, len(data), 100000):
+            writer.write(data[start:start + 100000])
+    assert writer.result["size"] == len(data)
+    assert fake_server.state.items["stream/written.bin"]["content"] == data
+
+
+def test_small_stream_uses_simple_upload(fake_server, fake_client):
+    data = _payload(1000)
+    result = fake_client.upload_stream(io.BytesIO(data), "stream/small.bin")
+    assert result["size"] == len(data)
+    assert not fake_server.state.sessions
+
+
+@pytest.mark.parametrize("size", [3 * 320 * 1024, 2 * 1024 * 1024 + 777])
+def test_upload_stream_resends_partially_accepted_fragments(fault_server, fault_client, size):
+    # すべての（最後以外の）フラグメントで半分だけ受信したことにする
+    fault_server.injector.configure({"truncate_rate": 1.0})
+    data = _payload(size)
+    result = fault_client.upload_stream(io.BytesIO(data), "stream/truncated.bin")
+    assert result["size"] == size
+    assert fault_server.state.items["stream/truncated.bin"]["content"] == data
+    assert fault_server.injector.stats()["faults"]["truncate"] > 0
+
+
+def test_open_write_resends_partially_accepted_fragments(fault_server, fault_client):
+    fault_server.injector.configure({"truncate_rate": 1.0})
+    data = _payload(1024 * 1024 + 1)
+    with fault_client.open_write("stream/writer_truncated.bin") as writer:
+        writer.write(data)
+    assert fault_server.state.items["stream/writer_truncated.bin"]["content"] == data
+
+
+def test_upload_stream_recovers_from_dropped_fragments(fault_server, fault_client):
+    fault_server.injector.configure({"drop_rate": 0.3, "seed": 7})
+    data = _payload(2 * 1024 * 1024)
+    fault_client.upload_stream(io.BytesIO(data), "stream/dropped.bin")
+    assert fault_server.state.items["stream/dropped.bin"]["content"] == data